@@ -1,7 +1,6 @@
 """Interface web Streamlit pour la revue de spécifications."""
 import sys
 import os
-import shutil
 from pathlib import Path
 
 def _project_root():
@@ -18,8 +17,8 @@ import streamlit as st
 from datetime import datetime
 
 from config import settings
-from src.workflow import ValidationWorkflow
-from src.agent import SpecificationReviewAgent
+from src.collection import DEFAULT, list_collections
+from src.shared import SharedWorkflow, WorkflowPool
 
 st.set_page_config(
     page_title="Revue de Spécifications",
@@ -28,10 +27,21 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
-if "workflow" not in st.session_state:
-    st.session_state.workflow = None
-if "initialized" not in st.session_state:
-    st.session_state.initialized = False
+if "generation" not in st.session_state:
+    st.session_state.generation = {}
+if "collection" not in st.session_state:
+    st.session_state.collection = DEFAULT
+
+
+@st.cache_resource
+def get_pool() -> WorkflowPool:
+    """Workflows du processus, un par collection : index et clients partagés par toutes les sessions."""
+    return WorkflowPool(max_bytes=settings.collections_cache_mb * 1024 * 1024)
+
+
+def get_shared_workflow() -> SharedWorkflow:
+    """Workflow de la collection choisie par la session."""
+    return get_pool().get(st.session_state.collection)
 
 
 def _css():
@@ -193,28 +203,44 @@ def _css():
     """, unsafe_allow_html=True)
 
 
+def _progress_callback():
+    """Barre de progression Streamlit pilotée par l'indexation."""
+    bar = st.progress(0.0)
+    def update(done, total):
+        if total:
+            bar.progress(min(1.0, done / total), text=f"{done}/{total} segments indexés")
+        else:
+            bar.progress(0.0, text=f"{done} segments indexés...")
+    return update
+
+
 def initialize_workflow():
-    if not st.session_state.initialized:
+    shared = get_shared_workflow()
+    if not shared.initialized:
         with st.spinner("Initialisation..."):
             try:
-                w = ValidationWorkflow()
-                w.initialize()
-                st.session_state.workflow = w
-                st.session_state.initialized = True
-                return True
+                shared.initialize(progress_callback=_progress_callback())
             except Exception as e:
                 error_msg = str(e).lower()
                 if "no such column" in error_msg or "topic" in error_msg:
                     st.warning("Base de données corrompue détectée. Elle sera recréée lors de l'ajout de documents.")
-                    st.session_state.initialized = False
-                    st.session_state.workflow = None
-                    return False
                 else:
                     st.error(str(e))
-                    return False
+                return False
     return True
 
 
+def _notify_generation():
+    """Signale à la session que l'index a été modifié depuis sa dernière visite."""
+    shared = get_shared_workflow()
+    if not shared.initialized:
+        return
+    seen = st.session_state.generation.get(st.session_state.collection)
+    if seen is not None and seen != shared.generation:
+        st.info("L'index a été mis à jour depuis votre dernière action (documents ajoutés ou synchronisés).")
+    st.session_state.generation[st.session_state.collection] = shared.generation
+
+
 def main():
     _css()
 
@@ -224,7 +250,14 @@ def main():
 
     st.title("Revue de Spécifications")
     st.caption("Analyse automatisée des documents techniques par RAG et LLM.")
+    collections = list_collections()
+    if st.session_state.collection not in collections:
+        collections.append(st.session_state.collection)
+    st.session_state.collection = st.selectbox(
+        "Collection", collections, index=collections.index(st.session_state.collection)
+    )
     st.markdown("---")
+    _notify_generation()
 
     tab_review, tab_query, tab_add = st.tabs([
         "Revue complète",
@@ -261,7 +294,7 @@ def main():
                         output_file = settings.output_path / f"rapport_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
                     elif output_format == "Markdown":
                         output_file = settings.output_path / f"rapport_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-                    report = st.session_state.workflow.run_full_review(
+                    report = get_shared_workflow().run_full_review(
                         custom_questions=questions_list,
                         output_file=output_file,
                     )
@@ -308,72 +341,63 @@ def main():
             else:
                 if not initialize_workflow():
                     st.stop()
-                with st.spinner("Recherche..."):
-                    try:
-                        result = st.session_state.workflow.query(question.strip())
-                        st.subheader("Réponse")
-                        st.write(result["reponse"])
-                        if result.get("sources"):
-                            st.subheader("Sources")
-                            for s in result["sources"]:
-                                st.markdown(f"— {s}")
-                    except Exception as e:
-                        st.error(str(e))
+                try:
+                    with st.spinner("Recherche..."):
+                        result = get_shared_workflow().query_stream(question.strip())
+                    if result.get("sources"):
+                        st.subheader("Sources")
+                        for s in result["sources"]:
+                            st.markdown(f"— {s}")
+                    st.subheader("Réponse")
+                    if result.get("cache") == "semantique":
+                        st.caption(f"Réponse reprise d'une question proche : « {result['question_en_cache']} »")
+                    elif result.get("cache"):
+                        st.caption("Réponse servie depuis le cache.")
+                    st.write_stream(result["stream"])
+                except Exception as e:
+                    st.error(str(e))
+        if get_shared_workflow().initialized:
+            with st.expander("Statistiques des caches"):
+                for name, values in get_shared_workflow().cache_stats().items():
+                    st.write(f"**{name}** —", ", ".join(f"{k} : {v}" for k, v in values.items()))
 
     with tab_add:
         st.header("Ajouter des documents")
-        st.markdown("Déposez des fichiers PDF, TXT ou DOCX. Après ajout, utilisez le bouton « Réinitialiser le workflow » en bas pour réindexer.")
+        st.markdown("Déposez des fichiers PDF, TXT ou DOCX. Les documents ajoutés sont visibles immédiatement par toutes les sessions.")
         st.markdown("")
         uploaded = st.file_uploader("Fichiers", type=["pdf", "txt", "docx"], accept_multiple_files=True, label_visibility="collapsed")
+        new_collection = st.text_input(
+            "Nouvelle collection (optionnel)",
+            placeholder=f"Vide : ajout à la collection « {st.session_state.collection} »",
+        )
         st.markdown("")
         if uploaded and st.button("Ajouter et indexer"):
             with st.spinner("Ajout en cours..."):
                 try:
-                    temp_dir = Path("temp_uploads")
-                    temp_dir.mkdir(exist_ok=True)
-                    paths = []
-                    for f in uploaded:
-                        p = temp_dir / f.name
-                        p.write_bytes(f.getbuffer())
-                        paths.append(p)
-                    if not st.session_state.initialized:
-                        w = ValidationWorkflow()
-                        try:
-                            vs = w.vector_store_manager.load_vector_store()
-                        except Exception as load_error:
-                            error_msg = str(load_error).lower()
-                            if "no such column" in error_msg or "topic" in error_msg:
-                                vs = None
-                            else:
-                                raise
-                        if vs is None:
-                            all_docs = []
-                            for fp in paths:
-                                all_docs.extend(w.document_loader.load_document(fp))
-                            chunks = w.document_loader.split_documents(all_docs)
-                            w.vector_store_manager.create_vector_store(chunks, persist=True)
-                        else:
-                            w.vector_store_manager.vector_store = vs
-                        w.agent = SpecificationReviewAgent(w.vector_store_manager)
-                        st.session_state.workflow = w
-                        st.session_state.initialized = True
-                    else:
-                        st.session_state.workflow.add_documents(paths)
-                    for p in paths:
-                        if p.exists():
-                            p.unlink()
-                    if temp_dir.exists():
-                        shutil.rmtree(temp_dir, ignore_errors=True)
-                    st.success(f"{len(paths)} fichier(s) ajouté(s) et indexé(s).")
+                    if new_collection.strip():
+                        get_pool().get(new_collection.strip())  # nom validé avant l'indexation
+                        st.session_state.collection = new_collection.strip()
+                    # Copiés dans le dossier de la collection : un fichier redéposé remplace sa version précédente
+                    shared = get_shared_workflow()
+                    shared.import_files({f.name: bytes(f.getbuffer()) for f in uploaded}, progress_callback=_progress_callback())
+                    st.session_state.generation[st.session_state.collection] = shared.generation
+                    st.success(f"{len(uploaded)} fichier(s) ajouté(s) et indexé(s).")
                 except Exception as e:
                     st.error(str(e))
         st.markdown("---")
-        st.subheader("Réinitialiser le workflow")
-        st.markdown("À faire après avoir ajouté ou modifié des documents dans le dossier des spécifications.")
-        if st.button("Réinitialiser le workflow", type="secondary"):
-            st.session_state.initialized = False
-            st.session_state.workflow = None
-            st.rerun()
+        st.subheader("Synchroniser l'index")
+        st.markdown("À faire après avoir ajouté, modifié ou supprimé des documents dans le dossier des spécifications.")
+        if st.button("Synchroniser l'index", type="secondary"):
+            try:
+                shared = get_shared_workflow()
+                stats = shared.sync(progress_callback=_progress_callback())
+                st.session_state.generation[st.session_state.collection] = shared.generation
+                st.success(
+                    f"Index synchronisé : {stats['nouveaux']} nouveau(x), {stats['modifies']} modifié(s), "
+                    f"{stats['supprimes']} supprimé(s), {stats['inchanges']} inchangé(s)."
+                )
+            except Exception as e:
+                st.error(str(e))
 
 
 if __name__ == "__main__":
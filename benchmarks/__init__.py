@@ -0,0 +1 @@
+"""Benchmarks hors ligne (embeddings et LLM remplacés par des doublures déterministes)."""
@@ -0,0 +1,48 @@
+"""Compare deux fichiers de résultats de benchmarks.
+
+Usage:
+    python -m benchmarks.compare avant.json apres.json [--seuil 10]
+
+Affiche l'écart relatif de chaque mesure numérique ; les écarts supérieurs au
+seuil (en %) sont signalés.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict
+
+
+def flatten(data, prefix: str = "") -> Dict[str, float]:
+    out = {}
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            out.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[path] = float(value)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare deux résultats de benchmarks")
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    parser.add_argument("--seuil", type=float, default=10.0, help="Écart signalé, en %%")
+    args = parser.parse_args()
+
+    before = json.loads(args.before.read_text(encoding="utf-8"))
+    after = json.loads(args.after.read_text(encoding="utf-8"))
+    print(f"{before['metadata']['commit']} -> {after['metadata']['commit']}")
+    old, new = flatten({k: v for k, v in before.items() if k != "metadata"}), flatten(
+        {k: v for k, v in after.items() if k != "metadata"}
+    )
+    for path in sorted(old.keys() & new.keys()):
+        delta = (new[path] - old[path]) / old[path] * 100 if old[path] else 0.0
+        flag = " <--" if abs(delta) > args.seuil else ""
+        print(f"{path:70s} {old[path]:>12g} {new[path]:>12g} {delta:+8.1f}%{flag}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
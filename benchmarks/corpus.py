@@ -0,0 +1,45 @@
+"""Génération de corpus de spécifications synthétiques."""
+import random
+from pathlib import Path
+
+_SUBJECTS = [
+    "Le système", "Le module de facturation", "L'API publique", "Le service d'authentification",
+    "L'interface opérateur", "Le moteur de règles", "La base de données", "Le connecteur ERP",
+]
+_VERBS = ["doit", "devra", "peut", "ne doit pas"]
+_ACTIONS = [
+    "répondre en moins de {n} ms", "journaliser chaque accès", "chiffrer les données au repos",
+    "conserver l'historique pendant {n} jours", "supporter {n} utilisateurs simultanés",
+    "exporter les rapports au format PDF", "refuser les mots de passe de moins de {n} caractères",
+    "notifier l'administrateur en cas d'échec", "être disponible {n} % du temps",
+    "valider les entrées côté serveur", "synchroniser les référentiels toutes les {n} minutes",
+]
+_SECTIONS = ["Contexte", "Exigences fonctionnelles", "Performance", "Sécurité", "Exploitation", "Annexes"]
+
+
+def _requirement(rng: random.Random, doc: int, num: int) -> str:
+    action = rng.choice(_ACTIONS).format(n=rng.choice([5, 30, 90, 200, 500, 1000, 99]))
+    return f"REQ-{doc:05d}-{num:03d} : {rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {action}."
+
+
+def generate_corpus(dest: Path, n_docs: int, seed: int = 0, sections: int = 4, requirements: int = 6) -> int:
+    """Écrit `n_docs` spécifications .txt dans `dest` (sous-dossiers de 500) ; retourne le volume en octets."""
+    rng = random.Random(seed)
+    total = 0
+    for d in range(n_docs):
+        lines = [f"Spécification technique n°{d}", ""]
+        for s in rng.sample(_SECTIONS, sections):
+            lines += [f"{s}", ""]
+            lines += [_requirement(rng, d, r) for r in range(requirements)]
+            lines.append("")
+        path = Path(dest) / f"lot_{d // 500:03d}" / f"spec_{d:05d}.txt"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = "\n".join(lines)
+        path.write_text(text, encoding="utf-8")
+        total += len(text.encode("utf-8"))
+    return total
+
+
+def sample_queries(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    return [f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_ACTIONS).format(n=30)} ?" for _ in range(n)]
@@ -0,0 +1,138 @@
+"""Rappel et latence des index FAISS approchés, comparés à la recherche exhaustive.
+
+Usage (depuis la racine du projet):
+    python -m benchmarks.faiss_indexes [--n 100000] [--dim 768] [--output faiss.json]
+    python -m benchmarks.faiss_indexes --n 1000000 --dim 3072 --types hnsw ivf_pq
+
+Les vecteurs sont synthétiques (mélange de gaussiennes normalisées, proche de la
+structure en grappes d'un corpus réel). Les index sont créés par la même fabrique
+que le vector store (src/faiss_index.py) ; le rappel@k est mesuré contre l'index
+flat, la latence requête par requête.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from src.faiss_index import new_index, set_search_params
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    data = centers[rng.integers(0, clusters, size=n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data
+
+
+def _measure(index, queries: np.ndarray, truth: np.ndarray, k: int) -> Dict[str, float]:
+    samples, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        samples.append(time.perf_counter() - t0)
+        found.append(ids[0])
+    ms = np.asarray(samples) * 1000
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return {
+        "rappel": round(float(recall), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def run(args) -> Dict:
+    import faiss
+
+    data = synthetic_vectors(args.n + args.queries, args.dim)
+    base, queries = data[: args.n], data[args.n :]
+    flat = faiss.IndexFlatL2(args.dim)
+    flat.add(base)
+    _, truth = flat.search(queries, args.k)
+
+    results: List[Dict] = []
+    for index_type in args.types:
+        t0 = time.perf_counter()
+        index = new_index(
+            args.dim,
+            index_type,
+            base[: args.train_size],
+            nlist=args.nlist,
+            pq_m=args.pq_m,
+            hnsw_m=args.hnsw_m,
+            ef_construction=args.ef_construction,
+        )
+        index.add(base)
+        build = time.perf_counter() - t0
+        size = len(faiss.serialize_index(index))
+        if index_type == "hnsw":
+            sweep = [("efSearch", v) for v in args.ef_search]
+        elif index_type in ("ivf_flat", "ivf_pq"):
+            sweep = [("nprobe", v) for v in args.nprobe]
+        else:
+            sweep = [(None, None)]
+        for param, value in sweep:
+            if param:
+                set_search_params(index, nprobe=value, ef_search=value)
+            entry = {
+                "index": index_type,
+                "parametre": param,
+                "valeur": value,
+                "construction_s": round(build, 2),
+                "taille_octets": size,
+                **_measure(index, queries, truth, args.k),
+            }
+            results.append(entry)
+            print(
+                f"{index_type:9s} {param or '':9s} {str(value or ''):>5s}  rappel@{args.k}={entry['rappel']:.3f}  "
+                f"p50={entry['p50_ms']:.3f} ms  p99={entry['p99_ms']:.3f} ms  "
+                f"{size / 1e6:.1f} Mo  construction {build:.1f} s"
+            )
+    return {
+        "metadata": {
+            "date": datetime.now().isoformat(),
+            "vecteurs": args.n,
+            "dimension": args.dim,
+            "requetes": args.queries,
+            "k": args.k,
+            "threads": faiss.omp_get_max_threads(),
+        },
+        "resultats": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rappel / latence des index FAISS")
+    parser.add_argument("--n", type=int, default=100_000, help="Nombre de vecteurs indexés")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=["flat", "ivf_flat", "ivf_pq", "hnsw"],
+                        choices=["flat", "ivf_flat", "ivf_pq", "hnsw"])
+    parser.add_argument("--train-size", type=int, default=32768)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--pq-m", type=int, default=64)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    report = run(args)
+    output = args.output or ROOT / "benchmarks" / "results" / f"faiss_{args.n}x{args.dim}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Résultats: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
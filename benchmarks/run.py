@@ -0,0 +1,201 @@
+"""Benchmarks hors ligne : chargement, indexation, recherche et revue complète.
+
+Usage (depuis la racine du projet):
+    python -m benchmarks.run [--sizes 10 100 1000 10000] [--backends faiss chroma] [--output bench.json]
+
+Les embeddings et le LLM sont des doublures déterministes (benchmarks/stubs.py) :
+les chiffres mesurent le code du projet, pas la latence d'OpenAI. Les caches
+d'embeddings et de réponses sont désactivés pour que chaque mesure soit complète.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks import stubs
+from benchmarks.corpus import generate_corpus, sample_queries
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def _latencies(samples: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "moyenne_ms": round(float(ms.mean()), 3),
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "inconnu"
+
+
+def bench_startup(runs: int = 3) -> Dict[str, float]:
+    """Temps de démarrage des points d'entrée (médiane de `runs` lancements de --help)."""
+    env = {**os.environ, "OPENAI_API_KEY": "benchmark"}
+    result = {}
+    for script in ("cli.py", "validate_specs.py"):
+        samples = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, script, "--help"], cwd=ROOT, env=env, capture_output=True, check=True)
+            samples.append(time.perf_counter() - t0)
+        result[f"{Path(script).stem}_help_s"] = round(float(np.median(samples)), 3)
+    return result
+
+
+def bench_loading(docs_dir: Path, corpus_bytes: int):
+    """Chargement et découpage du corpus ; retourne (chunks, mesures)."""
+    from config import settings
+    from src.document_loader import DocumentLoader
+
+    loader = DocumentLoader(settings.chunk_size, settings.chunk_overlap, workers=settings.load_workers)
+    t0 = time.perf_counter()
+    files = loader.list_files(docs_dir)
+    chunks = []
+    for _, file_chunks in loader.iter_chunks(loader.iter_files(files)):
+        chunks.extend(file_chunks)
+    elapsed = time.perf_counter() - t0
+    return chunks, {
+        "fichiers": len(files),
+        "chunks": len(chunks),
+        "duree_s": round(elapsed, 3),
+        "fichiers_par_s": round(len(files) / elapsed, 1),
+        "chunks_par_s": round(len(chunks) / elapsed, 1),
+        "mo_par_s": round(corpus_bytes / 1e6 / elapsed, 2),
+    }
+
+
+def bench_backend(backend: str, chunks: List, store_dir: Path, queries: List[str], review_modes: List[str]) -> Dict:
+    """Construction de l'index, latence de recherche et revue complète pour un backend."""
+    from langchain_core.documents import Document
+    from config import settings
+    from src.vector_store import VectorStoreManager
+    from src.workflow import ValidationWorkflow
+
+    settings.vector_store_type = backend
+    settings.vector_store_path = store_dir
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    vsm = VectorStoreManager()
+    t0 = time.perf_counter()
+    vsm.create_vector_store(chunks, persist=True)
+    build = time.perf_counter() - t0
+
+    samples = []
+    for q in queries:
+        t0 = time.perf_counter()
+        vsm.similarity_search(q, k=5)
+        samples.append(time.perf_counter() - t0)
+
+    # Ajout d'un petit lot (un fichier téléversé) : doit rester indépendant de la taille de l'index
+    extra = [Document(page_content=c.page_content, metadata=c.metadata) for c in chunks[:10]]
+    t0 = time.perf_counter()
+    vsm.add_documents(extra, persist=True)
+    small_add = time.perf_counter() - t0
+
+    workflow = ValidationWorkflow(use_cache=False)
+    t0 = time.perf_counter()
+    workflow.initialize()
+    load = time.perf_counter() - t0
+
+    reviews = {}
+    for mode in review_modes:
+        t0 = time.perf_counter()
+        report = workflow.run_full_review(mode=mode)
+        reviews[mode] = {
+            "duree_s": round(time.perf_counter() - t0, 3),
+            "chunks_analyses": report["resume"]["nombre_chunks_analyses"],
+        }
+    return {
+        "construction_s": round(build, 3),
+        "chunks_par_s": round(len(chunks) / build, 1),
+        "ajout_10_chunks_s": round(small_add, 3),
+        "taille_index_octets": _dir_size(vsm.active_dir / backend),
+        "chargement_index_s": round(load, 3),
+        "recherche": _latencies(samples),
+        "revue": reviews,
+    }
+
+
+def run(sizes: List[int], backends: List[str], n_queries: int, review_modes: List[str], workdir: Path) -> Dict:
+    from config import settings
+
+    stubs.install()
+    settings.embedding_cache_enabled = False
+    settings.llm_cache_enabled = False
+    # Les embeddings factices n'ont pas de sens : sans ce réglage, aucun passage ne serait retenu
+    settings.retrieval_min_score = -1.0
+    results = {
+        "metadata": {
+            "date": datetime.now().isoformat(),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "plateforme": platform.platform(),
+            "dimension_embeddings": stubs.EMBEDDING_SIZE,
+            "chunk_size": settings.chunk_size,
+            "chunk_overlap": settings.chunk_overlap,
+        },
+        "demarrage": bench_startup(),
+        "corpus": {},
+    }
+    queries = sample_queries(n_queries)
+    for n in sizes:
+        docs_dir = workdir / f"docs_{n}"
+        settings.documents_path = docs_dir
+        corpus_bytes = generate_corpus(docs_dir, n)
+        chunks, loading = bench_loading(docs_dir, corpus_bytes)
+        entry = {"octets": corpus_bytes, "chargement": loading, "backends": {}}
+        for backend in backends:
+            logging.getLogger(__name__).warning(f"{n} documents, {backend}...")
+            entry["backends"][backend] = bench_backend(
+                backend, chunks, workdir / f"store_{n}_{backend}", queries, review_modes
+            )
+        results["corpus"][str(n)] = entry
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne de la revue de spécifications")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="Tailles de corpus (documents)")
+    parser.add_argument("--backends", nargs="+", choices=["faiss", "chroma"], default=["faiss", "chroma"])
+    parser.add_argument("--queries", type=int, default=100, help="Nombre de recherches mesurées par index")
+    parser.add_argument("--review-modes", nargs="*", choices=["rag", "sharded"], default=["rag", "sharded"])
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON des résultats")
+    parser.add_argument("--workdir", type=Path, default=None, help="Dossier de travail (temporaire par défaut)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(message)s")
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        workdir = args.workdir or Path(tmp)
+        results = run(args.sizes, args.backends, args.queries, args.review_modes, workdir)
+
+    output = args.output or ROOT / "benchmarks" / "results" / f"bench_{results['metadata']['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Résultats: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Doublures locales des clients OpenAI, déterministes et sans réseau."""
+import json
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+EMBEDDING_SIZE = 256
+
+REVIEW_RESPONSE = json.dumps(
+    {
+        "problemes": [
+            {
+                "type": "ambiguite",
+                "severite": "majeur",
+                "localisation": "Section 2",
+                "description": "Le délai de réponse n'est pas chiffré.",
+                "impact": "Exigence non testable.",
+                "recommandation": "Préciser une valeur en millisecondes.",
+            },
+            {
+                "type": "contradiction",
+                "severite": "critique",
+                "localisation": "Sections 3 et 5",
+                "description": "Deux durées de rétention différentes sont exigées.",
+                "impact": "Implémentation impossible sans arbitrage.",
+                "recommandation": "Retenir une seule durée.",
+            },
+        ],
+        "resume": "Deux problèmes détectés.",
+    },
+    ensure_ascii=False,
+)
+
+
+class UnitFakeEmbedding(DeterministicFakeEmbedding):
+    """Vecteurs pseudo-aléatoires dérivés du texte, normés comme ceux d'OpenAI."""
+
+    def _get_embedding(self, seed: int) -> List[float]:
+        vec = np.asarray(super()._get_embedding(seed))
+        return (vec / np.linalg.norm(vec)).tolist()
+
+
+def _embeddings(*args, **kwargs):
+    return UnitFakeEmbedding(size=EMBEDDING_SIZE)
+
+
+def _chat_model(*args, **kwargs):
+    return FakeListChatModel(responses=[REVIEW_RESPONSE])
+
+
+def install():
+    """Remplace OpenAIEmbeddings et ChatOpenAI avant la création du workflow.
+
+    Les modules du projet importent langchain_openai à la demande : il suffit
+    de substituer les classes du module.
+    """
+    import langchain_openai
+
+    langchain_openai.OpenAIEmbeddings = _embeddings
+    langchain_openai.ChatOpenAI = _chat_model
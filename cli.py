@@ -6,10 +6,10 @@ import logging
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.live import Live
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, MofNCompleteColumn
 
 from config import settings
-from src.workflow import ValidationWorkflow
 
 logging.basicConfig(
     level=logging.INFO,
@@ -31,6 +31,27 @@ def print_banner():
     console.print(banner, style="bold cyan")
 
 
+def _indexing_progress():
+    """Barre de progression Rich pour l'indexation."""
+    return Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        console=console,
+    )
+
+
+def _progress_callback(progress, task):
+    return lambda done, total: progress.update(task, completed=done, total=total)
+
+
+def _workflow(args, **kwargs):
+    """Workflow importé à la demande : --help et check_setup() restent instantanés."""
+    from src.workflow import ValidationWorkflow
+    return ValidationWorkflow(collection=args.collection, **kwargs)
+
+
 def check_setup():
     """Vérifie la configuration."""
     if not settings.openai_api_key or settings.openai_api_key == "your_openai_api_key_here":
@@ -46,25 +67,44 @@ def check_setup():
 def cmd_init(args):
     """Initialise le workflow"""
     console.print("[bold]Initialisation du workflow...[/bold]")
-    workflow = ValidationWorkflow()
-    with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), console=console) as progress:
+    workflow = _workflow(args)
+    with _indexing_progress() as progress:
         task = progress.add_task("Initialisation...", total=None)
-        workflow.initialize(rebuild_vector_store=args.rebuild)
-        progress.update(task, completed=True)
+        workflow.initialize(
+            rebuild_vector_store=args.rebuild,
+            full_rebuild=args.full,
+            progress_callback=_progress_callback(progress, task),
+        )
     console.print("[bold green]✅ Workflow initialisé avec succès![/bold green]")
 
 
+def cmd_sync(args):
+    """Synchronise l'index avec le dossier des documents"""
+    workflow = _workflow(args)
+    with _indexing_progress() as progress:
+        task = progress.add_task("Synchronisation de l'index...", total=None)
+        stats = workflow.sync(progress_callback=_progress_callback(progress, task))
+    table = Table(title="Synchronisation")
+    table.add_column("Fichiers", style="cyan")
+    table.add_column("Nombre", style="green")
+    table.add_row("Nouveaux", str(stats["nouveaux"]))
+    table.add_row("Modifiés", str(stats["modifies"]))
+    table.add_row("Supprimés", str(stats["supprimes"]))
+    table.add_row("Inchangés", str(stats["inchanges"]))
+    console.print(table)
+
+
 def cmd_review(args):
     """Exécute une revue complète"""
     console.print("[bold]Démarrage de la revue des spécifications...[/bold]")
-    workflow = ValidationWorkflow()
+    workflow = _workflow(args, use_cache=False if args.no_cache else None)
     with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), console=console) as progress:
         task1 = progress.add_task("Chargement du workflow...", total=None)
         workflow.initialize()
         progress.update(task1, completed=True)
         task2 = progress.add_task("Analyse en cours...", total=None)
         custom_questions = args.questions.split(";") if args.questions else None
-        report = workflow.run_full_review(custom_questions=custom_questions, output_file=args.output)
+        report = workflow.run_full_review(custom_questions=custom_questions, output_file=args.output, mode=args.mode)
         progress.update(task2, completed=True)
     console.print("\n[bold green]✅ Analyse terminée![/bold green]\n")
     resume_table = Table(title="Résumé de l'Analyse")
@@ -72,12 +112,23 @@ def cmd_review(args):
     resume_table.add_column("Valeur", style="green")
     resume_table.add_row("Documents analysés", str(report['resume']['nombre_documents']))
     resume_table.add_row("Chunks analysés", str(report['resume']['nombre_chunks_analyses']))
+    if "nombre_lots" in report['resume']:
+        resume_table.add_row("Lots revus", str(report['resume']['nombre_lots']))
     if "statistiques" in report:
         stats = report["statistiques"]
         resume_table.add_row("Total problèmes", str(stats.get('total_problemes', 0)))
         resume_table.add_row("Critiques", str(stats.get('problemes_critiques', 0)), style="red")
         resume_table.add_row("Majeurs", str(stats.get('problemes_majeurs', 0)), style="yellow")
         resume_table.add_row("Mineurs", str(stats.get('problemes_mineurs', 0)), style="green")
+    metriques = report["metadata"].get("metriques") or {}
+    durees, compteurs = metriques.get("durees_s", {}), metriques.get("compteurs", {})
+    if durees:
+        resume_table.add_row("Durée revue / LLM", f"{durees.get('revue', 0):.1f} s / {durees.get('llm', 0):.1f} s")
+        resume_table.add_row(
+            "Tokens (prompt + réponse)",
+            f"{compteurs.get('tokens_prompt', 0)} + {compteurs.get('tokens_completion', 0)}",
+        )
+        resume_table.add_row("Coût estimé", f"{compteurs.get('cout_usd', 0):.4f} $")
     console.print(resume_table)
     if "analyse" in report and isinstance(report["analyse"], dict) and "problemes" in report["analyse"]:
         problemes = report["analyse"]["problemes"]
@@ -98,60 +149,190 @@ def cmd_review(args):
 def cmd_query(args):
     """Pose une question spécifique"""
     console.print(f"[bold]Question:[/bold] {args.question}\n")
-    workflow = ValidationWorkflow()
+    workflow = _workflow(args, use_cache=False if args.no_cache else None)
     with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), console=console) as progress:
-        task = progress.add_task("Recherche et analyse...", total=None)
+        task = progress.add_task("Recherche...", total=None)
         workflow.initialize()
-        result = workflow.query(args.question)
+        if args.passages:
+            docs = workflow.search(args.question, k=args.k, search_mode=args.search)
+        else:
+            result = workflow.query_stream(args.question, search_mode=args.search)
         progress.update(task, completed=True)
-    console.print("\n[bold green]✅ Réponse:[/bold green]\n")
-    console.print(Panel(result['reponse'], title="Réponse", border_style="green"))
+    if args.passages:
+        if not docs:
+            console.print("[yellow]Aucun passage trouvé.[/yellow]")
+        for i, d in enumerate(docs, 1):
+            console.print(Panel(d.page_content, title=f"#{i} — {d.metadata.get('file_name', '?')}", border_style="cyan"))
+        return
     if result.get('sources'):
-        console.print("\n[bold]Sources utilisées:[/bold]")
+        console.print("[bold]Sources utilisées:[/bold]")
         for s in result['sources']:
             console.print(f"  • {s}")
+    if result.get('cache') == 'semantique':
+        console.print(f"[dim]Réponse reprise d'une question proche : « {result['question_en_cache']} »[/dim]")
+    elif result.get('cache'):
+        console.print("[dim]Réponse servie depuis le cache[/dim]")
+    console.print("\n[bold green]✅ Réponse:[/bold green]\n")
+    answer = ""
+    with Live(Panel(answer, title="Réponse", border_style="green"), console=console, refresh_per_second=12) as live:
+        for token in result['stream']:
+            answer += token
+            live.update(Panel(answer, title="Réponse", border_style="green"))
 
 
 def cmd_add(args):
     """Ajoute des documents"""
-    workflow = ValidationWorkflow()
+    workflow = _workflow(args)
     workflow.initialize()
     file_paths = [Path(f) for f in args.files]
-    with Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"), console=console) as progress:
+    with _indexing_progress() as progress:
         task = progress.add_task("Ajout des documents...", total=None)
-        workflow.add_documents(file_paths)
-        progress.update(task, completed=True)
+        workflow.add_documents(file_paths, progress_callback=_progress_callback(progress, task))
     console.print(f"[bold green]✅ {len(file_paths)} document(s) ajouté(s)![/bold green]")
 
 
+def cmd_update(args):
+    """Met à jour des documents déjà indexés"""
+    workflow = _workflow(args)
+    table = Table(title="Mise à jour")
+    table.add_column("Fichier", style="cyan")
+    table.add_column("Chunks ajoutés", style="green")
+    table.add_column("Supprimés", style="red")
+    table.add_column("Inchangés")
+    with _indexing_progress() as progress:
+        task = progress.add_task("Mise à jour des documents...", total=None)
+        for f in args.files:
+            stats = workflow.upsert_document(Path(f), progress_callback=_progress_callback(progress, task))
+            table.add_row(f, str(stats["ajoutes"]), str(stats["supprimes"]), str(stats["inchanges"]))
+    console.print(table)
+
+
+def cmd_remove(args):
+    """Retire des documents de l'index"""
+    workflow = _workflow(args)
+    for f in args.files:
+        n = workflow.delete_document(Path(f))
+        console.print(f"[bold green]✅ {f} retiré de l'index ({n} chunk(s))[/bold green]")
+        if Path(f).exists() and workflow.collection.documents_path.resolve() in Path(f).resolve().parents:
+            console.print("[yellow]⚠[/yellow]  Le fichier est toujours dans le dossier des documents : "
+                          "il sera réindexé à la prochaine synchronisation.")
+
+
+def cmd_rollback(args):
+    """Remet en service la génération d'index précédente"""
+    directory = _workflow(args).rollback()
+    console.print(f"[bold green]✅ Génération remise en service:[/bold green] {directory}")
+
+
+def cmd_collections(args):
+    """Liste les collections"""
+    from src.collection import Collection, list_collections
+    table = Table(title="Collections")
+    table.add_column("Nom", style="cyan")
+    table.add_column("Documents")
+    table.add_column("Index")
+    for name in list_collections():
+        c = Collection(name)
+        table.add_row(name, str(c.documents_path), str(c.vector_store_path))
+    console.print(table)
+
+
+def cmd_compact(args):
+    """Fusionne les segments de l'index FAISS"""
+    stats = _workflow(args).compact()
+    if not stats:
+        console.print("[yellow]Compactage sans objet avec Chroma.[/yellow]")
+        return
+    table = Table(title="Compactage")
+    table.add_column("Index", style="cyan")
+    table.add_column("Valeur", style="green")
+    table.add_row("Segments avant", str(stats["segments_avant"]))
+    table.add_row("Segments après", str(stats["segments_apres"]))
+    table.add_row("Vecteurs supprimés retirés", str(stats["vecteurs_retires"]))
+    console.print(table)
+
+
+def cmd_stats(args):
+    """Affiche l'état des caches de réponses"""
+    workflow = _workflow(args)
+    workflow.initialize()
+    stats = workflow.cache_stats()
+    if not stats:
+        console.print("[yellow]Caches de réponses désactivés.[/yellow]")
+        return
+    table = Table(title="Caches (succès et échecs depuis le lancement de la commande)")
+    table.add_column("Cache", style="cyan")
+    table.add_column("Mesure")
+    table.add_column("Valeur", style="green")
+    for name, values in stats.items():
+        for key, value in values.items():
+            table.add_row(name, key, str(value))
+    console.print(table)
+
+
 def main():
     print_banner()
-    if not check_setup():
-        sys.exit(1)
     parser = argparse.ArgumentParser(description="Assistant GenAI pour la Revue de Spécifications")
+    parser.add_argument('--collection', type=str, default=None,
+                        help="Collection nommée (collections/<nom>/) ; par défaut documents/ et vector_store/")
     sub = parser.add_subparsers(dest='command', help='Commandes')
     p_init = sub.add_parser('init', help='Initialise le workflow')
-    p_init.add_argument('--rebuild', action='store_true', help='Reconstruit le vector store')
+    p_init.add_argument('--rebuild', action='store_true', help='Réindexe les documents nouveaux ou modifiés')
+    p_init.add_argument('--full', action='store_true', help='Reconstruit entièrement le vector store')
+    sub.add_parser('sync', help="Synchronise l'index avec le dossier des documents")
     p_review = sub.add_parser('review', help='Exécute une revue complète')
     p_review.add_argument('--questions', type=str, help='Questions (séparées par ;)')
     p_review.add_argument('--output', type=Path, help='Fichier de sortie (.json, .html, .md)')
+    p_review.add_argument('--mode', choices=['rag', 'sharded'], default=None,
+                          help='rag: contexte retrouvé ; sharded: revue parallèle de tout le corpus')
+    p_review.add_argument('--no-cache', action='store_true', help='Ignorer le cache des réponses du LLM')
     p_query = sub.add_parser('query', help='Pose une question')
     p_query.add_argument('question', type=str)
+    p_query.add_argument('--no-cache', action='store_true', help='Ignorer le cache des réponses du LLM')
+    p_query.add_argument('--search', choices=['dense', 'hybrid', 'lexical'], default=None,
+                         help="dense: embeddings ; lexical: BM25 local, sans appel d'embedding ; hybrid: fusion des deux")
+    p_query.add_argument('--passages', action='store_true', help='Afficher les passages trouvés sans interroger le LLM')
+    p_query.add_argument('-k', type=int, default=5, help='Nombre de passages (avec --passages)')
     p_add = sub.add_parser('add', help='Ajoute des documents')
     p_add.add_argument('files', nargs='+', help='Fichiers à ajouter')
+    p_update = sub.add_parser('update', help='Met à jour des documents (seuls les chunks modifiés sont réindexés)')
+    p_update.add_argument('files', nargs='+', help='Fichiers à mettre à jour')
+    p_remove = sub.add_parser('remove', help="Retire des documents de l'index")
+    p_remove.add_argument('files', nargs='+', help='Fichiers à retirer')
+    sub.add_parser('compact', help="Fusionne les segments de l'index FAISS")
+    sub.add_parser('rollback', help="Remet en service la génération d'index précédente")
+    sub.add_parser('collections', help='Liste les collections')
+    sub.add_parser('stats', help="Affiche l'état des caches de réponses")
     args = parser.parse_args()
     if not args.command:
         parser.print_help()
         sys.exit(1)
+    # Après l'analyse des arguments : `--help` répond sans configuration
+    if not check_setup():
+        sys.exit(1)
     try:
         if args.command == 'init':
             cmd_init(args)
+        elif args.command == 'sync':
+            cmd_sync(args)
         elif args.command == 'review':
             cmd_review(args)
         elif args.command == 'query':
             cmd_query(args)
         elif args.command == 'add':
             cmd_add(args)
+        elif args.command == 'update':
+            cmd_update(args)
+        elif args.command == 'remove':
+            cmd_remove(args)
+        elif args.command == 'compact':
+            cmd_compact(args)
+        elif args.command == 'rollback':
+            cmd_rollback(args)
+        elif args.command == 'collections':
+            cmd_collections(args)
+        elif args.command == 'stats':
+            cmd_stats(args)
     except Exception as e:
         console.print(f"[bold red]❌ Erreur:[/bold red] {str(e)}")
         logger.exception("Erreur")
@@ -16,17 +16,63 @@ class Settings(BaseSettings):
     # Configuration RAG
     chunk_size: int = 1000
     chunk_overlap: int = 200
+    load_workers: int = 0  # 0 = un processus par cœur
+    dedup_enabled: bool = True
+    dedup_threshold: float = 1.0  # 1.0 : doublons exacts seulement ; en dessous, quasi-doublons fusionnés (variantes non revues)
+    dedup_num_perm: int = 64
+    dedup_bands: int = 16
     vector_store_type: Literal["chroma", "faiss"] = "chroma"
+    # Index FAISS : flat (exact) ou approché pour les grands corpus
+    faiss_index_type: Literal["flat", "ivf_flat", "ivf_pq", "hnsw"] = "flat"
+    faiss_train_size: int = 32768  # vecteurs mis de côté pour entraîner IVF (au plus la moitié de ingest_max_buffer_mb)
+    faiss_nlist: int = 1024
+    faiss_pq_m: int = 64
+    faiss_hnsw_m: int = 32
+    faiss_ef_construction: int = 200
+    faiss_nprobe: int = 16
+    faiss_ef_search: int = 64
+    faiss_max_segments: int = 8  # au-delà, une fusion (cli.py compact) est signalée à l'enregistrement
+    index_keep_generations: int = 2  # génération en service + précédentes gardées pour un retour arrière
+    index_build_lease_minutes: int = 60  # construction sans nouvelle de son processus : dossier supprimable
+    search_mode: Literal["dense", "hybrid", "lexical"] = "dense"  # "hybrid" (BM25 + vecteurs) sur option
+    hybrid_candidates: int = 20
+    rrf_k: int = 60
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_mb: int = 1024
+    embedding_batch_tokens: int = 100_000
+    embedding_concurrency: int = 4
+    embedding_max_retries: int = 3
+    ingest_max_buffer_mb: int = 256
     
     # Configuration Agent
     temperature: float = 0.1
     max_tokens: int = 2000
+    context_window_tokens: int = 128000
+    context_max_tokens: int = 16000
+    retrieval_min_score: float = 0.2
+    mmr_lambda: float = 0.7
+    review_mode: Literal["rag", "sharded"] = "rag"
+    review_shard_tokens: int = 12000
+    review_concurrency: int = 4
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_hours: float = 168
+    llm_cache_max_mb: int = 256
+    answer_cache_enabled: bool = True
+    answer_cache_threshold: float = 0.95
+    answer_cache_max_entries: int = 1000
+    
+    # Métriques (exports optionnels, désactivés si vides)
+    metrics_jsonl_path: str = ""
+    metrics_prometheus_path: str = ""
     
     # Chemins
     base_dir: Path = Path(__file__).resolve().parent
     documents_path: Path = base_dir / "documents"
     vector_store_path: Path = base_dir / "vector_store"
     output_path: Path = base_dir / "reports"
+    # Collections nommées : collections/<nom>/documents et collections/<nom>/vector_store
+    collections_path: Path = base_dir / "collections"
+    collections_cache_mb: int = 2048  # index gardés chargés par l'interface web, au-delà le moins récent est déchargé
     
     class Config:
         env_file = ".env"
@@ -1,30 +1,72 @@
 """Agent IA pour la revue de spécifications."""
-from typing import List, Dict, Any, Optional
-from langchain_openai import ChatOpenAI
+import contextvars
+import hashlib
+import queue
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain_core.documents import Document
 import json
 import logging
 
-try:
-    from langchain_community.callbacks import get_openai_callback
-except ImportError:
-    from langchain_community.callbacks.manager import get_openai_callback
-
 from config import settings
+from src.answer_cache import AnswerCache
+from src.context import REF_LENGTH, chunk_fingerprint, doc_files, format_doc, pack_context
+from src.response_cache import ResponseCache, context_hash
+from src.tokens import count_tokens
 
 logger = logging.getLogger(__name__)
 
+# Référence de chunk citée par le LLM (préfixe de l'empreinte, cf. format_doc)
+_REF = re.compile(rf"[0-9a-f]{{{REF_LENGTH}}}")
+
+
+def _openai_callback():
+    """Compteur de tokens OpenAI (langchain_community importé à la demande)."""
+    try:
+        from langchain_community.callbacks import get_openai_callback
+    except ImportError:
+        from langchain_community.callbacks.manager import get_openai_callback
+    return get_openai_callback()
+
+
+def llm_client():
+    """Client OpenAI du LLM ; partageable entre collections."""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=settings.llm_model,
+        temperature=settings.temperature,
+        max_tokens=settings.max_tokens,
+        openai_api_key=settings.openai_api_key,
+        # Consommation renvoyée aussi en flux (dernier fragment) : comptée dans les métriques
+        stream_usage=True,
+    )
+
 
 class SpecificationReviewAgent:
-    def __init__(self, vector_store_manager):
-        self.llm = ChatOpenAI(
-            model=settings.llm_model,
-            temperature=settings.temperature,
-            max_tokens=settings.max_tokens,
-            openai_api_key=settings.openai_api_key,
-        )
+    def __init__(self, vector_store_manager, use_cache: Optional[bool] = None, llm=None, llm_slots=None):
+        self.llm = llm or llm_client()
+        # Sémaphore partagé : limite globale des appels LLM simultanés (plusieurs revues en parallèle)
+        self.llm_slots = llm_slots if llm_slots is not None else nullcontext()
         self.vs = vector_store_manager
+        self.metrics = vector_store_manager.metrics
+        if use_cache is None:
+            use_cache = settings.llm_cache_enabled
+        self.cache = ResponseCache(
+            settings.vector_store_path / "llm_cache.sqlite",
+            ttl_seconds=settings.llm_cache_ttl_hours * 3600,
+            max_bytes=settings.llm_cache_max_mb * 1024 * 1024,
+        ) if use_cache else None
+        # Les réponses dépendent des documents : un cache par collection
+        self.answer_cache = AnswerCache(
+            vector_store_manager.vector_store_path / "answer_cache.sqlite",
+            threshold=settings.answer_cache_threshold,
+            max_entries=settings.answer_cache_max_entries,
+        ) if use_cache and settings.answer_cache_enabled else None
         self.system_prompt = """Tu es un expert en revue de spécifications techniques. Analyse les documents et détecte incohérences, contradictions, ambiguïtés et risques. Pour chaque problème: type, sévérité (critique/majeur/mineur), localisation, description, impact, recommandation."""
         self.review_prompt = ChatPromptTemplate.from_messages([
             SystemMessagePromptTemplate.from_template(self.system_prompt),
@@ -36,43 +78,118 @@ Questions:
 {questions}
 
 Réponds UNIQUEMENT par un JSON valide avec cette structure (sans texte avant/après):
-{{"problemes": [{{"id": 1, "type": "...", "severite": "critique|majeur|mineur", "localisation": "...", "description": "...", "impact": "...", "recommandation": "..."}}]}}
+{{"problemes": [{{"id": 1, "type": "...", "severite": "critique|majeur|mineur", "localisation": "...", "description": "...", "impact": "...", "recommandation": "...", "chunks": ["réf des passages concernés"]}}]}}
 Si aucun problème: {{"problemes": []}}
 """),
         ])
 
+    DEFAULT_QUESTIONS = [
+        "Contradictions entre sections ?",
+        "Exigences claires et non ambiguës ?",
+        "Informations manquantes ?",
+        "Risques techniques ?",
+    ]
+
     def review_specifications(
         self, questions: Optional[List[str]] = None, k_context: int = 10
     ) -> Dict[str, Any]:
         if questions is None:
-            questions = [
-                "Contradictions entre sections ?",
-                "Exigences claires et non ambiguës ?",
-                "Informations manquantes ?",
-                "Risques techniques ?",
-            ]
-        context_docs = []
-        for q in questions:
-            context_docs.extend(self.vs.similarity_search(q, k=k_context))
-        seen = set()
-        unique = []
-        for doc in context_docs:
-            key = f"{doc.metadata.get('source','')}-{doc.page_content[:50]}"
-            if key not in seen:
-                seen.add(key)
-                unique.append(doc)
-        context = "\n\n".join(
-            f"[{d.metadata.get('file_name','?')}]\n{d.page_content}" for d in unique[: k_context * 2]
+            questions = self.DEFAULT_QUESTIONS
+        with self.metrics.stage("recherche"):
+            candidates: "OrderedDict[str, Any]" = OrderedDict()
+            for hits in self.vs.similarity_search_batch(questions, k=k_context):
+                for doc, score in hits:
+                    key = doc.id or context_hash(f"{doc.metadata.get('source','')}\n{doc.page_content}")
+                    if key not in candidates or score > candidates[key][1]:
+                        candidates[key] = (doc, score)
+            candidates = list(candidates.values())
+            # Vecteurs déjà indexés : pas de nouvel appel d'embedding pour le MMR
+            vectors = self.vs.get_vectors([d for d, _ in candidates]) if candidates else []
+            packed = pack_context(
+                candidates,
+                vectors,
+                budget_tokens=self.context_budget(questions),
+                mmr_lambda=settings.mmr_lambda,
+                min_score=settings.retrieval_min_score,
+                model=settings.llm_model,
+            )
+        unique = [d for d, _ in packed]
+        context = "\n\n".join(format_doc(d, ref=True) for d in unique)
+        response = self._invoke_review(context, questions)
+        with self.metrics.stage("analyse_json"):
+            analysis = self._parse_response(response)
+            if isinstance(analysis.get("problemes"), list):
+                self._attach_chunks([p for p in analysis["problemes"] if isinstance(p, dict)], unique)
+        return {
+            "questions_analysees": questions,
+            "documents_analyses": sorted(set(f for d in unique for f in doc_files(d))),
+            "nombre_chunks_analyses": len(unique),
+            "scores_pertinence": [round(score, 4) for _, score in packed],
+            "analyse": analysis,
+            "reponse_complete": response,
+        }
+
+    def context_budget(self, questions: List[str]) -> int:
+        """Tokens disponibles pour le contexte, d'après la fenêtre du modèle et `max_tokens`."""
+        overhead = self.review_prompt.format(context="", questions="\n".join(f"- {q}" for q in questions))
+        available = settings.context_window_tokens - settings.max_tokens - count_tokens(overhead, settings.llm_model)
+        return max(0, min(settings.context_max_tokens, available))
+
+    def _cache_key(self, kind: str, questions: List[str], context: str) -> str:
+        return ResponseCache.make_key(
+            kind=kind,
+            model=settings.llm_model,
+            temperature=settings.temperature,
+            max_tokens=settings.max_tokens,
+            prompt=context_hash(self.system_prompt),
+            questions=questions,
+            context=context_hash(context),
         )
+
+    def _cache_get(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        cached = self.cache.get(key)
+        self.metrics.incr("cache_llm_hits" if cached is not None else "cache_llm_misses")
+        return cached
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Entrées et succès depuis le démarrage des caches actifs (réponses du LLM, réponses aux questions)."""
+        stats = {}
+        if self.cache is not None:
+            stats["reponses_llm"] = self.cache.stats()
+        if self.answer_cache is not None:
+            stats["reponses_questions"] = self.answer_cache.stats()
+        return stats
+
+    def _record_usage(self, cb):
+        self.metrics.incr("llm_appels")
+        self.metrics.incr("tokens_prompt", cb.prompt_tokens)
+        self.metrics.incr("tokens_completion", cb.completion_tokens)
+        self.metrics.incr("cout_usd", cb.total_cost)
+        logger.info(f"Tokens: {cb.prompt_tokens} + {cb.completion_tokens}, coût: {cb.total_cost:.4f} $")
+
+    def _invoke_review(self, context: str, questions: List[str]) -> str:
+        key = self._cache_key("review", questions, context) if self.cache is not None else None
+        cached = self._cache_get(key)
+        if cached is not None:
+            logger.info("Réponse de revue servie depuis le cache")
+            return cached
         try:
-            with get_openai_callback() as cb:
+            with self.llm_slots, _openai_callback() as cb, self.metrics.stage("llm"):
                 chain = self.review_prompt | self.llm
                 msg = chain.invoke({"context": context, "questions": "\n".join(f"- {q}" for q in questions)})
                 response = msg.content if hasattr(msg, "content") else str(msg)
-                logger.info(f"Tokens: {cb.total_tokens}")
+            self._record_usage(cb)
         except Exception as e:
             logger.error(str(e))
             raise
+        if key is not None:
+            self.cache.put(key, response)
+        return response
+
+    @staticmethod
+    def _parse_response(response: str) -> Dict[str, Any]:
         try:
             if "```json" in response:
                 start = response.find("```json") + 7
@@ -84,24 +201,342 @@ Si aucun problème: {{"problemes": []}}
                 json_str = response[start:end].strip()
             else:
                 json_str = response.strip()
-            analysis = json.loads(json_str)
+            return json.loads(json_str)
         except json.JSONDecodeError:
-            analysis = {"problemes": [], "analyse_complete": response}
+            return {"problemes": [], "analyse_complete": response}
+
+    def _shards(self, docs: List[Document], budget: int) -> List[List[Document]]:
+        """Regroupe les chunks, fichier par fichier et dans l'ordre, en lots bornés en tokens."""
+        docs = sorted(docs, key=lambda d: (d.metadata.get("source", ""), d.metadata.get("chunk_index", 0)))
+        shards, current, used = [], [], 0
+        for doc in docs:
+            n = count_tokens(doc.page_content, settings.llm_model)
+            if current and used + n > budget:
+                shards.append(current)
+                current, used = [], 0
+            current.append(doc)
+            used += n
+        if current:
+            shards.append(current)
+        return shards
+
+    @staticmethod
+    def _fingerprint(probleme: Dict[str, Any]) -> str:
+        def norm(value):
+            return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+        key = "|".join(norm(probleme.get(f)) for f in ("type", "localisation", "description"))
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _attach_chunks(problemes: List[Dict[str, Any]], docs: List[Document]) -> List[Dict[str, Any]]:
+        """Rattache chaque problème aux empreintes des chunks qu'il cite ; à défaut, à tous ceux du contexte."""
+        by_ref: Dict[str, str] = {}
+        for d in docs:
+            fp = chunk_fingerprint(d)
+            by_ref.setdefault(fp[:REF_LENGTH], fp)
+        context_fps = list(dict.fromkeys(chunk_fingerprint(d) for d in docs))
+        for p in problemes:
+            refs = p.get("chunks") if isinstance(p.get("chunks"), list) else []
+            found = [by_ref[m.group(0)] for r in refs if (m := _REF.search(str(r).lower())) and m.group(0) in by_ref]
+            p["chunks"] = list(dict.fromkeys(found)) or context_fps
+        return problemes
+
+    def _review_shards(
+        self,
+        docs: List[Document],
+        questions: List[str],
+        shard_tokens: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], int, int, Set[str]]:
+        """Revue parallèle de `docs` par lots.
+
+        Retourne les problèmes fusionnés, le nombre de lots, le nombre de lots en
+        échec et les empreintes des chunks de ces lots (non revus).
+        """
+        shards = self._shards(docs, shard_tokens or settings.review_shard_tokens)
+        if not shards:
+            return [], 0, 0, set()
+        logger.info(f"Revue par lots: {len(docs)} chunk(s) en {len(shards)} lot(s)")
+
+        def review_shard(shard: List[Document]) -> List[Dict[str, Any]]:
+            context = "\n\n".join(format_doc(d, ref=True) for d in shard)
+            response = self._invoke_review(context, questions)
+            with self.metrics.stage("analyse_json"):
+                problemes = self._parse_response(response).get("problemes") or []
+            return self._attach_chunks([p for p in problemes if isinstance(p, dict)], shard)
+
+        failed, unreviewed = 0, set()
+        merged: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        with ThreadPoolExecutor(max_workers=concurrency or settings.review_concurrency) as pool:
+            # Chaque lot s'exécute dans une copie du contexte : ses mesures vont à la revue en cours
+            futures = [pool.submit(contextvars.copy_context().run, review_shard, shard) for shard in shards]
+            for shard, fut in zip(shards, futures):
+                try:
+                    problemes = fut.result()
+                except Exception as e:
+                    logger.error(f"Lot en échec ({len(shard)} chunk(s)): {e}")
+                    failed += 1
+                    unreviewed.update(chunk_fingerprint(d) for d in shard)
+                    continue
+                for p in problemes:
+                    fp = self._fingerprint(p)
+                    if fp not in merged:
+                        merged[fp] = {**p, "empreinte": fp}
+        if failed == len(shards):
+            raise RuntimeError("Tous les lots de revue ont échoué.")
+        return list(merged.values()), len(shards), failed, unreviewed
+
+    def review_sharded(
+        self,
+        questions: Optional[List[str]] = None,
+        shard_tokens: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Revue map-reduce de l'ensemble du corpus indexé.
+
+        Les chunks sont répartis en lots de `review_shard_tokens` tokens, revus en
+        parallèle (au plus `review_concurrency` appels LLM simultanés), puis les
+        listes de problèmes sont fusionnées et dédoublonnées. Chaque problème reçoit
+        une empreinte stable, les empreintes des chunks qu'il concerne et un
+        identifiant séquentiel dans l'ordre des lots. `empreintes_chunks` liste
+        les chunks revus (ceux des lots en échec exceptés) : le rapport peut servir
+        de référence à `review_incremental`, qui reverra les autres.
+        """
+        if questions is None:
+            questions = self.DEFAULT_QUESTIONS
+        docs = list(self.vs.iter_all_documents())
+        if not docs:
+            raise ValueError("Aucun chunk indexé.")
+        problemes, n_shards, failed, unreviewed = self._review_shards(docs, questions, shard_tokens, concurrency)
+        problemes = [{**p, "id": i} for i, p in enumerate(problemes, 1)]
+        analysis = {"problemes": problemes}
         return {
             "questions_analysees": questions,
-            "documents_analyses": list(set(d.metadata.get("file_name", "?") for d in unique)),
-            "nombre_chunks_analyses": len(unique),
+            "documents_analyses": sorted(set(f for d in docs for f in doc_files(d))),
+            "nombre_chunks_analyses": len(docs),
+            "nombre_lots": n_shards,
+            "lots_en_echec": failed,
             "analyse": analysis,
-            "reponse_complete": response,
+            "reponse_complete": json.dumps(analysis, indent=2, ensure_ascii=False),
+            "empreintes_chunks": sorted(set(chunk_fingerprint(d) for d in docs) - unreviewed),
         }
 
-    def query_specific(self, query: str, k: int = 5) -> Dict[str, Any]:
-        docs = self.vs.similarity_search(query, k=k)
-        context = "\n\n".join(f"[{d.metadata.get('file_name','?')}]\n{d.page_content}" for d in docs)
-        prompt = f"Spécifications:\n{context}\n\nQuestion: {query}\n\nRéponse:"
-        msg = self.llm.invoke(prompt)
+    def _with_neighbours(self, changed: List[Document], docs: List[Document], k: int) -> List[Document]:
+        """Chunks modifiés, leurs voisins dans le fichier (rang ±1) et leurs `k` plus proches voisins sémantiques."""
+        if not changed:
+            return []
+
+        def key(d: Document) -> str:
+            return d.id or chunk_fingerprint(d)
+
+        by_position = {(d.metadata.get("source"), d.metadata.get("chunk_index")): d for d in docs}
+        scope: "OrderedDict[str, Document]" = OrderedDict((key(d), d) for d in changed)
+        for d in changed:
+            i = d.metadata.get("chunk_index")
+            if i is None:
+                continue
+            for j in (i - 1, i + 1):
+                n = by_position.get((d.metadata.get("source"), j))
+                if n is not None:
+                    scope.setdefault(key(n), n)
+        if k > 0:
+            with self.metrics.stage("recherche"):
+                for hits in self.vs.similarity_search_batch([d.page_content for d in changed], k=k + 1):
+                    for n, score in hits:
+                        if score >= settings.retrieval_min_score:
+                            scope.setdefault(key(n), n)
+        return list(scope.values())
+
+    def review_incremental(
+        self,
+        baseline: Dict[str, Any],
+        questions: Optional[List[str]] = None,
+        neighbours: int = 3,
+        shard_tokens: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Revue des seuls chunks modifiés depuis un rapport de référence (`review_sharded`).
+
+        Les chunks dont l'empreinte est absente de la référence sont revus par
+        lots avec leurs voisins (`_with_neighbours`) ; les problèmes de la
+        référence sont repris si tous leurs chunks sont encore présents à
+        l'identique et qu'aucun n'a été revu. Le résultat a la forme de celui de `review_sharded` (liste
+        complète des problèmes), pour un coût proportionnel au diff. Les chunks
+        des lots en échec restent hors de `empreintes_chunks` : le passage
+        suivant les revoit.
+        """
+        if questions is None:
+            questions = self.DEFAULT_QUESTIONS
+        docs = list(self.vs.iter_all_documents())
+        if not docs:
+            raise ValueError("Aucun chunk indexé.")
+        reference = set(baseline["metadata"]["empreintes_chunks"])
+        current = {chunk_fingerprint(d) for d in docs}
+        changed = [d for d in docs if chunk_fingerprint(d) not in reference]
+        scope = self._with_neighbours(changed, docs, neighbours)
+        logger.info(f"Revue incrémentale: {len(changed)} chunk(s) modifié(s), {len(scope)} chunk(s) revu(s)")
+        nouveaux, n_shards, failed, unreviewed = self._review_shards(scope, questions, shard_tokens, concurrency)
+
+        # Le problème d'un chunk revu ici est remplacé par le résultat de cette revue
+        reviewed = {chunk_fingerprint(d) for d in scope} - unreviewed
+        repris = [
+            p for p in (baseline.get("analyse") or {}).get("problemes") or []
+            if isinstance(p, dict) and p.get("chunks")
+            and set(p["chunks"]) <= current and not set(p["chunks"]) & reviewed
+        ]
+        merged: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        for p in repris + nouveaux:
+            fp = p.get("empreinte") or self._fingerprint(p)
+            merged.setdefault(fp, {**p, "empreinte": fp})
+        problemes = [{**p, "id": i} for i, p in enumerate(merged.values(), 1)]
+        analysis = {"problemes": problemes}
         return {
-            "question": query,
-            "reponse": msg.content if hasattr(msg, "content") else str(msg),
-            "sources": [d.metadata.get("file_name", "?") for d in docs],
+            "questions_analysees": questions,
+            "documents_analyses": sorted(set(f for d in docs for f in doc_files(d))),
+            "nombre_chunks_analyses": len(scope),
+            "nombre_lots": n_shards,
+            "lots_en_echec": failed,
+            "analyse": analysis,
+            "reponse_complete": json.dumps(analysis, indent=2, ensure_ascii=False),
+            "empreintes_chunks": sorted(current - unreviewed),
+            "incremental": {
+                "chunks_modifies": len(changed),
+                "chunks_supprimes": len(reference - current),
+                "chunks_revus": len(scope),
+                "problemes_repris": len(repris),
+                "problemes_nouveaux": len(problemes) - len(repris),
+            },
         }
+
+    def _prepare_query(self, query: str, k: int, search_mode: Optional[str] = None):
+        with self.metrics.stage("recherche"):
+            docs = self.vs.similarity_search(query, k=k, mode=search_mode)
+        context = "\n\n".join(format_doc(d) for d in docs)
+        prompt = f"Spécifications:\n{context}\n\nQuestion: {query}\n\nRéponse:"
+        key = self._cache_key("query", [query], context) if self.cache is not None else None
+        return docs, prompt, key
+
+    def _answer_scope(self, k: int, search_mode: Optional[str]) -> str:
+        return ResponseCache.make_key(
+            kind="answer",
+            model=settings.llm_model,
+            temperature=settings.temperature,
+            max_tokens=settings.max_tokens,
+            search_mode=search_mode or settings.search_mode,
+            k=k,
+        )
+
+    def _cached_answer(self, query: str, k: int, search_mode: Optional[str]):
+        """Cherche une réponse déjà donnée ; retourne (réponse ou None, embedding de la question ou None).
+
+        L'embedding n'est calculé que si la correspondance exacte échoue, et
+        jamais en mode lexical (qui doit rester sans appel réseau).
+        """
+        if self.answer_cache is None:
+            return None, None
+        scope, generation = self._answer_scope(k, search_mode), self.vs.generation
+        hit = self.answer_cache.get_exact(query, scope, generation)
+        if hit is not None:
+            self.metrics.incr("cache_reponses_exact")
+            return {**hit, "question": query, "cache": "exact"}, None
+        vector = None
+        if (search_mode or settings.search_mode) != "lexical":
+            vector = self.vs.embeddings.embed_query(query)
+            hit = self.answer_cache.get_similar(query, vector, scope, generation)
+        else:
+            self.answer_cache.miss()
+        if hit is not None:
+            self.metrics.incr("cache_reponses_semantique")
+            return {**hit, "question": query, "question_en_cache": hit["question"], "cache": "semantique"}, vector
+        self.metrics.incr("cache_reponses_misses")
+        return None, vector
+
+    def _store_answer(self, query: str, vector, answer: str, sources: List[str], k: int, search_mode: Optional[str]):
+        if self.answer_cache is not None and answer:
+            self.answer_cache.put(
+                query, vector, answer, sources, self._answer_scope(k, search_mode), self.vs.generation
+            )
+
+    def query_specific(self, query: str, k: int = 5, search_mode: Optional[str] = None) -> Dict[str, Any]:
+        """Répond à une question ; ses mesures (tokens, coût, caches) sont émises dans un événement "question"."""
+        with self.metrics.scope():
+            result = self._query_specific(query, k, search_mode)
+            self.metrics.emit("question")
+        return result
+
+    def _query_specific(self, query: str, k: int, search_mode: Optional[str]) -> Dict[str, Any]:
+        hit, vector = self._cached_answer(query, k, search_mode)
+        if hit is not None:
+            return hit
+        docs, prompt, key = self._prepare_query(query, k, search_mode)
+        response = self._cache_get(key)
+        if response is None:
+            with self.llm_slots, _openai_callback() as cb, self.metrics.stage("llm"):
+                msg = self.llm.invoke(prompt)
+                response = msg.content if hasattr(msg, "content") else str(msg)
+            self._record_usage(cb)
+            if key is not None:
+                self.cache.put(key, response)
+        sources = [d.metadata.get("file_name", "?") for d in docs]
+        self._store_answer(query, vector, response, sources, k, search_mode)
+        return {"question": query, "reponse": response, "sources": sources}
+
+    def query_specific_stream(self, query: str, k: int = 5, search_mode: Optional[str] = None) -> Dict[str, Any]:
+        """Variante en flux : les sources sont connues avant la génération.
+
+        `stream` est un itérateur de fragments de texte ; la réponse complète est
+        mise en cache une fois générée. La génération tourne dans un thread : le
+        créneau LLM est rendu dès qu'elle se termine ou échoue, quel que soit le
+        rythme de lecture du flux. Les mesures de la question sont émises une
+        fois la réponse complète.
+        """
+        with self.metrics.scope():
+            scope = contextvars.copy_context()
+        return scope.run(self._query_specific_stream, query, k, search_mode, scope)
+
+    def _query_specific_stream(
+        self, query: str, k: int, search_mode: Optional[str], scope: contextvars.Context
+    ) -> Dict[str, Any]:
+        hit, vector = self._cached_answer(query, k, search_mode)
+        if hit is not None:
+            self.metrics.emit("question")
+            return {**hit, "stream": iter([hit.pop("reponse")])}
+        docs, prompt, key = self._prepare_query(query, k, search_mode)
+        sources = [d.metadata.get("file_name", "?") for d in docs]
+        cached = self._cache_get(key)
+        if cached is not None:
+            self._store_answer(query, vector, cached, sources, k, search_mode)
+            self.metrics.emit("question")
+
+        def generate(out: "queue.Queue"):
+            parts = []
+            try:
+                with self.llm_slots, _openai_callback() as cb, self.metrics.stage("llm"):
+                    for chunk in self.llm.stream(prompt):
+                        text = chunk.content if hasattr(chunk, "content") else str(chunk)
+                        if text:
+                            parts.append(text)
+                            out.put(text)
+                self._record_usage(cb)
+            except Exception as e:
+                logger.error(str(e))
+                out.put(e)
+                return
+            if key is not None:
+                self.cache.put(key, "".join(parts))
+            self._store_answer(query, vector, "".join(parts), sources, k, search_mode)
+            self.metrics.emit("question")
+            out.put(None)
+
+        def stream() -> Iterator[str]:
+            if cached is not None:
+                yield cached
+                return
+            out: "queue.Queue" = queue.Queue()
+            threading.Thread(target=scope.run, args=(generate, out), daemon=True).start()
+            while (item := out.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+
+        return {"question": query, "stream": stream(), "sources": sources}
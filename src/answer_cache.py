@@ -0,0 +1,157 @@
+"""Cache des réponses aux questions ciblées : correspondance exacte puis sémantique."""
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Minuscules, sans accents, espaces réduits, ponctuation finale retirée."""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text).strip(" ?!.;:")
+
+
+def question_keys(question: str) -> frozenset:
+    """Identifiants et nombres cités (REQ-042, 30, 2.5) : deux questions proches qui en diffèrent ne sont pas la même."""
+    tokens = re.findall(r"[a-z0-9]+(?:[-_.,/][a-z0-9]+)*", normalize_question(question))
+    return frozenset(t for t in tokens if any(c.isdigit() for c in t))
+
+
+class AnswerCache:
+    """Réponses aux questions ciblées, réutilisées pour la même question ou une question proche.
+
+    Premier niveau : texte normalisé identique. Second niveau : question dont
+    l'embedding a une similarité cosinus d'au moins `threshold` et qui cite les
+    mêmes identifiants et nombres (cf. `question_keys`). Chaque entrée
+    porte la génération de l'index et un périmètre (modèle, paramètres, mode de
+    recherche) ; une entrée d'une autre génération n'est jamais servie et est
+    purgée. Au-delà de `max_entries`, les moins récemment utilisées sont évincées.
+    """
+
+    def __init__(self, db_path: Path, threshold: float, max_entries: int):
+        self.db_path = Path(db_path)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits_exact = 0
+        self.hits_semantic = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._matrix: Optional[Tuple[Tuple[str, int], List[int], List[frozenset], np.ndarray]] = None
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "id INTEGER PRIMARY KEY, scope TEXT NOT NULL, generation INTEGER NOT NULL, "
+            "question TEXT NOT NULL, normalized TEXT NOT NULL, vector BLOB, "
+            "answer TEXT NOT NULL, sources TEXT NOT NULL, last_used REAL NOT NULL, "
+            "UNIQUE (scope, generation, normalized))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers(last_used)")
+        self._conn.commit()
+
+    def _purge_stale(self, generation: int):
+        deleted = self._conn.execute("DELETE FROM answers WHERE generation != ?", (generation,)).rowcount
+        if deleted:
+            self._matrix = None
+            logger.info(f"Cache des réponses: {deleted} entrée(s) d'une autre génération de l'index purgée(s)")
+
+    def _touch(self, row_id: int) -> Dict[str, Any]:
+        self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), row_id))
+        self._conn.commit()
+        question, answer, sources = self._conn.execute(
+            "SELECT question, answer, sources FROM answers WHERE id = ?", (row_id,)
+        ).fetchone()
+        return {"question": question, "reponse": answer, "sources": json.loads(sources)}
+
+    def get_exact(self, question: str, scope: str, generation: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._purge_stale(generation)
+            row = self._conn.execute(
+                "SELECT id FROM answers WHERE scope = ? AND generation = ? AND normalized = ?",
+                (scope, generation, normalize_question(question)),
+            ).fetchone()
+            if row is None:
+                return None
+            self.hits_exact += 1
+            return self._touch(row[0])
+
+    def _vectors(self, scope: str, generation: int) -> Tuple[List[int], List[frozenset], np.ndarray]:
+        if self._matrix is None or self._matrix[0] != (scope, generation):
+            rows = self._conn.execute(
+                "SELECT id, question, vector FROM answers WHERE scope = ? AND generation = ? AND vector IS NOT NULL",
+                (scope, generation),
+            ).fetchall()
+            ids = [r[0] for r in rows]
+            keys = [question_keys(r[1]) for r in rows]
+            mat = np.stack([np.frombuffer(r[2], dtype=np.float32) for r in rows]) if rows else np.empty((0, 0))
+            self._matrix = ((scope, generation), ids, keys, mat)
+        return self._matrix[1], self._matrix[2], self._matrix[3]
+
+    def get_similar(
+        self, question: str, vector: List[float], scope: str, generation: int
+    ) -> Optional[Dict[str, Any]]:
+        """Réponse d'une question proche citant les mêmes identifiants, ou None ; compte un échec si aucune n'est trouvée."""
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) + 1e-12
+        wanted = question_keys(question)
+        with self._lock:
+            ids, keys, mat = self._vectors(scope, generation)
+            if ids and mat.shape[1] == query.shape[0]:
+                sims = mat @ query
+                for best in np.argsort(-sims):
+                    if sims[best] < self.threshold:
+                        break
+                    if keys[best] == wanted:
+                        self.hits_semantic += 1
+                        return {**self._touch(ids[best]), "similarite": round(float(sims[best]), 4)}
+            self.misses += 1
+            return None
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(
+        self, question: str, vector: Optional[List[float]], answer: str, sources: List[str], scope: str, generation: int
+    ):
+        blob = None
+        if vector is not None:
+            vec = np.asarray(vector, dtype=np.float32)
+            blob = (vec / (np.linalg.norm(vec) + 1e-12)).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(scope, generation, question, normalized, vector, answer, sources, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (scope, generation, question, normalize_question(question), blob, answer,
+                 json.dumps(sources, ensure_ascii=False), time.time()),
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_used LIMIT ?)", (excess,)
+                )
+            self._conn.commit()
+            self._matrix = None
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits_exact + self.hits_semantic + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return {
+            "entrees": entries,
+            "hits_exact": self.hits_exact,
+            "hits_semantique": self.hits_semantic,
+            "misses": self.misses,
+            "taux_succes": round((self.hits_exact + self.hits_semantic) / total, 4) if total else 0.0,
+        }
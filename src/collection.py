@@ -0,0 +1,76 @@
+"""Collections nommées : un dossier de documents et un index par jeu de spécifications."""
+import json
+import re
+from pathlib import Path
+from typing import List, Optional
+
+from config import settings
+
+DEFAULT = "default"
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+# Dossier des documents d'une collection, s'il est hors de collections_path
+COLLECTION_FILE = "collection.json"
+
+
+class Collection:
+    """Dossiers d'une collection.
+
+    La collection par défaut utilise `documents_path` et `vector_store_path` ;
+    les autres sont rangées sous `collections_path/<nom>/` (`documents/` et
+    `vector_store/`). Les caches d'embeddings et de réponses du LLM, indexés
+    par le texte, restent communs dans `vector_store_path`.
+
+    `documents_path` rattache la collection à un dossier existant (dossier de
+    spécifications d'un dépôt) ; il est enregistré dans `collection.json`
+    et retrouvé ensuite à partir du seul nom.
+    """
+
+    def __init__(self, name: Optional[str] = None, documents_path: Optional[Path] = None):
+        name = name or DEFAULT
+        if not _NAME.match(name):
+            raise ValueError(f"Nom de collection invalide: {name} (lettres, chiffres, '.', '_' et '-')")
+        self.name = name
+        if name == DEFAULT:
+            self.documents_path = settings.documents_path
+            self.vector_store_path = settings.vector_store_path
+        else:
+            self.root = settings.collections_path / name
+            self.documents_path = self.root / "documents"
+            self.vector_store_path = self.root / "vector_store"
+            try:
+                config = json.loads((self.root / COLLECTION_FILE).read_text(encoding="utf-8"))
+                self.documents_path = Path(config["documents_path"])
+            except (OSError, ValueError, KeyError):
+                pass
+        self._linked = documents_path is not None
+        if self._linked:
+            if name == DEFAULT:
+                raise ValueError("La collection par défaut utilise DOCUMENTS_PATH.")
+            self.documents_path = Path(documents_path).resolve()
+
+    def create(self) -> "Collection":
+        self.documents_path.mkdir(parents=True, exist_ok=True)
+        self.vector_store_path.mkdir(parents=True, exist_ok=True)
+        if self._linked:
+            (self.root / COLLECTION_FILE).write_text(
+                json.dumps({"documents_path": str(self.documents_path)}, ensure_ascii=False), encoding="utf-8"
+            )
+        return self
+
+    def __repr__(self) -> str:
+        return f"Collection({self.name!r})"
+
+
+def collection_name(label: str) -> str:
+    """Nom de collection valide dérivé d'un libellé (nom de dossier)."""
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).lstrip("._-")[:64]
+    return name or "collection"
+
+
+def list_collections() -> List[str]:
+    """Collection par défaut, puis les collections existantes par ordre alphabétique."""
+    root: Path = settings.collections_path
+    if not root.is_dir():
+        return [DEFAULT]
+    names = sorted(p.name for p in root.iterdir() if p.is_dir() and _NAME.match(p.name) and p.name != DEFAULT)
+    return [DEFAULT] + names
@@ -0,0 +1,75 @@
+"""Construction du contexte : diversification MMR et remplissage sous budget de tokens."""
+import hashlib
+import json
+from pathlib import Path
+from typing import List, Tuple
+import numpy as np
+from langchain_core.documents import Document
+
+from src.tokens import count_tokens
+
+
+# Longueur de l'empreinte d'un chunk citée au LLM dans les contextes de revue
+REF_LENGTH = 8
+
+
+def chunk_fingerprint(doc: Document) -> str:
+    """Empreinte du contenu d'un chunk (celle calculée au découpage, sinon recalculée)."""
+    return doc.metadata.get("content_hash") or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()[:16]
+
+
+def doc_files(doc: Document) -> List[str]:
+    """Fichiers où figure le chunk : ceux de `locations` (doublons écartés avant embedding compris), sinon le sien."""
+    locations = json.loads(doc.metadata.get("locations") or "[]")
+    if not locations:
+        return [doc.metadata.get("file_name", "?")]
+    return list(dict.fromkeys(Path(loc.get("source", "?")).name for loc in locations))
+
+
+def format_doc(doc: Document, ref: bool = False) -> str:
+    """Passage tel que placé dans le prompt ; `ref` ajoute la référence du chunk, que la revue cite."""
+    files = ", ".join(doc_files(doc))
+    if ref:
+        return f"[{files} | réf {chunk_fingerprint(doc)[:REF_LENGTH]}]\n{doc.page_content}"
+    return f"[{files}]\n{doc.page_content}"
+
+
+def pack_context(
+    candidates: List[Tuple[Document, float]],
+    vectors: List[List[float]],
+    budget_tokens: int,
+    mmr_lambda: float = 0.7,
+    min_score: float = 0.0,
+    model: str = "gpt-4o",
+) -> List[Tuple[Document, float]]:
+    """Sélectionne les passages à placer dans le prompt.
+
+    Les candidats sous `min_score` sont écartés, les autres sont ordonnés par
+    pertinence marginale maximale (MMR) puis ajoutés tant que le budget de
+    tokens le permet ; un passage trop long est sauté au profit des suivants.
+    """
+    keep = [i for i, (_, score) in enumerate(candidates) if score >= min_score]
+    if not keep:
+        return []
+    scores = np.array([candidates[i][1] for i in keep], dtype=np.float32)
+    mat = np.asarray([vectors[i] for i in keep], dtype=np.float32)
+    mat /= np.linalg.norm(mat, axis=1, keepdims=True) + 1e-12
+    sim = mat @ mat.T
+
+    selected: List[int] = []
+    remaining = list(range(len(keep)))
+    max_sim = np.full(len(keep), -np.inf, dtype=np.float32)
+    used = 0
+    while remaining:
+        rem = np.array(remaining)
+        redundancy = np.where(np.isfinite(max_sim[rem]), max_sim[rem], 0.0)
+        mmr = mmr_lambda * scores[rem] - (1 - mmr_lambda) * redundancy
+        best = int(rem[int(np.argmax(mmr))])
+        remaining.remove(best)
+        n = count_tokens(format_doc(candidates[keep[best]][0]), model) + 2
+        if used + n > budget_tokens:
+            continue
+        used += n
+        selected.append(best)
+        max_sim = np.maximum(max_sim, sim[best])
+    return [candidates[keep[i]] for i in selected]
@@ -0,0 +1,135 @@
+"""Détection de doublons entre chunks : empreinte exacte, quasi-doublons en option (MinHash + LSH par bandes)."""
+import re
+import sqlite3
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+_MERSENNE = np.uint64((1 << 31) - 1)
+
+
+def _shingles(text: str, size: int) -> np.ndarray:
+    words = re.sub(r"\s+", " ", text.lower()).strip().split(" ")
+    if len(words) <= size:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i : i + size]) for i in range(len(words) - size + 1)]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class NearDuplicateDetector:
+    """Regroupe les chunks identiques autour d'un représentant.
+
+    Les doublons exacts sont repérés par empreinte de contenu. Avec `threshold`
+    < 1, les quasi-doublons le sont aussi : chaque chunk reçoit une signature
+    MinHash de `num_perm` valeurs calculée en une opération vectorisée ; les
+    signatures sont découpées en `bands` bandes et deux chunks partageant une
+    bande sont comparés. Au-delà de `threshold` (similarité de Jaccard
+    estimée), le second est un doublon du premier : il n'est ni indexé ni revu,
+    même s'il ne diffère que par une valeur (« délai 30 s » / « 60 s »).
+
+    Empreintes et signatures sont tenues dans une base SQLite temporaire (sur
+    disque, cache borné) : la mémoire ne croît pas avec la taille du corpus.
+    `indexed` retrouve un chunk de même empreinte déjà indexé par une
+    synchronisation précédente : les doublons exacts sont aussi écartés entre
+    deux flux d'indexation.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 1.0,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        indexed: Optional[Callable[[str], Optional[str]]] = None,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm doit être un multiple de bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.indexed = indexed
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, int(_MERSENNE), size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE), size=(num_perm, 1), dtype=np.uint64)
+        # Chaîne vide : base temporaire privée, supprimée à la fermeture
+        self._db = sqlite3.connect("", check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE exact (hash TEXT PRIMARY KEY, rep TEXT NOT NULL);
+            CREATE TABLE signatures (rowid INTEGER PRIMARY KEY, rep TEXT NOT NULL, sig BLOB NOT NULL);
+            CREATE TABLE bands (band INTEGER NOT NULL, bkey BLOB NOT NULL, sig INTEGER NOT NULL);
+            CREATE INDEX bands_key ON bands (band, bkey);
+            """
+        )
+        self.duplicates = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        shingles = _shingles(text, self.shingle_size)
+        return ((self._a * shingles[None, :] + self._b) % _MERSENNE).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        return [sig[i * self.rows : (i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _near(self, key: str, text: str) -> Optional[str]:
+        """Représentant quasi identique à `text`, sinon enregistre la signature de `key` et retourne None."""
+        sig = self.signature(text)
+        band_keys = self._band_keys(sig)
+        where = " OR ".join(["(b.band = ? AND b.bkey = ?)"] * self.bands)
+        params = [v for band in enumerate(band_keys) for v in band]
+        for cand, blob in self._db.execute(
+            f"SELECT DISTINCT s.rep, s.sig FROM bands b JOIN signatures s ON s.rowid = b.sig WHERE {where} ORDER BY s.rowid",
+            params,
+        ):
+            if float(np.mean(np.frombuffer(blob, dtype=np.uint32) == sig)) >= self.threshold:
+                return cand
+        row = self._db.execute("INSERT INTO signatures (rep, sig) VALUES (?, ?)", (key, sig.tobytes())).lastrowid
+        self._db.executemany(
+            "INSERT INTO bands (band, bkey, sig) VALUES (?, ?, ?)", [(i, bkey, row) for i, bkey in enumerate(band_keys)]
+        )
+        return None
+
+    def find_or_add(self, key: str, text: str, content_hash: str) -> Optional[str]:
+        """Retourne le représentant dont `text` est un doublon, ou None (le chunk devient représentant)."""
+        row = self._db.execute("SELECT rep FROM exact WHERE hash = ?", (content_hash,)).fetchone()
+        if row is not None:
+            self.duplicates += 1
+            return row[0]
+        rep = self.indexed(content_hash) if self.indexed is not None else None
+        if rep is None and self.threshold < 1.0:
+            rep = self._near(key, text)
+        self._db.execute("INSERT INTO exact (hash, rep) VALUES (?, ?)", (content_hash, rep or key))
+        if rep is not None:
+            self.duplicates += 1
+        return rep
+
+
+def location(metadata: Dict) -> Dict:
+    return {"source": metadata.get("source", "?"), "chunk_index": metadata.get("chunk_index", 0)}
+
+
+Duplicates = Dict[str, List[Dict]]
+
+
+def collapse(
+    chunks: List, detector: Optional[NearDuplicateDetector], duplicates: Duplicates
+) -> Tuple[List, List[str]]:
+    """Écarte les doublons d'une liste de chunks.
+
+    Retourne (chunks à indexer, identifiant référencé par chaque chunk, dans
+    l'ordre : le sien ou celui de son représentant) ; les emplacements des
+    doublons sont ajoutés à `duplicates[représentant]`.
+    """
+    if detector is None:
+        return chunks, [c.id for c in chunks]
+    kept, ids = [], []
+    for chunk in chunks:
+        rep = detector.find_or_add(chunk.id, chunk.page_content, chunk.metadata["content_hash"])
+        if rep is None:
+            kept.append(chunk)
+            ids.append(chunk.id)
+        else:
+            duplicates.setdefault(rep, []).append(location(chunk.metadata))
+            ids.append(rep)
+    return kept, ids
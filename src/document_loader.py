@@ -1,18 +1,59 @@
 """Chargement et découpage des documents techniques."""
+import hashlib
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
-from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
+from typing import Iterable, Iterator, List, Optional, Tuple
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 import logging
 
+from src.metrics import Metrics
+
 logger = logging.getLogger(__name__)
 
 
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".docx", ".doc")
+
+
+def load_file(file_path: Path) -> List[Document]:
+    file_path = Path(file_path)
+    if not file_path.exists():
+        raise FileNotFoundError(f"Fichier introuvable: {file_path}")
+    ext = file_path.suffix.lower()
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader
+    if ext == ".pdf":
+        loader = PyPDFLoader(str(file_path))
+    elif ext == ".txt":
+        loader = TextLoader(str(file_path), encoding="utf-8")
+    elif ext in (".docx", ".doc"):
+        loader = Docx2txtLoader(str(file_path))
+    else:
+        raise ValueError(f"Format non supporté: {ext}")
+    docs = loader.load()
+    for d in docs:
+        d.metadata["source"] = str(file_path)
+        d.metadata["file_name"] = file_path.name
+    return docs
+
+
+def _load_file_safe(file_path: Path) -> Tuple[List[Document], Optional[str]]:
+    """Variante pour les processus de travail : l'erreur est renvoyée, pas levée."""
+    try:
+        return load_file(file_path), None
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+
 class DocumentLoader:
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, workers: int = 1, metrics: Optional[Metrics] = None):
         self.chunk_size = chunk_size
+        self.metrics = metrics or Metrics()
         self.chunk_overlap = chunk_overlap
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.errors: List[Tuple[Path, str]] = []
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
@@ -21,36 +62,75 @@ class DocumentLoader:
         )
 
     def load_document(self, file_path: Path) -> List[Document]:
-        file_path = Path(file_path)
-        if not file_path.exists():
-            raise FileNotFoundError(f"Fichier introuvable: {file_path}")
-        ext = file_path.suffix.lower()
-        if ext == ".pdf":
-            loader = PyPDFLoader(str(file_path))
-        elif ext == ".txt":
-            loader = TextLoader(str(file_path), encoding="utf-8")
-        elif ext in (".docx", ".doc"):
-            loader = Docx2txtLoader(str(file_path))
-        else:
-            raise ValueError(f"Format non supporté: {ext}")
-        docs = loader.load()
-        for d in docs:
-            d.metadata["source"] = str(file_path)
-            d.metadata["file_name"] = file_path.name
-        return docs
+        return load_file(file_path)
 
-    def load_directory(self, directory_path: Path) -> List[Document]:
+    def list_files(self, directory_path: Path) -> List[Path]:
+        """Fichiers supportés du dossier et de ses sous-dossiers, triés."""
         directory_path = Path(directory_path)
         if not directory_path.exists():
             raise FileNotFoundError(f"Dossier introuvable: {directory_path}")
+        return sorted(
+            f for f in directory_path.rglob("*") if f.is_file() and f.suffix.lower() in SUPPORTED_EXTENSIONS
+        )
+
+    def iter_files(self, files: Iterable[Path]) -> Iterator[Tuple[Path, List[Document]]]:
+        """Charge les fichiers dans un pool de processus et les produit un par un, dans l'ordre donné.
+
+        Au plus `2 * workers` fichiers sont en cours à la fois, la mémoire ne
+        dépend donc pas de la taille du corpus. Un fichier illisible n'interrompt
+        pas le chargement : il est ignoré et l'erreur est consignée dans `self.errors`.
+
+        Les processus sont lancés par "spawn" et non par fork : l'appelant peut
+        avoir des threads (Streamlit, revues parallèles) dont un verrou tenu au
+        moment du fork bloquerait l'enfant.
+        """
+        files = iter(Path(f) for f in files)
+        self.errors = []
+        if self.workers == 1:
+            for f in files:
+                with self.metrics.stage("chargement"):
+                    result = _load_file_safe(f)
+                yield from self._collect(f, result)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            window = deque()
+            for f in files:
+                window.append((f, pool.submit(_load_file_safe, f)))
+                if len(window) >= 2 * self.workers:
+                    break
+            while window:
+                f, fut = window.popleft()
+                nxt = next(files, None)
+                if nxt is not None:
+                    window.append((nxt, pool.submit(_load_file_safe, nxt)))
+                with self.metrics.stage("chargement"):
+                    result = fut.result()
+                yield from self._collect(f, result)
+
+    def _collect(self, file_path: Path, result: Tuple[List[Document], Optional[str]]):
+        docs, error = result
+        if error:
+            logger.warning(f"Skip {file_path}: {error}")
+            self.errors.append((file_path, error))
+        else:
+            self.metrics.incr("fichiers_charges")
+            yield file_path, docs
+
+    def load_directory(self, directory_path: Path) -> List[Document]:
         all_docs = []
-        for f in directory_path.iterdir():
-            if f.is_file() and f.suffix.lower() in (".pdf", ".txt", ".docx", ".doc"):
-                try:
-                    all_docs.extend(self.load_document(f))
-                except Exception as e:
-                    logger.warning(f"Skip {f}: {e}")
+        for _, docs in self.iter_files(self.list_files(directory_path)):
+            all_docs.extend(docs)
         return all_docs
 
+    def iter_chunks(self, loaded: Iterable[Tuple[Path, List[Document]]]) -> Iterator[Tuple[Path, List[Document]]]:
+        """Découpe paresseusement, fichier par fichier."""
+        for file_path, docs in loaded:
+            yield file_path, self.split_documents(docs)
+
     def split_documents(self, documents: List[Document]) -> List[Document]:
-        return self.text_splitter.split_documents(documents)
+        with self.metrics.stage("decoupage"):
+            chunks = self.text_splitter.split_documents(documents)
+            for chunk in chunks:
+                chunk.metadata["content_hash"] = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()[:16]
+        self.metrics.incr("chunks_produits", len(chunks))
+        return chunks
@@ -0,0 +1,136 @@
+"""Cache disque des embeddings (SQLite)."""
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+import logging
+
+from src.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CachedEmbeddings(Embeddings):
+    """Enveloppe un modèle d'embeddings avec un cache SQLite persistant.
+
+    Les vecteurs sont indexés par (modèle, SHA-256 du texte) et stockés en float32.
+    Au-delà de `max_bytes`, les entrées les moins récemment utilisées sont évincées.
+    """
+
+    def __init__(self, underlying: Embeddings, model: str, db_path: Path, max_bytes: int, metrics: Optional[Metrics] = None):
+        self.underlying = underlying
+        self.metrics = metrics
+        self.model = model
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[key] = vec.tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _put_many(self, items: Dict[str, List[float]]):
+        now = time.time()
+        rows = []
+        for key, vec in items.items():
+            blob = array("f", vec).tobytes()
+            rows.append((key, blob, len(blob), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            self._total_bytes += sum(r[2] for r in rows)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        while total > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_used LIMIT 200"
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for key, size in rows:
+                if total <= target:
+                    break
+                victims.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+            removed += len(victims)
+        self._conn.commit()
+        self._total_bytes = total
+        logger.info(f"Cache d'embeddings: {removed} entrée(s) évincée(s)")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        cached = self._get_many(list(dict.fromkeys(keys)))
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - sum(1 for k in keys if k in missing)
+        self.misses += len(missing)
+        if self.metrics is not None:
+            self.metrics.incr("cache_embeddings_hits", len(texts) - sum(1 for k in keys if k in missing))
+            self.metrics.incr("cache_embeddings_misses", len(missing))
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._put_many(computed)
+            cached.update(computed)
+        return [cached[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        cached = self._get_many([key])
+        if key in cached:
+            self.hits += 1
+            if self.metrics is not None:
+                self.metrics.incr("cache_embeddings_hits")
+            return cached[key]
+        self.misses += 1
+        if self.metrics is not None:
+            self.metrics.incr("cache_embeddings_misses")
+        vec = self.underlying.embed_query(text)
+        self._put_many({key: vec})
+        return vec
@@ -0,0 +1,121 @@
+"""Fabrique d'index FAISS (flat, IVF-Flat, IVF-PQ, HNSW) et réglages de recherche."""
+from typing import Optional
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Points d'entraînement minimaux par centroïde (en dessous, FAISS avertit et les listes sont mal équilibrées)
+_MIN_POINTS_PER_CENTROID = 39
+
+
+def needs_training(index_type: str) -> bool:
+    return index_type in ("ivf_flat", "ivf_pq")
+
+
+def _pq_m(dim: int, m: int) -> int:
+    """Plus grand nombre de sous-quantifieurs <= m qui divise la dimension."""
+    for candidate in range(min(m, dim), 0, -1):
+        if dim % candidate == 0:
+            return candidate
+    return 1
+
+
+def new_index(
+    dim: int,
+    index_type: str = "flat",
+    train_vectors: Optional[np.ndarray] = None,
+    nlist: int = 1024,
+    pq_m: int = 64,
+    hnsw_m: int = 32,
+    ef_construction: int = 200,
+):
+    """Crée un index vide (entraîné si nécessaire) en distance L2.
+
+    Les index IVF sont entraînés sur `train_vectors` ; le nombre de listes est
+    réduit si l'échantillon est trop petit. Sans échantillon suffisant (moins
+    de 9984 vecteurs pour IVF-PQ, moins de 39 pour IVF-Flat), un index flat est
+    créé : sur un si petit corpus, la recherche exhaustive reste la plus rapide.
+    """
+    import faiss
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        return index
+    if not needs_training(index_type):
+        return faiss.IndexFlatL2(dim)
+    n = 0 if train_vectors is None else len(train_vectors)
+    # IVF-PQ entraîne aussi 256 centroïdes par sous-quantifieur
+    if n < (256 if index_type == "ivf_pq" else 1) * _MIN_POINTS_PER_CENTROID:
+        logger.warning(f"Échantillon d'entraînement trop petit ({n} vecteurs) pour {index_type}, index flat utilisé")
+        return faiss.IndexFlatL2(dim)
+    nlist = max(1, min(nlist, n // _MIN_POINTS_PER_CENTROID))
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_m(dim, pq_m), 8)
+    index.train(np.ascontiguousarray(train_vectors, dtype=np.float32))
+    logger.info(f"Index {index_type} entraîné sur {n} vecteurs ({nlist} listes)")
+    return index
+
+
+def set_search_params(index, nprobe: int, ef_search: int):
+    """Applique nprobe (IVF) ou efSearch (HNSW) ; sans effet sur un index flat."""
+    import faiss
+
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+        return
+    try:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    except RuntimeError:
+        pass
+
+
+def search_params(index, nprobe: int, ef_search: int, selector):
+    """Paramètres d'une recherche restreinte aux positions de `selector`, avec le même nprobe/efSearch."""
+    import faiss
+
+    if hasattr(index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+    try:
+        faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return faiss.SearchParameters(sel=selector)
+    return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+
+
+def index_type_of(index) -> str:
+    """Type effectif d'un index (un index IVF peut avoir été remplacé par un flat)."""
+    import faiss
+
+    if hasattr(index, "hnsw"):
+        return "hnsw"
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return "flat"
+    # extract_index_ivf renvoie la classe de base : le type concret n'apparaît qu'après downcast
+    return "ivf_pq" if isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ) else "ivf_flat"
+
+
+def reconstruct(index, positions: np.ndarray) -> np.ndarray:
+    """Vecteurs stockés aux positions données.
+
+    Les index IVF n'ont pas de table position -> liste par défaut : elle est
+    construite au premier appel. Pour IVF-PQ, ce sont les approximations déjà
+    stockées : réinsérées, elles redonnent le même code.
+    """
+    import faiss
+
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None and ivf.direct_map.no():
+        ivf.make_direct_map()
+    return index.reconstruct_batch(np.asarray(positions, dtype=np.int64))
@@ -0,0 +1,458 @@
+"""Vector store FAISS sans pickle : segments d'index mappés en mémoire, docstore SQLite lu à la demande."""
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+import logging
+
+from src.faiss_index import index_type_of, needs_training, new_index, reconstruct, search_params, set_search_params
+from src.locks import ReadWriteLock
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+TEMPLATE_FILE = "empty.faiss"
+DOCSTORE_FILE = "docstore.sqlite"
+META_FILE = "meta.json"
+LEGACY_FILE = "index.pkl"
+
+# Au-delà de cette part de vecteurs supprimés, les segments sont fusionnés à l'enregistrement
+COMPACT_RATIO = 0.25
+# Vecteurs reconstruits à la fois lors d'une fusion
+_RECONSTRUCT_BATCH = 65536
+
+
+def _mmap_flags(index_type: str) -> int:
+    import faiss
+
+    # Listes inversées IVF mappées telles quelles ; codes des index flat/HNSW mappés sans copie
+    return faiss.IO_FLAG_MMAP if needs_training(index_type) else faiss.IO_FLAG_MMAP_IFC
+
+
+def _segment_file(seg_id: int) -> str:
+    return f"seg_{seg_id:06d}.faiss"
+
+
+def _placeholders(values: List) -> str:
+    return ",".join("?" * len(values))
+
+
+class FaissStore(VectorStore):
+    """Index FAISS en segments et docstore SQLite dans un même dossier.
+
+    Chaque enregistrement écrit les vecteurs ajoutés depuis le précédent dans un
+    nouveau segment : le coût d'un ajout est proportionnel à l'ajout, pas à
+    l'index. Un segment écrit n'est plus modifié ; il est mappé en mémoire
+    (aucune copie au chargement). Les recherches interrogent chaque segment et
+    fusionnent les résultats par distance ; elles s'exécutent en parallèle,
+    seules les écritures sont exclusives.
+
+    Le docstore associe chaque chunk à sa position (`seg`, `pos`) ; le texte n'est
+    lu que pour les résultats retenus. Une suppression retire la ligne ; le
+    vecteur, filtré des recherches par la liste des positions vivantes, reste
+    jusqu'à la fusion des segments (`compact`), lancée à la demande ; elle est
+    signalée à l'enregistrement au-delà de `max_segments` segments ou de 25 % de
+    vecteurs supprimés. La liste des segments est dans le docstore : un segment
+    n'existe qu'une fois la transaction validée.
+    """
+
+    def __init__(
+        self, embedding: Embeddings, path: Path, nprobe: int = 16, ef_search: int = 64, max_segments: int = 8
+    ):
+        self.embedding = embedding
+        self.path = Path(path)
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.max_segments = max_segments
+        meta = json.loads((self.path / META_FILE).read_text(encoding="utf-8"))
+        self._flags = _mmap_flags(meta["index_type"])
+        self._lock = ReadWriteLock()
+        # Reconstruire un vecteur IVF peut construire la table position -> liste de l'index
+        self._reconstruct_lock = threading.Lock()
+        # Filtre des positions vivantes par segment, valable pour (ntotal, live)
+        self._selectors: Dict[int, Tuple[Tuple[int, int], np.ndarray, Any]] = {}
+        self._selectors_lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path / DOCSTORE_FILE), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY, ntotal INTEGER NOT NULL, live INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                seg INTEGER NOT NULL, pos INTEGER NOT NULL, id TEXT UNIQUE NOT NULL,
+                content TEXT NOT NULL, metadata TEXT NOT NULL, PRIMARY KEY (seg, pos)
+            );
+            CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                UPDATE segments SET live = live + 1 WHERE id = new.seg;
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                UPDATE segments SET live = live - 1 WHERE id = old.seg;
+            END;
+            """
+        )
+        self._conn.commit()
+        self._segments: Dict[int, Any] = {
+            seg_id: self._open_segment(seg_id)
+            for (seg_id,) in self._conn.execute("SELECT id FROM segments ORDER BY id").fetchall()
+        }
+        # Segment en cours d'écriture (en RAM), écrit par le prochain `save()`
+        self._active: Optional[int] = None
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding
+
+    @staticmethod
+    def is_legacy(path: Path) -> bool:
+        """Dossier au format LangChain (docstore picklé), non relu pour raisons de sécurité."""
+        path = Path(path)
+        return (path / LEGACY_FILE).exists() and not (path / META_FILE).exists()
+
+    @classmethod
+    def create(
+        cls, embedding: Embeddings, index, path: Path, nprobe: int = 16, ef_search: int = 64, max_segments: int = 8
+    ) -> "FaissStore":
+        """Store vide ; `index` (vide, entraîné si nécessaire) sert de modèle à chaque segment."""
+        import faiss
+
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        faiss.write_index(index, str(path / TEMPLATE_FILE))
+        meta = {"format": FORMAT_VERSION, "dimension": index.d, "index_type": index_type_of(index)}
+        (path / META_FILE).write_text(json.dumps(meta), encoding="utf-8")
+        return cls(embedding, path, nprobe, ef_search, max_segments)
+
+    @classmethod
+    def load(
+        cls, path: Path, embedding: Embeddings, nprobe: int = 16, ef_search: int = 64, max_segments: int = 8
+    ) -> Optional["FaissStore"]:
+        path = Path(path)
+        if not (path / META_FILE).exists():
+            return None
+        meta = json.loads((path / META_FILE).read_text(encoding="utf-8"))
+        if meta.get("format") != FORMAT_VERSION:
+            logger.warning(f"Index FAISS au format {meta.get('format')} (attendu {FORMAT_VERSION}), il sera reconstruit")
+            return None
+        return cls(embedding, path, nprobe, ef_search, max_segments)
+
+    # --- segments ---
+
+    def _open_segment(self, seg_id: int):
+        import faiss
+
+        index = faiss.read_index(str(self.path / _segment_file(seg_id)), self._flags)
+        set_search_params(index, self.nprobe, self.ef_search)
+        return index
+
+    def _new_segment_index(self):
+        import faiss
+
+        index = faiss.read_index(str(self.path / TEMPLATE_FILE))
+        set_search_params(index, self.nprobe, self.ef_search)
+        return index
+
+    def _write_segment(self, seg_id: int, index):
+        import faiss
+
+        tmp = self.path / (_segment_file(seg_id) + ".tmp")
+        faiss.write_index(index, str(tmp))
+        os.replace(tmp, self.path / _segment_file(seg_id))
+
+    def _remove_orphans(self):
+        """Fichiers de segments absents du docstore (fusionnés, ou écrits avant un arrêt brutal)."""
+        keep = {_segment_file(seg_id) for seg_id in self._segments}
+        for fp in self.path.glob("seg_*.faiss*"):
+            if fp.name not in keep:
+                fp.unlink(missing_ok=True)
+
+    def _dead(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(ntotal - live), 0) FROM segments").fetchone()[0]
+
+    def _ntotal(self) -> int:
+        return sum(index.ntotal for index in self._segments.values())
+
+    # --- écriture ---
+
+    def add_embeddings(
+        self, vectors: List[List[float]], documents: List[Document], ids: List[str]
+    ) -> List[str]:
+        """Ajoute des vecteurs au segment en cours ; un identifiant existant est remplacé."""
+        with self._lock.write():
+            if self._active is None:
+                self._active = max(self._segments, default=-1) + 1
+                self._segments[self._active] = self._new_segment_index()
+                self._conn.execute("INSERT INTO segments (id, ntotal, live) VALUES (?, 0, 0)", (self._active,))
+            index = self._segments[self._active]
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+            start = index.ntotal
+            index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+            self._conn.executemany(
+                "INSERT INTO chunks (seg, pos, id, content, metadata) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (self._active, start + n, i, d.page_content, json.dumps(d.metadata, ensure_ascii=False, default=str))
+                    for n, (i, d) in enumerate(zip(ids, documents))
+                ],
+            )
+            self._conn.execute("UPDATE segments SET ntotal = ? WHERE id = ?", (index.ntotal, self._active))
+        return ids
+
+    def add_texts(
+        self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        documents = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+        return self.add_embeddings(self.embedding.embed_documents(texts), documents, ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs) -> Optional[bool]:
+        """Supprime des chunks (identifiants inconnus ignorés) ; le vecteur reste jusqu'à la fusion."""
+        if not ids:
+            return False
+        with self._lock.write():
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+        return True
+
+    def update_metadata(self, updates: Dict[str, Dict]):
+        with self._lock.write():
+            for doc_id, fields in updates.items():
+                row = self._conn.execute("SELECT metadata FROM chunks WHERE id = ?", (doc_id,)).fetchone()
+                if row is None:
+                    continue
+                merged = {**json.loads(row[0]), **fields}
+                self._conn.execute(
+                    "UPDATE chunks SET metadata = ? WHERE id = ?",
+                    (json.dumps(merged, ensure_ascii=False, default=str), doc_id),
+                )
+
+    def compact(self) -> Dict[str, int]:
+        """Fusionne tous les segments en un seul, sans les vecteurs supprimés."""
+        with self._lock.write():
+            return self._compact()
+
+    def _compact(self) -> Dict[str, int]:
+        before, dead = len(self._segments), self._dead()
+        if before <= 1 and not dead:
+            self._remove_orphans()
+            return {"segments_avant": before, "segments_apres": before, "vecteurs_retires": 0}
+        new_id = max(self._segments) + 1
+        merged = self._new_segment_index()
+        try:
+            for seg_id, index in self._segments.items():
+                positions = [
+                    r[0] for r in self._conn.execute("SELECT pos FROM chunks WHERE seg = ? ORDER BY pos", (seg_id,))
+                ]
+                for start in range(0, len(positions), _RECONSTRUCT_BATCH):
+                    part = positions[start : start + _RECONSTRUCT_BATCH]
+                    base = merged.ntotal
+                    merged.add(reconstruct(index, part))
+                    self._conn.executemany(
+                        "UPDATE chunks SET seg = ?, pos = ? WHERE seg = ? AND pos = ?",
+                        [(new_id, base + n, seg_id, pos) for n, pos in enumerate(part)],
+                    )
+            self._write_segment(new_id, merged)
+            self._conn.execute("DELETE FROM segments")
+            self._conn.execute(
+                "INSERT INTO segments (id, ntotal, live) VALUES (?, ?, ?)", (new_id, merged.ntotal, merged.ntotal)
+            )
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+        self._segments = {new_id: self._open_segment(new_id)}
+        with self._selectors_lock:
+            self._selectors.clear()
+        self._active = None
+        self._remove_orphans()
+        logger.info(f"Index FAISS compacté: {before} segment(s) fusionné(s), {dead} vecteur(s) supprimé(s) retiré(s)")
+        return {"segments_avant": before, "segments_apres": 1, "vecteurs_retires": dead}
+
+    def _compaction_due(self) -> bool:
+        total = self._ntotal()
+        return len(self._segments) > self.max_segments or bool(total and self._dead() > COMPACT_RATIO * total)
+
+    @property
+    def compaction_due(self) -> bool:
+        """Trop de segments ou de vecteurs supprimés : une fusion (`compact`) est recommandée."""
+        with self._lock.read():
+            return self._compaction_due()
+
+    def save(self):
+        """Écrit le segment en cours puis valide le docstore.
+
+        Le coût reste celui de l'ajout : la fusion des segments, proportionnelle à
+        tout l'index, n'est jamais lancée ici, seulement signalée quand elle est due.
+        """
+        with self._lock.write():
+            if self._active is not None:
+                self._write_segment(self._active, self._segments[self._active])
+                # Rouvert mappé en mémoire : la copie en RAM est libérée
+                self._segments[self._active] = self._open_segment(self._active)
+                self._active = None
+            self._conn.commit()
+            if self._compaction_due():
+                logger.warning(
+                    f"Index FAISS : {len(self._segments)} segment(s), {self._dead()} vecteur(s) supprimé(s) ; "
+                    "fusion recommandée (python cli.py compact)"
+                )
+
+    def close(self):
+        """Ferme le docstore ; les écritures non enregistrées sont abandonnées."""
+        with self._lock.write():
+            self._conn.close()
+
+    # --- lecture ---
+
+    @staticmethod
+    def _row_to_doc(row) -> Document:
+        doc_id, content, metadata = row
+        return Document(id=doc_id, page_content=content, metadata=json.loads(metadata))
+
+    def __len__(self) -> int:
+        with self._lock.read():
+            return self._conn.execute("SELECT COALESCE(SUM(live), 0) FROM segments").fetchone()[0]
+
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        if not ids:
+            return []
+        with self._lock.read():
+            rows = {}
+            for start in range(0, len(ids), 500):
+                part = ids[start : start + 500]
+                for row in self._conn.execute(
+                    f"SELECT id, content, metadata FROM chunks WHERE id IN ({_placeholders(part)})", part
+                ):
+                    rows[row[0]] = row
+        return [self._row_to_doc(rows[i]) for i in ids if i in rows]
+
+    def get_vectors(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Vecteurs stockés des identifiants présents (approchés pour IVF-PQ)."""
+        with self._lock.read():
+            by_seg: Dict[int, List[Tuple[int, str]]] = {}
+            for start in range(0, len(ids), 500):
+                part = ids[start : start + 500]
+                for doc_id, seg_id, pos in self._conn.execute(
+                    f"SELECT id, seg, pos FROM chunks WHERE id IN ({_placeholders(part)})", part
+                ):
+                    by_seg.setdefault(seg_id, []).append((pos, doc_id))
+            vectors = {}
+            for seg_id, rows in by_seg.items():
+                with self._reconstruct_lock:
+                    found = reconstruct(self._segments[seg_id], [pos for pos, _ in rows])
+                vectors.update((doc_id, vector) for (_, doc_id), vector in zip(rows, found))
+        return vectors
+
+    def iter_documents(self, page_size: int = 1000) -> Iterator[Document]:
+        last = (-1, -1)
+        while True:
+            with self._lock.read():
+                rows = self._conn.execute(
+                    "SELECT seg, pos, id, content, metadata FROM chunks WHERE (seg, pos) > (?, ?) "
+                    "ORDER BY seg, pos LIMIT ?",
+                    (*last, page_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._row_to_doc(row[2:])
+            last = rows[-1][:2]
+
+    def _live_filter(self, seg_id: int, ntotal: int, live: int) -> Tuple[np.ndarray, Any]:
+        """Bitmap des positions vivantes d'un segment et son filtre FAISS, recalculés quand ses compteurs changent.
+
+        Le filtre ne garde que l'adresse du bitmap : l'appelant conserve le couple
+        pendant toute la recherche, même si une autre recherche remplace l'entrée du cache.
+        """
+        import faiss
+
+        with self._selectors_lock:
+            cached = self._selectors.get(seg_id)
+            if cached is None or cached[0] != (ntotal, live):
+                positions = np.fromiter(
+                    (r[0] for r in self._conn.execute("SELECT pos FROM chunks WHERE seg = ?", (seg_id,))),
+                    dtype=np.int64,
+                )
+                bitmap = np.zeros((ntotal + 7) // 8, dtype=np.uint8)
+                np.bitwise_or.at(bitmap, positions >> 3, np.left_shift(1, positions & 7).astype(np.uint8))
+                cached = ((ntotal, live), bitmap, faiss.IDSelectorBitmap(ntotal, faiss.swig_ptr(bitmap)))
+                self._selectors[seg_id] = cached
+        return cached[1], cached[2]
+
+    def search_vectors(self, vectors: List[List[float]], k: int) -> List[List[Tuple[Document, float]]]:
+        """Les k plus proches voisins de chaque vecteur, tous segments confondus, avec leur distance L2²."""
+        queries = np.ascontiguousarray(vectors, dtype=np.float32)
+        candidates: List[List[Tuple[float, int, int]]] = [[] for _ in range(len(queries))]
+        with self._lock.read():
+            counts = {
+                seg_id: (ntotal, live)
+                for seg_id, ntotal, live in self._conn.execute("SELECT id, ntotal, live FROM segments")
+            }
+            for seg_id, index in self._segments.items():
+                ntotal, live = counts.get(seg_id, (index.ntotal, index.ntotal))
+                if not live:
+                    continue
+                # Vecteurs supprimés exclus par FAISS lui-même : k voisins suffisent, quel que soit leur nombre
+                # Le bitmap reste référencé par `live_filter` jusqu'à la fin de la recherche
+                params, live_filter = None, None
+                if live < ntotal:
+                    live_filter = self._live_filter(seg_id, ntotal, live)
+                    params = search_params(index, self.nprobe, self.ef_search, live_filter[1])
+                distances, positions = index.search(queries, min(index.ntotal, k), params=params)
+                for q, (row_d, row_p) in enumerate(zip(distances, positions)):
+                    candidates[q].extend((float(d), seg_id, int(p)) for d, p in zip(row_d, row_p) if p >= 0)
+            best = [sorted(c)[:k] for c in candidates]
+            # Texte et métadonnées lus pour les seuls résultats retenus
+            docs = {}
+            for seg_id, pos in {(s, p) for hits in best for _, s, p in hits}:
+                row = self._conn.execute(
+                    "SELECT id, content, metadata FROM chunks WHERE seg = ? AND pos = ?", (seg_id, pos)
+                ).fetchone()
+                # Ligne absente : supprimée entre-temps par un autre processus
+                if row is not None:
+                    docs[(seg_id, pos)] = self._row_to_doc(row)
+        return [[(docs[(s, p)], d) for d, s, p in hits if (s, p) in docs] for hits in best]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[Tuple[Document, float]]:
+        return self.search_vectors([self.embedding.embed_query(query)], k)[0]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.search_vectors([embedding], k)[0]]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        path: Optional[Path] = None,
+        index_type: str = "flat",
+        **kwargs: Any,
+    ) -> "FaissStore":
+        """Store enregistré dans `path`, créé à partir de textes ; les index IVF sont entraînés sur leurs vecteurs.
+
+        `kwargs` : nprobe, ef_search, max_segments (cf. `create`).
+        """
+        if path is None:
+            raise ValueError("FaissStore.from_texts: `path` (dossier de l'index) est requis")
+        texts = list(texts)
+        if not texts:
+            raise ValueError("FaissStore.from_texts: aucun texte")
+        vectors = np.ascontiguousarray(embedding.embed_documents(texts), dtype=np.float32)
+        store = cls.create(embedding, new_index(vectors.shape[1], index_type, vectors), path, **kwargs)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        store.add_embeddings(vectors, [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)], ids)
+        store.save()
+        return store
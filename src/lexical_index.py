@@ -0,0 +1,122 @@
+"""Index lexical persistant (SQLite FTS5, classement BM25) tenu à côté du vector store."""
+import json
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+from langchain_core.documents import Document
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Identifiants (REQ-042, v2.1, 10_000) gardés d'un seul tenant : ils deviennent des phrases FTS5
+_TERM = re.compile(r"\w+(?:[-_./]\w+)*")
+
+
+def _match_query(text: str) -> str:
+    """Requête FTS5 : chaque terme entre guillemets, termes combinés par OR."""
+    terms = dict.fromkeys(t.lower() for t in _TERM.findall(text))
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+class LexicalIndex:
+    """Index inversé des chunks, classé par BM25, sans appel réseau.
+
+    Les chunks sont stockés dans une table ordinaire ; la table FTS5 en est un
+    index à contenu externe, maintenu par déclencheurs. Les termes composés
+    (« REQ-042 ») sont cherchés comme des phrases, ce qui les retrouve
+    exactement alors que la recherche dense les manque souvent.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                rowid INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, content TEXT NOT NULL, metadata TEXT NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                content, content='chunks', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts(rowid, content) VALUES (new.rowid, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+            END;
+            """
+        )
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def add(self, ids: List[str], documents: List[Document]):
+        """Ajoute ou remplace des chunks."""
+        rows = [
+            (i, d.page_content, json.dumps(d.metadata, ensure_ascii=False, default=str))
+            for i, d in zip(ids, documents)
+        ]
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(r[0],) for r in rows])
+            self._conn.executemany("INSERT INTO chunks (id, content, metadata) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def get(self, ids: List[str]) -> List[Document]:
+        """Chunks stockés pour ces identifiants, dans l'ordre donné (les absents sont ignorés)."""
+        rows = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                part = ids[start : start + 500]
+                rows.update(
+                    (i, (text, meta))
+                    for i, text, meta in self._conn.execute(
+                        f"SELECT id, content, metadata FROM chunks WHERE id IN ({','.join('?' * len(part))})", part
+                    )
+                )
+        return [Document(id=i, page_content=rows[i][0], metadata=json.loads(rows[i][1])) for i in ids if i in rows]
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+
+    def update_metadata(self, updates: Dict[str, Dict]):
+        with self._lock:
+            for doc_id, fields in updates.items():
+                row = self._conn.execute("SELECT metadata FROM chunks WHERE id = ?", (doc_id,)).fetchone()
+                if row is None:
+                    continue
+                merged = {**json.loads(row[0]), **fields}
+                self._conn.execute(
+                    "UPDATE chunks SET metadata = ? WHERE id = ?",
+                    (json.dumps(merged, ensure_ascii=False, default=str), doc_id),
+                )
+            self._conn.commit()
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        """Les k chunks les mieux classés par BM25 (score positif, plus grand = plus pertinent)."""
+        match = _match_query(query)
+        if not match:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.id, c.content, c.metadata, bm25(chunks_fts) AS score "
+                "FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid "
+                "WHERE chunks_fts MATCH ? ORDER BY score LIMIT ?",
+                (match, k),
+            ).fetchall()
+        return [
+            (Document(id=i, page_content=text, metadata=json.loads(meta)), -score)
+            for i, text, meta, score in rows
+        ]
@@ -0,0 +1,56 @@
+"""Verrou lecteurs/rédacteur partagé par le workflow web et le store FAISS."""
+import threading
+from contextlib import contextmanager
+from typing import Callable, List
+
+
+class ReadWriteLock:
+    """Verrou lecteurs/rédacteur ; un rédacteur en attente bloque les nouveaux lecteurs."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._on_idle: List[Callable[[], None]] = []
+
+    def when_idle(self, fn: Callable[[], None]):
+        """Exécute `fn` dès qu'aucun lecteur n'est actif (tout de suite s'il n'y en a pas)."""
+        with self._cond:
+            if self._readers:
+                self._on_idle.append(fn)
+                return
+        fn()
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            idle = []
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    idle, self._on_idle = self._on_idle, []
+                    self._cond.notify_all()
+            for fn in idle:
+                fn()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
@@ -0,0 +1,171 @@
+"""Manifeste d'indexation pour la réindexation incrémentale."""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(file_path: Path) -> str:
+    """Empreinte SHA-256 du contenu d'un fichier."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_ids_for(source: str, content_hashes: List[str]) -> List[str]:
+    """Identifiants déterministes des chunks d'un fichier : source, empreinte du chunk, rang.
+
+    Un chunk inchangé à la même place garde son identifiant quand le reste du
+    fichier est modifié : il n'est ni supprimé ni réindexé.
+    """
+    prefix = hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+    return [f"{prefix}-{h[:12]}-{i}" for i, h in enumerate(content_hashes)]
+
+
+class IndexManifest:
+    """Enregistre, pour chaque fichier indexé, son empreinte, son mtime et ses chunks."""
+
+    FILENAME = "manifest.json"
+
+    def __init__(self, index_path: Path, backend: str, embedding_model: str):
+        self.path = Path(index_path) / self.FILENAME
+        self.backend = backend
+        self.embedding_model = embedding_model
+        self.files: Dict[str, Dict] = {}
+        self.valid = False
+        self.load()
+
+    def load(self):
+        self.files = {}
+        self.valid = False
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Manifeste illisible, réindexation complète nécessaire: {e}")
+            return
+        if data.get("backend") != self.backend or data.get("embedding_model") != self.embedding_model:
+            logger.info("Manifeste associé à une autre configuration (backend ou modèle d'embedding).")
+            return
+        self.files = data.get("files", {})
+        self.valid = True
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"backend": self.backend, "embedding_model": self.embedding_model, "files": self.files},
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+        os.replace(tmp, self.path)
+        self.valid = True
+
+    def reset(self):
+        self.files = {}
+
+    def record(self, file_path: Path, content_hash: str, chunk_ids: List[str], external: bool = False):
+        """Enregistre un fichier ; `chunk_ids` donne, rang par rang, le chunk indexé (le sien ou un doublon)."""
+        stat = Path(file_path).stat() if Path(file_path).exists() else None
+        self.files[str(file_path)] = {
+            "hash": content_hash,
+            "mtime": stat.st_mtime if stat else None,
+            "size": stat.st_size if stat else None,
+            "chunk_ids": list(chunk_ids),
+            "external": external,
+        }
+
+    def remove(self, source: str) -> List[str]:
+        return self.remove_many([source])
+
+    def remove_many(self, sources: List[str]) -> List[str]:
+        """Retire des fichiers et retourne les chunks qu'aucun autre fichier ne référence.
+
+        Un chunk dédoublonné peut être partagé par plusieurs fichiers.
+        """
+        removed = []
+        for source in sources:
+            entry = self.files.pop(str(source), None)
+            if entry:
+                removed.extend(entry["chunk_ids"])
+        return self.unreferenced(removed)
+
+    def unreferenced(self, chunk_ids: List[str]) -> List[str]:
+        """Identifiants qu'aucun fichier du manifeste ne référence (sans doublon)."""
+        if not chunk_ids:
+            return []
+        still_used = {i for entry in self.files.values() for i in entry["chunk_ids"]}
+        return [i for i in dict.fromkeys(chunk_ids) if i not in still_used]
+
+    def locations(self, chunk_ids: List[str]) -> Dict[str, List[Dict]]:
+        """Emplacements (fichier, rang) où figure chacun des chunks donnés ; absents : plus référencés."""
+        wanted = set(chunk_ids)
+        found: Dict[str, List[Dict]] = {}
+        for source, entry in self.files.items():
+            for i, chunk_id in enumerate(entry["chunk_ids"]):
+                if chunk_id in wanted:
+                    found.setdefault(chunk_id, []).append({"source": source, "chunk_index": i})
+        return found
+
+    def by_content(self) -> Dict[str, str]:
+        """Préfixe d'empreinte de contenu (cf. `chunk_ids_for`) -> un chunk indexé de ce contenu."""
+        return {
+            chunk_id.split("-")[1]: chunk_id
+            for entry in self.files.values()
+            for chunk_id in entry["chunk_ids"]
+            if chunk_id.count("-") == 2
+        }
+
+    def find(self, file_path: Path) -> Optional[str]:
+        """Clé du manifeste désignant ce fichier, quelle que soit l'écriture du chemin."""
+        if str(file_path) in self.files:
+            return str(file_path)
+        target = Path(file_path).resolve()
+        return next((key for key in self.files if Path(key).resolve() == target), None)
+
+    def chunk_ids(self, source: str) -> List[str]:
+        entry = self.files.get(str(source))
+        return list(entry["chunk_ids"]) if entry else []
+
+    def diff(self, files: List[Path]) -> Tuple[List[Tuple[Path, str]], List[Tuple[Path, str]], List[str]]:
+        """Compare le dossier au manifeste.
+
+        Retourne (nouveaux, modifiés, supprimés). Les fichiers ajoutés hors du
+        dossier (`external`) sont comparés aussi, et supprimés de l'index quand
+        ils n'existent plus. Les fichiers dont mtime et taille sont inchangés ne
+        sont pas relus ; un fichier seulement « touché » est mis à jour dans le
+        manifeste sans être réindexé.
+        """
+        new: List[Tuple[Path, str]] = []
+        changed: List[Tuple[Path, str]] = []
+        seen = set()
+        external = [Path(src) for src, entry in self.files.items() if entry.get("external") and Path(src).is_file()]
+        for fp in list(files) + external:
+            key = str(fp)
+            if key in seen:
+                continue
+            seen.add(key)
+            entry = self.files.get(key)
+            stat = fp.stat()
+            if entry and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+                continue
+            h = file_hash(fp)
+            if entry is None:
+                new.append((fp, h))
+            elif entry["hash"] != h:
+                changed.append((fp, h))
+            else:
+                entry["mtime"] = stat.st_mtime
+                entry["size"] = stat.st_size
+        deleted = [src for src in self.files if src not in seen]
+        return new, changed, deleted
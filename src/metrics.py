@@ -0,0 +1,155 @@
+"""Mesures par étape (durées, tokens, coût, cache) et exporteurs."""
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+MetricsHook = Callable[[Dict[str, Any]], None]
+
+
+class _Counts:
+    def __init__(self):
+        self.durations: Dict[str, float] = defaultdict(float)
+        self.counters: Dict[str, float] = defaultdict(int)
+
+
+class Metrics:
+    """Durées cumulées par étape et compteurs, partagés par les composants d'un workflow.
+
+    Les étapes exécutées en parallèle (lots d'embeddings, lots de revue) cumulent
+    leurs durées : `llm` peut dépasser la durée totale de la revue. Les hooks
+    reçoivent un enregistrement à chaque `emit`.
+
+    Dans un bloc `scope()`, les mesures vont dans un compte propre au bloc (et
+    aux fils lancés avec une copie de son contexte) : deux revues simultanées
+    d'un même workflow ne mélangent pas leurs mesures.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hooks: List[MetricsHook] = []
+        self._scope: ContextVar[Optional[_Counts]] = ContextVar(f"metrics_{id(self)}", default=None)
+        self.reset()
+
+    def reset(self):
+        """Remet à zéro les mesures prises hors bloc `scope()`."""
+        with self._lock:
+            self._unscoped = _Counts()
+
+    def _counts(self) -> _Counts:
+        return self._scope.get() or self._unscoped
+
+    @contextmanager
+    def scope(self):
+        """Compte isolé pour la durée du bloc."""
+        token = self._scope.set(_Counts())
+        try:
+            yield self
+        finally:
+            self._scope.reset(token)
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - t0)
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            self._counts().durations[name] += seconds
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counts().counters[name] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = self._counts()
+            return {
+                "durees_s": {k: round(v, 4) for k, v in counts.durations.items()},
+                "compteurs": {k: round(v, 6) for k, v in counts.counters.items()},
+            }
+
+    def add_hook(self, hook: MetricsHook):
+        self.hooks.append(hook)
+
+    def emit(self, event: str, **labels: Any) -> Dict[str, Any]:
+        """Transmet l'état courant aux hooks et le retourne ; un hook en échec est ignoré."""
+        record = {"evenement": event, "date": datetime.now().isoformat(), **labels, **self.snapshot()}
+        for hook in self.hooks:
+            try:
+                hook(record)
+            except Exception as e:
+                logger.warning(f"Export des métriques en échec: {e}")
+        return record
+
+
+class JsonlExporter:
+    """Ajoute chaque enregistrement comme une ligne JSON."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def __call__(self, record: Dict[str, Any]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class PrometheusTextfileExporter:
+    """Réécrit un fichier au format texte Prometheus (collecteur textfile de node_exporter).
+
+    Le fichier reflète le dernier enregistrement de chaque événement (revue,
+    indexation, question) ; il est remplacé atomiquement.
+    """
+
+    PREFIX = "revue_specs"
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _name(value: str) -> str:
+        return re.sub(r"[^a-zA-Z0-9_]", "_", value)
+
+    def __call__(self, record: Dict[str, Any]):
+        with self._lock:
+            self._last[record["evenement"]] = {**record, "horodatage": time.time()}
+            families: Dict[str, List[str]] = defaultdict(list)
+            for event, last in sorted(self._last.items()):
+                durations = families[f"{self.PREFIX}_duree_secondes"]
+                for stage, seconds in sorted(last["durees_s"].items()):
+                    durations.append(f'{self.PREFIX}_duree_secondes{{evenement="{event}",etape="{stage}"}} {seconds}')
+                for name, value in sorted(last["compteurs"].items()):
+                    metric = f"{self.PREFIX}_{self._name(name)}"
+                    families[metric].append(f'{metric}{{evenement="{event}"}} {value}')
+                metric = f"{self.PREFIX}_horodatage_secondes"
+                families[metric].append(f'{metric}{{evenement="{event}"}} {last["horodatage"]:.0f}')
+            lines = [line for metric, samples in families.items() for line in [f"# TYPE {metric} gauge", *samples]]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+def exporters_from_settings(settings) -> List[MetricsHook]:
+    hooks: List[MetricsHook] = []
+    if settings.metrics_jsonl_path:
+        hooks.append(JsonlExporter(settings.metrics_jsonl_path))
+    if settings.metrics_prometheus_path:
+        hooks.append(PrometheusTextfileExporter(settings.metrics_prometheus_path))
+    return hooks
@@ -0,0 +1,174 @@
+"""Workflows partagés entre les sessions d'un même processus (interface web)."""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+from src.agent import llm_client
+from src.collection import Collection
+from src.locks import ReadWriteLock
+from src.vector_store import embeddings_client
+from src.workflow import ValidationWorkflow
+
+logger = logging.getLogger(__name__)
+
+
+class SharedWorkflow:
+    """Un seul ValidationWorkflow (index, clients OpenAI) par collection et par processus.
+
+    Les ajouts et synchronisations sont sérialisés mais ne bloquent pas les
+    revues et questions : une reconstruction est mise en service par échange de
+    référence, les lecteurs en cours finissent sur l'index précédent, fermé
+    quand le dernier d'entre eux a terminé. Seule
+    l'initialisation prend le verrou en écriture. `generation` reflète la
+    génération de l'index sur disque : une réindexation faite par un autre
+    processus (CLI) est rechargée automatiquement au prochain accès.
+    """
+
+    def __init__(self, collection: Optional[str] = None, embeddings=None, llm=None):
+        self.workflow = ValidationWorkflow(collection=collection, embeddings=embeddings, llm=llm)
+        self.lock = ReadWriteLock()
+        self._writer = threading.Lock()
+        self.initialized = False
+
+    @property
+    def generation(self) -> int:
+        return self.workflow.vector_store_manager.generation
+
+    def initialize(self, progress_callback: Optional[Callable[[int, int], None]] = None):
+        with self.lock.write():
+            if not self.initialized:
+                self.workflow.initialize(progress_callback=progress_callback)
+                self.initialized = True
+
+    def footprint(self) -> int:
+        return self.workflow.vector_store_manager.footprint()
+
+    def close(self):
+        """Décharge l'index après les lectures et écritures en cours ; il sera relu au prochain accès."""
+        with self._writer, self.lock.write():
+            self.workflow.close()
+            self.initialized = False
+
+    def _refresh_if_stale(self):
+        if not self.initialized:
+            self.initialize()
+            return
+        vsm = self.workflow.vector_store_manager
+        if vsm.read_generation() == vsm.generation:
+            return
+        # Une écriture est en cours dans ce processus : l'index actuel reste servi
+        if not self._writer.acquire(blocking=False):
+            return
+        try:
+            if vsm.read_generation() != vsm.generation:
+                logger.info("Index modifié sur disque, rechargement")
+                self.workflow.load_index()
+        finally:
+            self._writer.release()
+        self.lock.when_idle(vsm.close_retired)
+
+    @contextmanager
+    def _writing(self):
+        """Écritures une à une ; les lecteurs n'attendent que si le workflow n'est pas encore initialisé.
+
+        L'index est d'abord rechargé s'il a changé sur disque : une écriture ne
+        part jamais d'une génération qu'un autre processus a remplacée.
+        """
+        vsm = self.workflow.vector_store_manager
+        try:
+            with self._writer:
+                if self.initialized:
+                    if vsm.read_generation() != vsm.generation:
+                        logger.info("Index modifié sur disque, rechargement avant écriture")
+                        self.workflow.load_index()
+                    yield
+                else:
+                    with self.lock.write():
+                        yield
+        finally:
+            self.lock.when_idle(vsm.close_retired)
+
+    def run_full_review(self, **kwargs) -> Dict[str, Any]:
+        self._refresh_if_stale()
+        with self.lock.read():
+            return self.workflow.run_full_review(**kwargs)
+
+    def query_stream(self, question: str) -> Dict[str, Any]:
+        self._refresh_if_stale()
+        with self.lock.read():
+            return self.workflow.query_stream(question)
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        with self.lock.read():
+            return self.workflow.cache_stats()
+
+    def add_documents(self, paths: List[Path], progress_callback: Optional[Callable[[int, int], None]] = None):
+        with self._writing():
+            self.workflow.add_documents(paths, progress_callback=progress_callback)
+            if not self.initialized:
+                self.workflow.initialize()
+                self.initialized = True
+
+    def import_files(
+        self, files: Dict[str, bytes], progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, int]:
+        with self._writing():
+            stats = self.workflow.import_files(files, progress_callback=progress_callback)
+            if not self.initialized:
+                self.workflow.initialize()
+                self.initialized = True
+            return stats
+
+    def sync(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        with self._writing():
+            stats = self.workflow.sync(progress_callback=progress_callback)
+            if not self.initialized:
+                self.workflow.initialize()
+                self.initialized = True
+            return stats
+
+
+class WorkflowPool:
+    """Workflows des collections servies par le processus, en LRU borné par la mémoire.
+
+    Quand l'empreinte cumulée des index chargés dépasse `max_bytes`, les
+    collections les moins récemment demandées sont déchargées (jamais celle
+    qui vient de l'être) ; elles restent dans le pool et se rechargent au
+    prochain accès. Les clients OpenAI sont communs à toutes les collections.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, SharedWorkflow]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._embeddings = embeddings_client()
+        self._llm = llm_client()
+
+    def get(self, collection: Optional[str] = None) -> SharedWorkflow:
+        name = Collection(collection).name
+        with self._lock:
+            shared = self._entries.get(name)
+            if shared is None:
+                shared = self._entries[name] = SharedWorkflow(name, embeddings=self._embeddings, llm=self._llm)
+            self._entries.move_to_end(name)
+            evicted = self._over_budget()
+        for name, victim in evicted:
+            logger.info(f"Collection {name} déchargée (limite mémoire des index atteinte)")
+            victim.close()
+        return shared
+
+    def _over_budget(self) -> List[Tuple[str, SharedWorkflow]]:
+        """Collections à décharger, de la moins à la plus récemment utilisée."""
+        sizes = [(name, shared, shared.footprint()) for name, shared in self._entries.items()]
+        total = sum(size for _, _, size in sizes)
+        evicted = []
+        for name, shared, size in sizes[:-1]:
+            if total <= self.max_bytes:
+                break
+            if size:
+                evicted.append((name, shared))
+                total -= size
+        return evicted
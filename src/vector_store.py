@@ -1,135 +1,789 @@
 """Vector store pour le RAG."""
+import contextvars
 import os
 import shutil
+import socket
 import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
 from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
-from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
 from langchain_core.vectorstores import VectorStore
 import logging
 
+from src.embedding_cache import CachedEmbeddings
+from src.faiss_index import needs_training, new_index
+from src.lexical_index import LexicalIndex
+from src.metrics import Metrics
+from src.tokens import count_tokens
+
 os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
 
 logger = logging.getLogger(__name__)
 
+# Limite du nombre d'entrées par requête d'embedding côté API OpenAI
+MAX_BATCH_ITEMS = 2048
+
+# Empreinte mémoire estimée d'un vecteur en liste Python (float ~32 octets)
+_FLOAT_BYTES = 32
+
+ProgressCallback = Callable[[int, Optional[int]], None]
+GENERATION_FILE = "generation"
+# Pointeur vers le dossier de la génération en service (nom dans GENERATIONS_DIR, "." pour la racine)
+CURRENT_FILE = "CURRENT"
+GENERATIONS_DIR = "generations"
+# Marque une génération construite et validée
+READY_FILE = "READY"
+# Bail d'une construction en cours : "<pid> <hôte>", rafraîchi à chaque lot
+BUILDING_FILE = "BUILDING"
+# Index à la racine, disposition antérieure aux générations
+_ROOT_ENTRIES = ("chroma", "faiss", "lexical.sqlite", "lexical.sqlite-wal", "lexical.sqlite-shm", "manifest.json")
+
+
+def _write_atomic(path: Path, text: str):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def embeddings_client() -> Embeddings:
+    """Client OpenAI d'embeddings, sans cache ; partageable entre collections."""
+    from config import settings
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model=settings.embedding_model, openai_api_key=settings.openai_api_key)
+
+
+class _TrainingSample:
+    """Premiers vecteurs d'une construction IVF, mis de côté jusqu'à l'entraînement de l'index.
+
+    Les vecteurs sont copiés dans un tableau float32 préalloué ; les chunks ne
+    sont gardés que par identifiant, leur texte est relu dans l'index lexical.
+    """
+
+    def __init__(self, capacity: int, dim: int):
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.ids: List[str] = []
+
+    @property
+    def full(self) -> bool:
+        return len(self.ids) >= len(self.vectors)
+
+    def add(self, ids: List[str], vectors: List[List[float]]) -> int:
+        """Ajoute le début du lot ; retourne le nombre de vecteurs pris."""
+        n = len(self.ids)
+        take = min(len(ids), len(self.vectors) - n)
+        if take:
+            self.vectors[n : n + take] = np.asarray(vectors[:take], dtype=np.float32)
+            self.ids.extend(ids[:take])
+        return take
+
+
+class _Index:
+    """Index d'un dossier de génération : vector store et index lexical.
+
+    Sans `lexical`, rien n'est ouvert : place réservée tant qu'aucune
+    génération n'est chargée, qui ne crée aucun fichier dans le dossier.
+    """
+
+    def __init__(self, directory: Path, store: Optional[VectorStore] = None, lexical: bool = True):
+        self.directory = directory
+        self.store = store
+        self.lexical = LexicalIndex(directory / "lexical.sqlite") if lexical else None
+        # Taille mesurée une fois, puis après chaque enregistrement (cf. `footprint`)
+        self.measured: Optional[int] = None
+
+    def footprint(self) -> int:
+        """Taille des fichiers de l'index (vecteurs chargés ou mappés, docstore, index lexical).
+
+        Le dossier n'est parcouru qu'à la première demande suivant le chargement
+        ou un enregistrement (`measured` remis à None).
+        """
+        if self.store is None:
+            return 0
+        if self.measured is None:
+            self.measured = sum(f.stat().st_size for f in self.directory.rglob("*") if f.is_file())
+        return self.measured
+
+    def close(self):
+        client = getattr(self.store, "_client", None)  # Chroma
+        if hasattr(self.store, "close"):
+            self.store.close()
+        elif client is not None and hasattr(client, "close"):
+            client.close()
+        self.store = None
+        if self.lexical is not None:
+            self.lexical.close()
+
 
 class VectorStoreManager:
-    def __init__(self):
+    """Vector store et index lexical de la génération en service.
+
+    Une reconstruction complète est écrite dans un nouveau dossier de
+    génération, validée, puis mise en service par remplacement atomique du
+    pointeur CURRENT : l'index en service reste lisible pendant toute la
+    construction. Les `index_keep_generations` dernières générations sont
+    gardées (retour arrière avec `rollback`), les plus anciennes supprimées
+    après chaque mise en service. Les mises à jour incrémentales modifient la
+    génération en service.
+
+    `vector_store_path` désigne l'index d'une collection (par défaut celui de
+    la configuration) ; `embeddings` permet de partager un client d'embeddings.
+    """
+
+    def __init__(
+        self,
+        metrics: Optional[Metrics] = None,
+        vector_store_path: Optional[Path] = None,
+        embeddings: Optional[Embeddings] = None,
+    ):
         from config import settings
         self.settings = settings
-        self.embeddings = OpenAIEmbeddings(
-            model=settings.embedding_model,
-            openai_api_key=settings.openai_api_key,
-        )
-        self.vector_store: Optional[VectorStore] = None
-        self.vector_store_path = settings.vector_store_path
+        self.metrics = metrics or Metrics()
+        self.embeddings = embeddings or embeddings_client()
+        # Cache commun à toutes les collections : il est indexé par le texte
+        if settings.embedding_cache_enabled:
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                model=settings.embedding_model,
+                db_path=settings.vector_store_path / "embedding_cache.sqlite",
+                max_bytes=settings.embedding_cache_max_mb * 1024 * 1024,
+                metrics=self.metrics,
+            )
+        self.vector_store_path = Path(vector_store_path or settings.vector_store_path)
+        self._live = _Index(self._live_dir(), lexical=False)
+        self._retired: List[_Index] = []
+        self._train_sample: Optional[_TrainingSample] = None
+        self.generation = 0
+
+    def _store_class(self):
+        """Classe du backend configuré ; l'autre backend n'est jamais importé."""
+        if self.settings.vector_store_type == "chroma":
+            from langchain_chroma import Chroma
+            return Chroma
+        from src.faiss_store import FaissStore
+        return FaissStore
+
+    @property
+    def vector_store(self) -> Optional[VectorStore]:
+        return self._live.store
+
+    @property
+    def lexical(self) -> Optional[LexicalIndex]:
+        return self._live.lexical
+
+    @property
+    def active_dir(self) -> Path:
+        """Dossier de la génération en service."""
+        return self._live.directory
+
+    def footprint(self) -> int:
+        """Empreinte estimée de l'index chargé, en octets (0 s'il n'est pas chargé)."""
+        return self._live.footprint()
+
+    def close(self):
+        """Décharge l'index en service ; il sera relu au prochain `load_vector_store`."""
+        self._live.close()
+        self.close_retired()
+        self._live = _Index(self._live_dir(), lexical=False)
+
+    def _swap(self, target: _Index):
+        """Met `target` en service ; l'index remplacé reste ouvert pour les lectures en cours."""
+        if target is not self._live:
+            self._retired.append(self._live)
+        self._live = target
 
-    def create_vector_store(self, documents: List[Document], persist: bool = True) -> VectorStore:
+    def close_retired(self):
+        """Ferme les index remplacés par `_swap` ; à appeler quand plus aucune lecture ne peut les utiliser."""
+        retired, self._retired = self._retired, []
+        for index in retired:
+            index.close()
+
+    def _live_dir(self) -> Path:
+        try:
+            name = (self.vector_store_path / CURRENT_FILE).read_text().strip()
+        except OSError:
+            return self.vector_store_path
+        return self.vector_store_path if name == "." else self.vector_store_path / GENERATIONS_DIR / name
+
+    def _generations(self) -> List[Path]:
+        """Générations validées, de la plus ancienne à la plus récente."""
+        root = self.vector_store_path
+        gens = sorted(p for p in (root / GENERATIONS_DIR).glob("*") if (p / READY_FILE).exists())
+        if (root / "chroma").exists() or (root / "faiss").exists():
+            gens.insert(0, root)
+        return gens
+
+    def _new_generation_dir(self) -> Path:
+        base = self.vector_store_path / GENERATIONS_DIR
+        base.mkdir(parents=True, exist_ok=True)
+        numbers = [int(p.name) for p in base.iterdir() if p.name.isdigit()]
+        directory = base / f"{max(numbers, default=0) + 1:06d}"
+        directory.mkdir()
+        (directory / BUILDING_FILE).write_text(f"{os.getpid()} {socket.gethostname()}")
+        return directory
+
+    def _building(self, directory: Path) -> bool:
+        """Dossier non publié encore en construction : processus local vivant, ou bail rafraîchi récemment."""
+        marker = directory / BUILDING_FILE
+        try:
+            pid, host = marker.read_text().split(maxsplit=1)
+            if host == socket.gethostname() and os.name == "posix":
+                os.kill(int(pid), 0)
+                return True
+        except ProcessLookupError:
+            return False
+        except (OSError, ValueError):
+            pass  # autre hôte, autre système ou dossier sans bail : seul son âge compte
+        try:
+            age = time.time() - (marker if marker.exists() else directory).stat().st_mtime
+        except OSError:
+            return False
+        return age < self.settings.index_build_lease_minutes * 60
+
+    def read_generation(self) -> int:
+        """Génération de l'index sur disque, incrémentée à chaque écriture."""
+        try:
+            return int((self.vector_store_path / GENERATION_FILE).read_text())
+        except (OSError, ValueError):
+            return 0
+
+    def _check_live(self):
+        """Refuse d'écrire dans une génération retirée du service (reconstruction publiée par un autre processus)."""
+        if self.active_dir != self._live_dir():
+            raise RuntimeError(
+                f"La génération d'index {self.active_dir.name} n'est plus en service : recharger l'index avant d'écrire."
+            )
+
+    def _save(self, persist: bool):
+        if persist:
+            self.save()
+
+    def save(self):
+        """Persiste l'index (FAISS) et publie une nouvelle génération."""
+        self._check_live()
+        if self.settings.vector_store_type == "faiss":
+            self.vector_store.save()
+        self._live.measured = None
+        self._bump_generation()
+
+    def _bump_generation(self):
+        self.generation = self.read_generation() + 1
+        _write_atomic(self.vector_store_path / GENERATION_FILE, str(self.generation))
+
+    def create_vector_store(
+        self,
+        documents: Iterable[Document],
+        persist: bool = True,
+        ids: Optional[List[str]] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> VectorStore:
+        """Construit un index complet dans une nouvelle génération, puis le met en service.
+
+        En cas d'échec (embedding, validation), la génération en service reste
+        inchangée. Sans `persist`, l'index est utilisé par ce processus sans être
+        publié ; son dossier est supprimé au prochain nettoyage.
+        """
+        staging = self._new_generation_dir()
+        target = _Index(staging)
         if self.settings.vector_store_type == "chroma":
-            persist_dir = str(self.vector_store_path / "chroma") if persist else None
-            if persist_dir and Path(persist_dir).exists():
-                persist_path = Path(persist_dir)
-                self._force_remove_chroma_dir(persist_path)
-            self.vector_store = Chroma.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                persist_directory=persist_dir,
+            target.store = self._store_class()(
+                persist_directory=str(staging / "chroma"), embedding_function=self.embeddings
             )
-        else:
-            self.vector_store = FAISS.from_documents(documents=documents, embedding=self.embeddings)
-            if persist:
-                fp = self.vector_store_path / "faiss"
-                fp.mkdir(exist_ok=True)
-                self.vector_store.save_local(str(fp))
+
+        def heartbeat(done: int, total: Optional[int]):
+            (staging / BUILDING_FILE).touch()
+            if progress_callback:
+                progress_callback(done, total)
+
+        try:
+            self._ingest(documents, ids, heartbeat, target)
+            self._validate(target)
+        except Exception:
+            self._train_sample = None
+            logger.error(f"Construction de l'index abandonnée, la génération en service est conservée ({staging.name})")
+            target.close()
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        if not persist:
+            self._swap(target)
+            return self.vector_store
+        if self.settings.vector_store_type == "faiss":
+            target.store.save()
+        (staging / READY_FILE).touch()
+        (staging / BUILDING_FILE).unlink(missing_ok=True)
+        self._publish(target)
+        self._collect_garbage()
         return self.vector_store
 
-    def load_vector_store(self) -> Optional[VectorStore]:
+    def _validate(self, target: _Index):
+        """Contrôle une génération avant sa mise en service : non vide, index dense et lexical concordants."""
+        if target.store is None:
+            raise RuntimeError("Index vide : aucun chunk indexé.")
+        if self.settings.vector_store_type == "chroma":
+            stored = target.store._collection.count()
+        else:
+            stored = len(target.store)
+        lexical = target.lexical.count()
+        if not stored or stored != lexical:
+            raise RuntimeError(f"Index invalide : {stored} chunk(s) dans le vector store, {lexical} dans l'index lexical.")
+
+    def _publish(self, target: _Index):
+        """Met une génération en service : remplacement atomique du pointeur, puis rechargement chez les lecteurs."""
+        name = "." if target.directory == self.vector_store_path else target.directory.name
+        _write_atomic(self.vector_store_path / CURRENT_FILE, name)
+        self._swap(target)
+        self._bump_generation()
+        logger.info(f"Génération d'index en service: {target.directory}")
+
+    def _collect_garbage(self):
+        """Supprime les générations au-delà de `index_keep_generations` et les dossiers non publiés.
+
+        Un dossier non publié n'est supprimé qu'une fois sa construction
+        terminée : son processus (même hôte) n'existe plus, ou son bail n'a pas
+        été rafraîchi depuis INDEX_BUILD_LEASE_MINUTES. Un dossier encore ouvert
+        (autre processus, Windows) est laissé en place et retenté au nettoyage suivant.
+        """
+        live = self.active_dir
+        older = [g for g in self._generations() if g != live]
+        doomed = older[: max(0, len(older) - (self.settings.index_keep_generations - 1))]
+        base = self.vector_store_path / GENERATIONS_DIR
+        if base.exists():
+            doomed += [
+                p for p in sorted(base.iterdir())
+                if p.is_dir() and p != live and not (p / READY_FILE).exists() and not self._building(p)
+            ]
+        for directory in doomed:
+            try:
+                if directory == self.vector_store_path:
+                    for name in _ROOT_ENTRIES:
+                        entry = directory / name
+                        if entry.is_dir():
+                            shutil.rmtree(entry)
+                        elif entry.exists():
+                            entry.unlink()
+                else:
+                    shutil.rmtree(directory)
+                logger.info(f"Génération d'index supprimée: {directory}")
+            except OSError as e:
+                logger.warning(f"Génération {directory} non supprimée, nouvel essai au prochain nettoyage: {e}")
+
+    def rollback(self) -> Path:
+        """Remet en service la génération précédente ; retourne son dossier.
+
+        La génération abandonnée n'est plus proposée et sera supprimée au
+        prochain nettoyage.
+        """
+        gens = self._generations()
+        live = self.active_dir
+        candidates = gens[: gens.index(live)] if live in gens else [g for g in gens if g != live]
+        for directory in reversed(candidates):
+            target = self._open(directory)
+            if target is not None:
+                break
+        else:
+            raise ValueError("Aucune génération précédente à remettre en service.")
+        (live / READY_FILE).unlink(missing_ok=True)
+        self._publish(target)
+        return directory
+
+    def _token_batches(
+        self, documents: Iterable[Document], ids: Optional[Iterable[str]] = None
+    ) -> Iterator[Tuple[List[Document], List[str]]]:
+        """Regroupe les chunks en lots bornés par nombre de tokens, au fil du flux."""
+        budget = self.settings.embedding_batch_tokens
+        if ids is None:
+            pairs = ((d, d.id or str(uuid.uuid4())) for d in documents)
+        else:
+            pairs = zip(documents, ids)
+        cur_docs, cur_ids, cur_tokens = [], [], 0
+        for doc, doc_id in pairs:
+            n = count_tokens(doc.page_content, self.settings.embedding_model)
+            if cur_docs and (cur_tokens + n > budget or len(cur_docs) >= MAX_BATCH_ITEMS):
+                yield cur_docs, cur_ids
+                cur_docs, cur_ids, cur_tokens = [], [], 0
+            cur_docs.append(doc)
+            cur_ids.append(doc_id)
+            cur_tokens += n
+        if cur_docs:
+            yield cur_docs, cur_ids
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        retries = self.settings.embedding_max_retries
+        for attempt in range(retries + 1):
+            try:
+                with self.metrics.stage("embedding"):
+                    vectors = self.embeddings.embed_documents(texts)
+                self.metrics.incr("textes_embeddes", len(texts))
+                return vectors
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                delay = 2 ** attempt
+                logger.warning(f"Embedding: tentative {attempt + 1}/{retries + 1} échouée ({e}), nouvel essai dans {delay}s")
+                time.sleep(delay)
+
+    def _upsert_embeddings(self, target: _Index, documents: List[Document], ids: List[str], vectors: List[List[float]]):
+        target.lexical.add(ids, documents)
+        texts = [d.page_content for d in documents]
+        metadatas = [d.metadata for d in documents]
+        if self.settings.vector_store_type == "chroma":
+            target.store._collection.upsert(
+                ids=ids, embeddings=vectors, metadatas=metadatas, documents=texts
+            )
+            return
+        if target.store is None:
+            if needs_training(self.settings.faiss_index_type):
+                # Les premiers lots servent d'échantillon d'entraînement : l'index est créé une fois l'échantillon complet
+                taken = self._sample_for_training(ids, vectors)
+                if not self._train_sample.full:
+                    return
+                self._flush_train_buffer(target)
+                documents, ids, vectors = documents[taken:], ids[taken:], vectors[taken:]
+                if not ids:
+                    return
+            else:
+                target.store = self._new_faiss_store(target.directory, len(vectors[0]))
+        target.store.add_embeddings(vectors, documents, ids)
+
+    def _sample_for_training(self, ids: List[str], vectors: List[List[float]]) -> int:
+        """Copie le début du lot dans l'échantillon d'entraînement ; retourne le nombre de vecteurs pris.
+
+        L'échantillon compte dans `ingest_max_buffer_mb` : il en occupe au plus
+        la moitié, `faiss_train_size` est réduit au besoin.
+        """
+        if self._train_sample is None:
+            dim = len(vectors[0])
+            budget = self.settings.ingest_max_buffer_mb * 1024 * 1024 // 2
+            capacity = max(1, min(self.settings.faiss_train_size, budget // (dim * 4)))
+            if capacity < self.settings.faiss_train_size:
+                logger.info(f"Échantillon d'entraînement limité à {capacity} vecteurs (INGEST_MAX_BUFFER_MB)")
+            self._train_sample = _TrainingSample(capacity, dim)
+        return self._train_sample.add(ids, vectors)
+
+    def _new_faiss_store(self, directory: Path, dim: int, train_vectors: Optional[np.ndarray] = None) -> VectorStore:
+        s = self.settings
+        index = new_index(
+            dim,
+            s.faiss_index_type,
+            train_vectors,
+            nlist=s.faiss_nlist,
+            pq_m=s.faiss_pq_m,
+            hnsw_m=s.faiss_hnsw_m,
+            ef_construction=s.faiss_ef_construction,
+        )
+        return self._store_class().create(
+            self.embeddings, index, directory / "faiss", s.faiss_nprobe, s.faiss_ef_search, s.faiss_max_segments
+        )
+
+    def _flush_train_buffer(self, target: _Index):
+        """Entraîne l'index sur l'échantillon puis y insère ses chunks, relus dans l'index lexical."""
+        sample, self._train_sample = self._train_sample, None
+        if sample is None:
+            return
+        vectors = sample.vectors[: len(sample.ids)]
+        target.store = self._new_faiss_store(target.directory, vectors.shape[1], vectors)
+        for start in range(0, len(sample.ids), MAX_BATCH_ITEMS):
+            ids = sample.ids[start : start + MAX_BATCH_ITEMS]
+            docs = {d.id: d for d in target.lexical.get(ids)}
+            target.store.add_embeddings(vectors[start : start + len(ids)], [docs[i] for i in ids], ids)
+
+    def _ingest(
+        self,
+        documents: Iterable[Document],
+        ids: Optional[Iterable[str]] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        target: Optional[_Index] = None,
+    ):
+        """Embeddings par lots concurrents, insérés dans le store au fil de l'eau.
+
+        `documents` peut être un générateur : il est consommé lot par lot et la
+        consommation est suspendue tant que les lots en cours dépassent
+        `embedding_concurrency` ou `ingest_max_buffer_mb` (échantillon d'entraînement
+        IVF compris). Sans `ids`, l'identifiant
+        du chunk (`Document.id`) est utilisé, à défaut un UUID.
+
+        Chaque lot est réessayé `embedding_max_retries` fois. Les lots en échec
+        n'interrompent pas les autres ; une erreur est levée à la fin. Les lots
+        déjà calculés sont dans le cache d'embeddings, une relance ne paie que
+        les lots manquants. Par défaut, les chunks vont dans la génération en service.
+        """
+        target = target or self._live
+        concurrency = self.settings.embedding_concurrency
+        max_pending = self.settings.ingest_max_buffer_mb * 1024 * 1024
+        vector_bytes = 3072 * _FLOAT_BYTES
+        state = {"done": 0, "failed": 0, "seen": 0, "pending_bytes": 0}
+        pending = {}
+
+        def collect(futures):
+            nonlocal vector_bytes
+            for fut in futures:
+                b_docs, b_ids, nbytes = pending.pop(fut)
+                state["pending_bytes"] -= nbytes
+                try:
+                    vectors = fut.result()
+                except Exception as e:
+                    logger.error(f"Lot de {len(b_docs)} chunk(s) en échec: {e}")
+                    state["failed"] += len(b_docs)
+                    continue
+                if vectors:
+                    vector_bytes = len(vectors[0]) * _FLOAT_BYTES
+                self._upsert_embeddings(target, b_docs, b_ids, vectors)
+                state["done"] += len(b_docs)
+                if progress_callback:
+                    progress_callback(state["done"], None)
+
+        def buffered() -> int:
+            sample = self._train_sample
+            return state["pending_bytes"] + (sample.vectors.nbytes if sample is not None else 0)
+
+        if progress_callback:
+            progress_callback(0, None)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for b_docs, b_ids in self._token_batches(documents, ids):
+                nbytes = sum(len(d.page_content) for d in b_docs) + len(b_docs) * vector_bytes
+                while pending and (len(pending) >= concurrency or buffered() + nbytes > max_pending):
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                fut = pool.submit(contextvars.copy_context().run, self._embed_batch, [d.page_content for d in b_docs])
+                pending[fut] = (b_docs, b_ids, nbytes)
+                state["pending_bytes"] += nbytes
+                state["seen"] += len(b_docs)
+            while pending:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        self._flush_train_buffer(target)
+        if progress_callback:
+            progress_callback(state["done"], state["seen"])
+        if state["failed"]:
+            raise RuntimeError(f"Indexation incomplète: {state['failed']}/{state['seen']} chunk(s) non indexé(s).")
+
+    def _open(self, directory: Path) -> Optional[_Index]:
+        """Index d'un dossier de génération, ou None s'il n'y en a pas (ou s'il est illisible)."""
         try:
             if self.settings.vector_store_type == "chroma":
-                persist_dir = str(self.vector_store_path / "chroma")
-                if Path(persist_dir).exists():
-                    self.vector_store = Chroma(
-                        persist_directory=persist_dir,
-                        embedding_function=self.embeddings,
-                    )
-                    return self.vector_store
-            elif self.settings.vector_store_type == "faiss":
-                fp = self.vector_store_path / "faiss"
-                if fp.exists():
-                    self.vector_store = FAISS.load_local(
-                        str(fp), self.embeddings, allow_dangerous_deserialization=True
-                    )
-                    return self.vector_store
+                persist_dir = directory / "chroma"
+                if not persist_dir.exists():
+                    return None
+                store = self._store_class()(persist_directory=str(persist_dir), embedding_function=self.embeddings)
+            else:
+                fp = directory / "faiss"
+                store_class = self._store_class()
+                if store_class.is_legacy(fp):
+                    # Le docstore picklé n'est pas désérialisé ; la reconstruction réutilise le cache d'embeddings
+                    logger.warning(f"Index FAISS à l'ancien format (pickle) ignoré, il sera reconstruit: {fp}")
+                    return None
+                s = self.settings
+                store = store_class.load(fp, self.embeddings, s.faiss_nprobe, s.faiss_ef_search, s.faiss_max_segments)
+                if store is None:
+                    return None
         except Exception as e:
             error_msg = str(e).lower()
             if "no such column" in error_msg or "sqlite3.operationalerror" in error_msg or "topic" in error_msg:
-                logger.warning(f"Base de données ChromaDB incompatible (schéma obsolète): {e}")
-                if self.settings.vector_store_type == "chroma":
-                    persist_dir = Path(self.vector_store_path / "chroma")
-                    if persist_dir.exists():
-                        logger.warning(f"Suppression de la base de données corrompue: {persist_dir}")
-                        self._force_remove_chroma_dir(persist_dir)
-                self.vector_store = None
+                logger.warning(f"Base de données ChromaDB incompatible (schéma obsolète), elle sera reconstruite: {e}")
             else:
                 logger.error(f"Chargement vector store: {e}")
-                self.vector_store = None
-        return None
+            return None
+        return _Index(directory, store)
+
+    def load_vector_store(self) -> Optional[VectorStore]:
+        """Charge la génération en service ; en cas d'échec, l'index déjà chargé reste utilisé."""
+        self.generation = self.read_generation()
+        target = self._open(self._live_dir())
+        if target is None:
+            return None
+        self._swap(target)
+        self._ensure_lexical()
+        return self.vector_store
+
+    def add_documents(
+        self,
+        documents: Iterable[Document],
+        persist: bool = True,
+        ids: Optional[List[str]] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+    ):
+        """Ajoute des chunks à la génération en service.
 
-    def add_documents(self, documents: List[Document], persist: bool = True):
+        Une erreur remonte telle quelle : `documents` est un flux déjà en partie
+        consommé, qui ne peut pas servir à reconstruire l'index.
+        """
         if self.vector_store is None:
             raise ValueError("Aucun vector store chargé.")
-        try:
-            self.vector_store.add_documents(documents)
-        except Exception as e:
-            error_msg = str(e).lower()
-            if "no such column" in error_msg or "sqlite3.operationalerror" in error_msg or "topic" in error_msg:
-                logger.warning(f"Erreur lors de l'ajout de documents (vector store corrompu): {e}")
-                persist_dir = Path(self.vector_store_path / "chroma")
-                if persist_dir.exists():
-                    logger.warning("Suppression du vector store corrompu et recréation...")
-                    self._force_remove_chroma_dir(persist_dir)
-                self.create_vector_store(documents, persist=persist)
-                return
-            else:
-                raise
-        if persist and self.settings.vector_store_type == "chroma":
-            pass
-        elif persist and self.settings.vector_store_type == "faiss":
-            (self.vector_store_path / "faiss").mkdir(exist_ok=True)
-            self.vector_store.save_local(str(self.vector_store_path / "faiss"))
-
-    def similarity_search(self, query: str, k: int = 5) -> List[Document]:
+        self._check_live()
+        self._ingest(documents, ids, progress_callback)
+        self._save(persist)
+
+    def delete_chunks(self, ids: List[str], persist: bool = True):
+        """Supprime des chunks par identifiant (ignorés s'ils sont absents)."""
         if self.vector_store is None:
             raise ValueError("Aucun vector store chargé.")
-        return self.vector_store.similarity_search(query, k=k)
+        if not ids:
+            return
+        self._check_live()
+        self.lexical.delete(ids)
+        self.vector_store.delete(ids=ids)
+        self._save(persist)
 
-    def _force_remove_chroma_dir(self, persist_dir: Path):
-        """Force la suppression du répertoire ChromaDB avec retry."""
-        max_retries = 5
-        for attempt in range(max_retries):
-            try:
-                if self.vector_store is not None:
-                    try:
-                        if hasattr(self.vector_store, '_client'):
-                            self.vector_store._client = None
-                    except:
-                        pass
-                    self.vector_store = None
-                time.sleep(0.5)
-                if persist_dir.exists():
-                    shutil.rmtree(persist_dir)
-                    logger.info("Base de données supprimée avec succès.")
+    def compact(self) -> Dict[str, int]:
+        """Fusionne les segments de l'index FAISS ; sans objet avec Chroma (dictionnaire vide)."""
+        if self.vector_store is None:
+            raise ValueError("Aucun vector store chargé.")
+        if self.settings.vector_store_type != "faiss":
+            return {}
+        self._check_live()
+        stats = self.vector_store.compact()
+        self._save(True)
+        return stats
+
+    def _ensure_lexical(self):
+        """Alimente l'index lexical d'un vector store créé avant son introduction."""
+        if self.lexical.count():
+            return
+        batch: List[Document] = []
+        for doc in self.iter_all_documents():
+            batch.append(doc)
+            if len(batch) >= MAX_BATCH_ITEMS:
+                self.lexical.add([d.id for d in batch], batch)
+                batch = []
+        if batch:
+            self.lexical.add([d.id for d in batch], batch)
+        if self.lexical.count():
+            logger.info(f"Index lexical reconstruit: {self.lexical.count()} chunk(s)")
+
+    def similarity_search(self, query: str, k: int = 5, mode: Optional[str] = None) -> List[Document]:
+        """Recherche selon `mode` (par défaut `search_mode`).
+
+        "dense" : similarité des embeddings ; "lexical" : BM25 seul, sans appel
+        d'embedding ; "hybrid" : fusion des deux classements par rang réciproque.
+        """
+        live = self._live  # les deux classements viennent de la même génération
+        if live.store is None:
+            raise ValueError("Aucun vector store chargé.")
+        mode = mode or self.settings.search_mode
+        if mode == "lexical":
+            return [doc for doc, _ in live.lexical.search(query, k)]
+        if mode == "dense":
+            return live.store.similarity_search(query, k=k)
+        depth = max(k, self.settings.hybrid_candidates)
+        rankings = [
+            live.store.similarity_search(query, k=depth),
+            [doc for doc, _ in live.lexical.search(query, depth)],
+        ]
+        return self._rrf(rankings, k)
+
+    def _rrf(self, rankings: List[List[Document]], k: int) -> List[Document]:
+        """Fusion par rang réciproque : score = somme des 1 / (rrf_k + rang)."""
+        scores: Dict[str, float] = {}
+        docs: Dict[str, Document] = {}
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking, 1):
+                key = doc.id or f"{doc.metadata.get('source', '')}\n{doc.page_content}"
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.settings.rrf_k + rank)
+                docs.setdefault(key, doc)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [docs[key] for key in best]
+
+    def get_documents(self, ids: List[str]) -> List[Document]:
+        """Chunks indexés correspondant aux identifiants donnés (les absents sont ignorés)."""
+        if self.vector_store is None:
+            raise ValueError("Aucun vector store chargé.")
+        if not ids:
+            return []
+        if self.settings.vector_store_type == "chroma":
+            res = self.vector_store._collection.get(ids=ids, include=["documents", "metadatas"])
+            return [
+                Document(id=i, page_content=text, metadata=meta or {})
+                for i, text, meta in zip(res["ids"], res["documents"], res["metadatas"])
+            ]
+        return self.vector_store.get_by_ids(ids)
+
+    def get_vectors(self, documents: List[Document]) -> List[List[float]]:
+        """Vecteurs indexés des chunks donnés ; seuls ceux introuvables dans l'index sont recalculés."""
+        if self.vector_store is None:
+            raise ValueError("Aucun vector store chargé.")
+        ids = [doc.id for doc in documents if doc.id]
+        stored: Dict[str, np.ndarray] = {}
+        if ids and self.settings.vector_store_type == "chroma":
+            res = self.vector_store._collection.get(ids=ids, include=["embeddings"])
+            stored = dict(zip(res["ids"], res["embeddings"]))
+        elif ids:
+            stored = self.vector_store.get_vectors(ids)
+        missing = [n for n, doc in enumerate(documents) if doc.id not in stored]
+        computed = self.embeddings.embed_documents([documents[n].page_content for n in missing]) if missing else []
+        vectors = [stored.get(doc.id) for doc in documents]
+        for n, vector in zip(missing, computed):
+            vectors[n] = vector
+        return [list(map(float, v)) for v in vectors]
+
+    def update_metadata(self, updates: Dict[str, Dict], persist: bool = True):
+        """Fusionne des champs de métadonnées dans des chunks existants."""
+        if self.vector_store is None:
+            raise ValueError("Aucun vector store chargé.")
+        if not updates:
+            return
+        self._check_live()
+        self.lexical.update_metadata(updates)
+        if self.settings.vector_store_type == "chroma":
+            ids = list(updates)
+            current = self.vector_store._collection.get(ids=ids, include=["metadatas"])
+            merged = [{**(meta or {}), **updates[i]} for i, meta in zip(current["ids"], current["metadatas"])]
+            self.vector_store._collection.update(ids=current["ids"], metadatas=merged)
+        else:
+            self.vector_store.update_metadata(updates)
+        self._save(persist)
+
+    def iter_all_documents(self, page_size: int = 1000) -> Iterator[Document]:
+        """Parcourt tous les chunks indexés."""
+        if self.vector_store is None:
+            raise ValueError("Aucun vector store chargé.")
+        if self.settings.vector_store_type == "chroma":
+            offset = 0
+            while True:
+                page = self.vector_store._collection.get(
+                    include=["documents", "metadatas"], limit=page_size, offset=offset
+                )
+                if not page["ids"]:
                     return
-            except PermissionError as pe:
-                if attempt < max_retries - 1:
-                    logger.warning(f"Tentative {attempt + 1}/{max_retries}: Fichier verrouillé, nouvel essai dans 1 seconde...")
-                    time.sleep(1)
-                else:
-                    logger.error(f"Impossible de supprimer {persist_dir} après {max_retries} tentatives: {pe}")
-                    logger.error("Veuillez fermer l'application et supprimer manuellement le dossier vector_store/chroma")
-            except Exception as cleanup_error:
-                logger.error(f"Erreur lors de la suppression de {persist_dir}: {cleanup_error}")
-                break
+                for i, text, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+                    yield Document(id=i, page_content=text, metadata=meta or {})
+                offset += len(page["ids"])
+        else:
+            yield from self.vector_store.iter_documents(page_size)
+
+    @staticmethod
+    def _relevance(distance: float) -> float:
+        """Distance L2² entre vecteurs normalisés -> similarité cosinus."""
+        return 1.0 - float(distance) / 2.0
+
+    def similarity_search_batch(self, queries: List[str], k: int = 5) -> List[List[Tuple[Document, float]]]:
+        """Recherche groupée : un seul appel d'embedding et une seule recherche matricielle.
+
+        Retourne, pour chaque requête, les k documents les plus proches avec leur
+        score de similarité (cosinus, plus grand = plus pertinent).
+        """
+        if self.vector_store is None:
+            raise ValueError("Aucun vector store chargé.")
+        if not queries:
+            return []
+        vectors = self.embeddings.embed_documents(queries)
+        return self.similarity_search_by_vectors(vectors, k=k)
+
+    def similarity_search_by_vectors(
+        self, vectors: List[List[float]], k: int = 5
+    ) -> List[List[Tuple[Document, float]]]:
+        if self.settings.vector_store_type == "chroma":
+            res = self.vector_store._collection.query(
+                query_embeddings=vectors, n_results=k, include=["documents", "metadatas", "distances"]
+            )
+            return [
+                [
+                    (Document(id=i, page_content=text, metadata=meta or {}), self._relevance(dist))
+                    for i, text, meta, dist in zip(ids, texts, metas, dists)
+                ]
+                for ids, texts, metas, dists in zip(res["ids"], res["documents"], res["metadatas"], res["distances"])
+            ]
+        return [
+            [(doc, self._relevance(dist)) for doc, dist in hits]
+            for hits in self.vector_store.search_vectors(vectors, k)
+        ]
@@ -1,70 +1,480 @@
 """Workflow de validation des spécifications."""
+import itertools
 import json
+import os
+import subprocess
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple, Union
 from datetime import datetime
 import logging
 
 from config import settings
+from src.dedup import Duplicates, NearDuplicateDetector, collapse, location
+from src.collection import Collection
 from src.document_loader import DocumentLoader
+from src.manifest import IndexManifest, chunk_ids_for, file_hash
+from src.metrics import Metrics, exporters_from_settings
 from src.vector_store import VectorStoreManager
 from src.agent import SpecificationReviewAgent
 
 logger = logging.getLogger(__name__)
 
 
+def git_commit(path: Path, ref: str = "HEAD") -> Optional[str]:
+    """Commit désigné par `ref` dans le dépôt git contenant `path` ; None hors dépôt ou sans git."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+            cwd=path, capture_output=True, text=True, timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
 class ValidationWorkflow:
-    def __init__(self):
+    """Indexation et revue d'une collection de spécifications.
+
+    `embeddings` et `llm` sont des clients OpenAI partagés entre plusieurs
+    workflows d'un même processus (un par collection) ; à défaut, le workflow
+    crée les siens. `llm_slots` (sémaphore) borne les appels au LLM
+    simultanés de tous les workflows qui le partagent. `load_workers` remplace
+    LOAD_WORKERS (processus de chargement des documents) pour ce workflow.
+    """
+
+    def __init__(
+        self,
+        use_cache: Optional[bool] = None,
+        collection: Union[str, Collection, None] = None,
+        embeddings=None,
+        llm=None,
+        llm_slots=None,
+        load_workers: Optional[int] = None,
+    ):
+        if not isinstance(collection, Collection):
+            collection = Collection(collection)
+        self.collection = collection.create()
+        self.metrics = Metrics()
+        for hook in exporters_from_settings(settings):
+            self.metrics.add_hook(hook)
         self.document_loader = DocumentLoader(
             chunk_size=settings.chunk_size,
             chunk_overlap=settings.chunk_overlap,
+            workers=settings.load_workers if load_workers is None else load_workers,
+            metrics=self.metrics,
+        )
+        self.vector_store_manager = VectorStoreManager(
+            metrics=self.metrics, vector_store_path=self.collection.vector_store_path, embeddings=embeddings
+        )
+        self.manifest = IndexManifest(
+            self.vector_store_manager.active_dir, settings.vector_store_type, settings.embedding_model
         )
-        self.vector_store_manager = VectorStoreManager()
+        self.use_cache = use_cache
+        self.llm = llm
+        self.llm_slots = llm_slots
         self.agent = None
 
-    def initialize(self, rebuild_vector_store: bool = False):
-        if rebuild_vector_store:
-            self._build_vector_store()
+    def initialize(
+        self,
+        rebuild_vector_store: bool = False,
+        full_rebuild: bool = False,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ):
+        """Charge le vector store.
+
+        `rebuild_vector_store` synchronise l'index avec le dossier des documents
+        (seuls les fichiers nouveaux ou modifiés sont réindexés) ; `full_rebuild`
+        force une reconstruction complète.
+        """
+        if full_rebuild:
+            with self._indexing("reconstruction"):
+                self._build_vector_store(progress_callback)
+        elif rebuild_vector_store:
+            self.sync(progress_callback)
         else:
-            vs = self.vector_store_manager.load_vector_store()
+            vs = self.load_index()
             if vs is None:
-                self._build_vector_store()
-        self.agent = SpecificationReviewAgent(self.vector_store_manager)
+                with self._indexing("reconstruction"):
+                    self._build_vector_store(progress_callback)
+        self.agent = SpecificationReviewAgent(
+            self.vector_store_manager, use_cache=self.use_cache, llm=self.llm, llm_slots=self.llm_slots
+        )
+
+    def close(self):
+        """Décharge l'index ; le prochain `initialize` le relit."""
+        self.agent = None
+        self.vector_store_manager.close()
+
+    def load_index(self):
+        """Charge la génération d'index en service et son manifeste (rechargement compris)."""
+        vs = self.vector_store_manager.load_vector_store()
+        self._follow_generation()
+        self.manifest.load()
+        return vs
+
+    def _follow_generation(self):
+        """Le manifeste est celui de la génération en service : il la suit après une reconstruction."""
+        self.manifest.path = self.vector_store_manager.active_dir / IndexManifest.FILENAME
+
+    def rollback(self) -> Path:
+        """Remet en service la génération d'index précédente ; retourne son dossier."""
+        directory = self.vector_store_manager.rollback()
+        self._follow_generation()
+        self.manifest.load()
+        return directory
 
-    def _build_vector_store(self):
-        docs = self.document_loader.load_directory(settings.documents_path)
-        if not docs:
-            raise ValueError(f"Aucun document dans {settings.documents_path}")
+    @contextmanager
+    def _indexing(self, operation: str):
+        """Mesures propres à une opération d'indexation, émises dans un événement "indexation" si elle aboutit."""
+        with self.metrics.scope():
+            yield
+            self.metrics.emit("indexation", operation=operation)
+
+    def _chunk(self, file_path: Path, docs: List):
         chunks = self.document_loader.split_documents(docs)
-        self.vector_store_manager.create_vector_store(chunks, persist=True)
-
-    def add_documents(self, file_paths: List[Path]):
-        all_docs = []
-        for fp in file_paths:
-            all_docs.extend(self.document_loader.load_document(fp))
-        if not all_docs:
-            raise ValueError("Aucun document valide à ajouter.")
-        chunks = self.document_loader.split_documents(all_docs)
+        ids = chunk_ids_for(str(file_path), [c.metadata["content_hash"] for c in chunks])
+        for i, (chunk, chunk_id) in enumerate(zip(chunks, ids)):
+            chunk.id = chunk_id
+            chunk.metadata["chunk_index"] = i
+        return chunks, ids
+
+    def _changed_chunks(
+        self, file_path: Path, docs: List, detector: Optional[NearDuplicateDetector], duplicates: Duplicates
+    ) -> Tuple[List, List[str]]:
+        """Chunks d'un fichier à indexer et identifiants que le fichier référence.
+
+        Les chunks déjà indexés pour ce fichier (même rang, même contenu) ne sont
+        pas repris : modifier un paragraphe ne réindexe que les chunks touchés.
+        Les identifiants suivent l'ordre des chunks du fichier.
+        """
+        chunks, _ = self._chunk(file_path, docs)
+        previous = set(self.manifest.chunk_ids(str(file_path)))
+        changed = [c for c in chunks if c.id not in previous]
+        kept, refs = collapse(changed, detector, duplicates)
+        ref_of = dict(zip((c.id for c in changed), refs))
+        return kept, [ref_of.get(c.id, c.id) for c in chunks]
+
+    def _detector(self) -> Optional[NearDuplicateDetector]:
+        if not settings.dedup_enabled:
+            return None
+        by_content = self.manifest.by_content()
+        vsm = self.vector_store_manager
+
+        def indexed(content_hash: str) -> Optional[str]:
+            chunk_id = by_content.get(content_hash[:12])
+            if chunk_id is None or vsm.vector_store is None:
+                return None
+            # Le préfixe de l'identifiant est vérifié sur l'empreinte complète du chunk indexé
+            found = vsm.get_documents([chunk_id])
+            return chunk_id if found and found[0].metadata.get("content_hash") == content_hash else None
+
+        return NearDuplicateDetector(
+            threshold=settings.dedup_threshold,
+            num_perm=settings.dedup_num_perm,
+            bands=settings.dedup_bands,
+            indexed=indexed,
+        )
+
+    def _iter_chunks(
+        self, files: List[Path], duplicates: Duplicates, hashes: Optional[Dict[Path, str]] = None
+    ) -> Iterator:
+        """Flux des chunks à indexer, fichier par fichier ; chaque fichier produit est enregistré dans le manifeste.
+
+        Les chunks déjà indexés d'un fichier modifié ne sont pas produits. Les
+        doublons et quasi-doublons (au sein de ce flux) non plus : leurs
+        emplacements sont ajoutés à `duplicates` sous l'identifiant du représentant.
+        """
+        detector = self._detector()
+        loaded = self.document_loader.iter_files(files)
+        for fp, docs in loaded:
+            h = hashes[fp] if hashes else file_hash(fp)
+            kept, ids = self._changed_chunks(fp, docs, detector, duplicates)
+            self.manifest.record(fp, h, ids, external=self._is_external(fp))
+            yield from kept
+        self._log_duplicates(duplicates)
+
+    def _manifest_key(self, fp: Path) -> Path:
+        """Chemin enregistré dans le manifeste : celui que produit le parcours du dossier, sinon le chemin absolu.
+
+        La clé ne dépend donc pas du répertoire courant de la commande `add`.
+        """
+        fp = Path(fp).resolve()
         try:
-            self.vector_store_manager.add_documents(chunks, persist=True)
-        except ValueError as ve:
-            if "Aucun vector store chargé" in str(ve):
-                self.vector_store_manager.create_vector_store(chunks, persist=True)
+            return self.collection.documents_path / fp.relative_to(self.collection.documents_path.resolve())
+        except ValueError:
+            return fp
+
+    def _is_external(self, fp: Path) -> bool:
+        """Fichier hors du dossier de la collection (ajouté par `add`)."""
+        return self.collection.documents_path.resolve() not in Path(fp).resolve().parents
+
+    @staticmethod
+    def _log_duplicates(duplicates: Duplicates):
+        if duplicates:
+            logger.info(f"{sum(len(v) for v in duplicates.values())} chunk(s) dédoublonné(s) avant embedding")
+
+    def _refresh_locations(self, chunk_ids: List[str], persist: bool = True):
+        """Recalcule depuis le manifeste les emplacements (`locations`) des chunks donnés encore indexés.
+
+        Les emplacements d'un fichier retiré ou modifié disparaissent ; un chunk
+        dont le fichier d'origine ne le contient plus prend l'emplacement de sa
+        première occurrence restante.
+        """
+        refs = self.manifest.locations(chunk_ids)
+        if not refs:
+            return
+        updates = {}
+        for doc in self.vector_store_manager.get_documents(list(refs)):
+            locations = refs[doc.id]
+            fields: Dict[str, Any] = {}
+            own = location(doc.metadata)
+            if own not in locations:
+                own = locations[0]
+                fields.update(own, file_name=Path(own["source"]).name)
+            value = json.dumps(locations, ensure_ascii=False) if locations != [own] else ""
+            if fields or value != (doc.metadata.get("locations") or ""):
+                fields.update(locations=value, occurrences=len(locations))
+                updates[doc.id] = fields
+        self.vector_store_manager.update_metadata(updates, persist=persist)
+
+    def _build_vector_store(self, progress_callback: Optional[Callable[[int, int], None]] = None):
+        files = self.document_loader.list_files(self.collection.documents_path)
+        self.manifest.reset()
+        duplicates: Duplicates = {}
+        stream = self._iter_chunks(files, duplicates)
+        try:
+            first = next(stream, None)
+            if first is None:
+                raise ValueError(f"Aucun document dans {self.collection.documents_path}")
+            self.vector_store_manager.create_vector_store(
+                itertools.chain([first], stream), persist=True, progress_callback=progress_callback
+            )
+        except Exception:
+            # L'index en service est conservé, son manifeste aussi
+            self.manifest.load()
+            raise
+        self._follow_generation()
+        self._refresh_locations(list(duplicates))
+        self.manifest.save()
+
+    def sync(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        """Réindexe uniquement les fichiers nouveaux ou modifiés et retire les fichiers supprimés.
+
+        Les fichiers ajoutés hors du dossier sont suivis de la même façon, tant qu'ils existent.
+        """
+        with self._indexing("sync"):
+            return self._sync(progress_callback)
+
+    def _sync(self, progress_callback: Optional[Callable[[int, int], None]]) -> Dict[str, int]:
+        if self.vector_store_manager.vector_store is None:
+            self.load_index()
+        if self.vector_store_manager.vector_store is None or not self.manifest.valid:
+            self._build_vector_store(progress_callback)
+            n = len(self.manifest.files)
+            return {"nouveaux": n, "modifies": 0, "supprimes": 0, "inchanges": 0}
+        files = self.document_loader.list_files(self.collection.documents_path)
+        new, changed, deleted = self.manifest.diff(files)
+        replaced = [i for fp, _ in changed for i in self.manifest.chunk_ids(str(fp))]
+        gone = [i for src in deleted for i in self.manifest.chunk_ids(src)]
+        try:
+            removed = self.manifest.remove_many(deleted)
+            duplicates: Duplicates = {}
+            vsm = self.vector_store_manager
+            vsm.add_documents(
+                self._iter_chunks([fp for fp, _ in new + changed], duplicates, dict(new + changed)),
+                persist=False,
+                progress_callback=progress_callback,
+            )
+            # Les chunks d'un fichier modifié encore présents dans sa nouvelle version sont conservés
+            vsm.delete_chunks(self.manifest.unreferenced(replaced + removed), persist=False)
+            # Emplacements des chunks partagés avec un fichier ajouté, modifié ou supprimé
+            self._refresh_locations(list(duplicates) + replaced + gone, persist=False)
+            vsm.save()
+            self.manifest.save()
+        except Exception:
+            # Le manifeste sur disque est celui du dernier état complet : les fichiers en échec restent à indexer
+            self.manifest.load()
+            raise
+        stats = {
+            "nouveaux": len(new),
+            "modifies": len(changed),
+            "supprimes": len(deleted),
+            "inchanges": len(self.manifest.files) - len(new) - len(changed),
+        }
+        logger.info(f"Synchronisation: {stats}")
+        return stats
+
+    def add_documents(
+        self, file_paths: List[Path], progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, int]:
+        """Indexe des fichiers, ou les met à jour s'ils le sont déjà.
+
+        Seuls les chunks nouveaux ou modifiés sont embeddés ; ceux que la nouvelle
+        version ne contient plus sont supprimés. Retourne le nombre de chunks
+        ajoutés, supprimés et inchangés.
+        """
+        with self._indexing("ajout"):
+            return self._add_documents(file_paths, progress_callback)
+
+    def _add_documents(
+        self, file_paths: List[Path], progress_callback: Optional[Callable[[int, int], None]]
+    ) -> Dict[str, int]:
+        vsm = self.vector_store_manager
+        if vsm.vector_store is None:
+            self.load_index()
+        try:
+            if vsm.vector_store is None:
+                self.manifest.reset()
+            detector = self._detector()
+            duplicates: Duplicates = {}
+            all_chunks, replaced = [], []
+            stats = {"ajoutes": 0, "supprimes": 0, "inchanges": 0}
+            indexed = False
+            for fp in file_paths:
+                fp = Path(self.manifest.find(fp) or self._manifest_key(fp))
+                h = file_hash(fp)
+                previous = self.manifest.chunk_ids(str(fp))
+                kept, ids = self._changed_chunks(fp, self.document_loader.load_document(fp), detector, duplicates)
+                indexed = indexed or bool(ids)
+                replaced.extend(previous)
+                all_chunks.extend(kept)
+                stats["inchanges"] += len(set(ids) & set(previous))
+                self.manifest.record(fp, h, ids, external=self._is_external(fp))
+            if not indexed:
+                raise ValueError("Aucun document valide à ajouter.")
+            self._log_duplicates(duplicates)
+            stale_ids = self.manifest.unreferenced(replaced)
+            if vsm.vector_store is None:
+                vsm.create_vector_store(all_chunks, persist=True, progress_callback=progress_callback)
+                self._follow_generation()
+                self._refresh_locations(list(duplicates))
             else:
-                raise
+                vsm.add_documents(all_chunks, persist=False, progress_callback=progress_callback)
+                vsm.delete_chunks(stale_ids, persist=False)
+                self._refresh_locations(list(duplicates) + replaced, persist=False)
+                vsm.save()
+            self.manifest.save()
+            stats["ajoutes"], stats["supprimes"] = len(all_chunks), len(stale_ids)
+        except Exception:
+            self.manifest.load()
+            raise
+        logger.info(f"Documents indexés: {stats}")
+        return stats
+
+    def import_files(
+        self, files: Dict[str, bytes], progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, int]:
+        """Copie des fichiers déposés (nom -> contenu) dans le dossier de la collection, puis les indexe.
+
+        Le nom du fichier est sa clé : un nouveau dépôt du même nom remplace le
+        précédent et ses chunks, comme une modification suivie d'une synchronisation.
+        """
+        paths = []
+        for name, content in files.items():
+            fp = self.collection.documents_path / Path(name).name
+            tmp = fp.with_name(f".{fp.name}.tmp")
+            tmp.write_bytes(content)
+            os.replace(tmp, fp)
+            paths.append(fp)
+        return self.add_documents(paths, progress_callback=progress_callback)
+
+    def upsert_document(
+        self, file_path: Path, progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, int]:
+        """Indexe un fichier ou remplace ses chunks ; le coût est celui des seuls chunks modifiés."""
+        return self.add_documents([file_path], progress_callback=progress_callback)
+
+    def delete_document(self, file_path: Path) -> int:
+        """Retire un fichier de l'index ; retourne le nombre de chunks supprimés.
+
+        Un fichier encore présent dans le dossier des documents sera réindexé à
+        la prochaine synchronisation.
+        """
+        vsm = self.vector_store_manager
+        if vsm.vector_store is None:
+            self.load_index()
+        if vsm.vector_store is None:
+            raise ValueError("Workflow non initialisé. Lancer init d'abord.")
+        key = self.manifest.find(file_path)
+        if key is None:
+            raise ValueError(f"Fichier non indexé: {file_path}")
+        gone = self.manifest.chunk_ids(key)
+        stale_ids = self.manifest.remove(key)
+        try:
+            vsm.delete_chunks(stale_ids, persist=False)
+            self._refresh_locations(gone, persist=False)
+            vsm.save()
+            self.manifest.save()
+        except Exception:
+            self.manifest.load()
+            raise
+        logger.info(f"{key} retiré de l'index ({len(stale_ids)} chunk(s))")
+        return len(stale_ids)
+
+    def compact(self) -> Dict[str, int]:
+        """Fusionne les segments de l'index FAISS et retire les vecteurs supprimés."""
+        vsm = self.vector_store_manager
+        if vsm.vector_store is None:
+            self.load_index()
+        if vsm.vector_store is None:
+            raise ValueError("Aucun index à compacter. Lancer init d'abord.")
+        return vsm.compact()
+
+    def _baseline_problem(self, baseline: Dict[str, Any], questions: Optional[List[str]]) -> Optional[str]:
+        """Raison pour laquelle un rapport ne peut pas servir de référence, ou None."""
+        if not isinstance((baseline.get("metadata") or {}).get("empreintes_chunks"), list):
+            return "empreintes des chunks absentes, rapport produit sans --mode sharded"
+        if (baseline.get("resume") or {}).get("questions_analysees") != (questions or self.agent.DEFAULT_QUESTIONS):
+            return "questions différentes"
+        return None
 
     def run_full_review(
         self,
         custom_questions: Optional[List[str]] = None,
         output_file: Optional[Path] = None,
+        mode: Optional[str] = None,
+        baseline: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
+        """Revue complète ; `mode` vaut "rag" (contexte retrouvé) ou "sharded" (tout le corpus).
+
+        Avec `baseline` (rapport précédent en mode "sharded" ou incrémental),
+        seuls les chunks modifiés depuis ce rapport et leurs voisins sont revus,
+        les autres problèmes en sont repris (mode "incremental") ; un rapport
+        inutilisable comme référence donne une revue "sharded" de tout le corpus.
+
+        `report["metadata"]["metriques"]` contient les durées par étape et les
+        compteurs (tokens, coût, caches) de cette seule revue ; ils sont aussi
+        transmis aux exporteurs configurés, comme ceux de chaque indexation et
+        de chaque question.
+        """
         if self.agent is None:
             raise ValueError("Workflow non initialisé. Lancer init d'abord.")
-        review_result = self.agent.review_specifications(questions=custom_questions)
+        mode = mode or settings.review_mode
+        if baseline is not None:
+            reason = self._baseline_problem(baseline, custom_questions)
+            if reason:
+                logger.warning(f"Rapport de référence inutilisable ({reason}) : revue de tout le corpus")
+                mode = "sharded"
+            else:
+                mode = "incremental"
+        # Mesures propres à cette revue : d'autres peuvent tourner en même temps sur ce workflow
+        with self.metrics.scope():
+            with self.metrics.stage("revue"):
+                if mode == "incremental":
+                    review_result = self.agent.review_incremental(baseline, questions=custom_questions)
+                elif mode == "sharded":
+                    review_result = self.agent.review_sharded(questions=custom_questions)
+                else:
+                    review_result = self.agent.review_specifications(questions=custom_questions)
+            record = self.metrics.emit("revue", mode=mode)
         report = {
             "metadata": {
                 "date_analyse": datetime.now().isoformat(),
                 "workflow": "Validation Automatisée des Spécifications",
+                "mode": mode,
             },
             "resume": {
                 "documents_analyses": review_result.get("documents_analyses", []),
@@ -75,6 +485,20 @@ class ValidationWorkflow:
             "analyse": review_result.get("analyse", {}),
             "reponse_complete": review_result.get("reponse_complete", ""),
         }
+        if "nombre_lots" in review_result:
+            report["resume"]["nombre_lots"] = review_result["nombre_lots"]
+            report["resume"]["lots_en_echec"] = review_result["lots_en_echec"]
+        if "incremental" in review_result:
+            report["resume"]["incremental"] = review_result["incremental"]
+            report["metadata"]["reference"] = {
+                "date_analyse": baseline["metadata"].get("date_analyse"),
+                "commit": baseline["metadata"].get("commit"),
+            }
+        commit = git_commit(self.collection.documents_path)
+        if commit:
+            report["metadata"]["commit"] = commit
+        if "empreintes_chunks" in review_result:
+            report["metadata"]["empreintes_chunks"] = review_result["empreintes_chunks"]
         problemes = report["analyse"].get("problemes") or []
         if isinstance(problemes, list):
             report["statistiques"] = {
@@ -83,6 +507,8 @@ class ValidationWorkflow:
                 "problemes_majeurs": sum(1 for p in problemes if p.get("severite") == "majeur"),
                 "problemes_mineurs": sum(1 for p in problemes if p.get("severite") == "mineur"),
             }
+        report["metadata"]["metriques"] = {"durees_s": record["durees_s"], "compteurs": record["compteurs"]}
+        logger.info(f"Métriques de la revue: {report['metadata']['metriques']}")
         if output_file:
             output_file = Path(output_file)
             output_file.parent.mkdir(parents=True, exist_ok=True)
@@ -97,10 +523,26 @@ class ValidationWorkflow:
                     f.write(self._report_text(report))
         return report
 
-    def query(self, question: str) -> Dict[str, Any]:
+    def query(self, question: str, search_mode: Optional[str] = None) -> Dict[str, Any]:
         if self.agent is None:
             raise ValueError("Workflow non initialisé. Lancer init d'abord.")
-        return self.agent.query_specific(question)
+        return self.agent.query_specific(question, search_mode=search_mode)
+
+    def query_stream(self, question: str, search_mode: Optional[str] = None) -> Dict[str, Any]:
+        if self.agent is None:
+            raise ValueError("Workflow non initialisé. Lancer init d'abord.")
+        return self.agent.query_specific_stream(question, search_mode=search_mode)
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        if self.agent is None:
+            raise ValueError("Workflow non initialisé. Lancer init d'abord.")
+        return self.agent.cache_stats()
+
+    def search(self, question: str, k: int = 5, search_mode: Optional[str] = None) -> List:
+        """Passages pertinents, sans appel au LLM (ni réseau en mode "lexical")."""
+        if self.vector_store_manager.vector_store is None:
+            raise ValueError("Workflow non initialisé. Lancer init d'abord.")
+        return self.vector_store_manager.similarity_search(question, k=k, mode=search_mode)
 
     def _report_text(self, report: Dict) -> str:
         lines = [
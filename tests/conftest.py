@@ -0,0 +1,43 @@
+"""Configuration des tests : dossiers temporaires, embeddings et LLM factices (aucun appel réseau)."""
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from config import settings as app_settings
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    """Configuration de l'application pointant vers un dossier temporaire."""
+    values = {
+        "openai_api_key": "test",
+        "documents_path": tmp_path / "documents",
+        "vector_store_path": tmp_path / "vector_store",
+        "output_path": tmp_path / "reports",
+        "collections_path": tmp_path / "collections",
+        "vector_store_type": "faiss",
+        "load_workers": 1,
+        "embedding_cache_enabled": False,
+        "metrics_jsonl_path": "",
+        "metrics_prometheus_path": "",
+    }
+    for name, value in values.items():
+        monkeypatch.setattr(app_settings, name, value)
+    values["documents_path"].mkdir()
+    return app_settings
+
+
+@pytest.fixture
+def make_workflow(settings):
+    """Fabrique de workflows sur la configuration de test."""
+
+    def make(**kwargs):
+        from src.workflow import ValidationWorkflow
+
+        return ValidationWorkflow(
+            embeddings=DeterministicFakeEmbedding(size=32),
+            llm=FakeListChatModel(responses=['{"problemes": []}']),
+            **kwargs,
+        )
+
+    return make
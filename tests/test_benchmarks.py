@@ -0,0 +1,20 @@
+"""Benchmarks : passage de bout en bout sur un petit corpus, sans réseau."""
+import langchain_openai
+
+from benchmarks import compare
+from benchmarks import run as bench
+
+
+def test_small_run_reports_every_stage(settings, tmp_path, monkeypatch):
+    # Réglages et classes que le benchmark remplace, restaurés après le test
+    for name in ("llm_cache_enabled", "retrieval_min_score"):
+        monkeypatch.setattr(settings, name, getattr(settings, name))
+    for name in ("OpenAIEmbeddings", "ChatOpenAI"):
+        monkeypatch.setattr(langchain_openai, name, getattr(langchain_openai, name))
+    monkeypatch.setattr(bench, "bench_startup", lambda: {})
+    results = bench.run([3], ["faiss"], n_queries=2, review_modes=["rag"], workdir=tmp_path)
+    entry = results["corpus"]["3"]
+    assert entry["octets"] > 0 and entry["chargement"]
+    faiss = entry["backends"]["faiss"]
+    metrics = compare.flatten(faiss)
+    assert metrics and all(value >= 0 for value in metrics.values())
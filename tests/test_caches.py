@@ -0,0 +1,87 @@
+"""Caches : embeddings, réponses du LLM et réponses aux questions."""
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.answer_cache import AnswerCache, question_keys
+from src.embedding_cache import CachedEmbeddings
+from src.response_cache import ResponseCache
+
+
+class _CountingEmbedding(DeterministicFakeEmbedding):
+    texts: list = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+def _embeddings(tmp_path, model="modele", max_bytes=1 << 20):
+    underlying = _CountingEmbedding(size=8, texts=[])
+    return CachedEmbeddings(underlying, model, tmp_path / "emb.sqlite", max_bytes), underlying
+
+
+def test_embedding_cache_computes_each_text_once(tmp_path):
+    cache, underlying = _embeddings(tmp_path)
+    first = cache.embed_documents(["a", "b", "a"])
+    assert underlying.texts == ["a", "b"]
+    assert cache.embed_documents(["b", "c"])[0] == pytest.approx(first[1], rel=1e-6)  # stocké en float32
+    assert underlying.texts == ["a", "b", "c"]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_embedding_cache_is_keyed_by_model(tmp_path):
+    cache, _ = _embeddings(tmp_path)
+    cache.embed_documents(["a"])
+    other, underlying = _embeddings(tmp_path, model="autre")
+    other.embed_documents(["a"])
+    assert underlying.texts == ["a"]
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path):
+    # 8 float32 = 32 octets par vecteur : au-delà de la limite, l'éviction descend à 90 % (deux vecteurs)
+    cache, underlying = _embeddings(tmp_path, max_bytes=72)
+    cache.embed_documents(["a", "b"])
+    cache.embed_documents(["a"])
+    cache.embed_documents(["c"])
+    underlying.texts.clear()
+    cache.embed_documents(["a", "b", "c"])
+    assert underlying.texts == ["b"]
+
+
+def test_semantic_hit_requires_same_identifiers(tmp_path):
+    cache = AnswerCache(tmp_path / "answers.sqlite", threshold=0.9, max_entries=10)
+    vector = [1.0, 0.0, 0.0]
+    cache.put("Quel est le délai de REQ-042 ?", vector, "30 s", ["a.txt"], "scope", 1)
+    assert cache.get_similar("Quel est le délai de REQ-043 ?", vector, "scope", 1) is None
+    hit = cache.get_similar("Quel délai pour REQ-042 ?", vector, "scope", 1)
+    assert hit["reponse"] == "30 s"
+    assert cache.stats()["hits_semantique"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_answer_from_another_generation_is_purged(tmp_path):
+    cache = AnswerCache(tmp_path / "answers.sqlite", threshold=0.9, max_entries=10)
+    cache.put("Délai de démarrage ?", [1.0, 0.0], "30 s", [], "scope", 1)
+    assert cache.get_exact("délai de démarrage", "scope", 1)["reponse"] == "30 s"
+    assert cache.get_exact("délai de démarrage", "scope", 2) is None
+    assert cache.stats()["entrees"] == 0
+
+
+def test_question_keys():
+    assert question_keys("Le délai de REQ-042 est-il de 2,5 s ?") == {"req-042", "2,5"}
+    assert question_keys("Quelles exigences de sécurité ?") == frozenset()
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path / "llm.sqlite", ttl_seconds=3600, max_bytes=10)
+    cache.put("a", "12345")
+    cache.put("b", "12345")
+    assert cache.get("a") == "12345"
+    cache.put("c", "12345")
+    assert cache.get("b") is None
+    assert cache.stats() == {"entrees": 2, "octets": 10, "hits": 1, "misses": 1}
+
+
+def test_response_cache_ignores_expired_entries(tmp_path):
+    cache = ResponseCache(tmp_path / "llm.sqlite", ttl_seconds=-1, max_bytes=100)
+    cache.put("a", "réponse")
+    assert cache.get("a") is None
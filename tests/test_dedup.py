@@ -0,0 +1,74 @@
+"""Déduplication : emplacements des doublons tenus à jour au fil des synchronisations."""
+import json
+
+import pytest
+
+from src.dedup import NearDuplicateDetector
+
+BOILERPLATE = "Clause commune : ce document est confidentiel et propriété de la société, toute diffusion est interdite. " * 4
+
+
+def _paragraph(tag):
+    return f"{tag} : exigence propre au fichier {tag}, avec un contenu suffisamment long pour un chunk. " * 4
+
+
+@pytest.fixture
+def workflow(settings, make_workflow, monkeypatch):
+    monkeypatch.setattr(settings, "chunk_size", 450)
+    monkeypatch.setattr(settings, "chunk_overlap", 0)
+    docs = settings.documents_path
+    (docs / "a.txt").write_text(_paragraph("A1") + "\n\n" + BOILERPLATE)
+    (docs / "b.txt").write_text(_paragraph("B1") + "\n\n" + BOILERPLATE)
+    workflow = make_workflow(use_cache=False)
+    workflow.initialize()
+    yield workflow
+    workflow.close()
+
+
+def _boilerplate(workflow):
+    """(fichier du représentant, fichiers où la clause apparaît) pour chaque chunk de clause commune."""
+    return [
+        (d.metadata["file_name"], sorted(loc["source"].rsplit("/", 1)[-1] for loc in json.loads(d.metadata.get("locations") or "[]")))
+        for d in workflow.vector_store_manager.iter_all_documents()
+        if "confidentiel" in d.page_content
+    ]
+
+
+def test_duplicate_is_indexed_once_with_all_locations(workflow):
+    assert _boilerplate(workflow) == [("a.txt", ["a.txt", "b.txt"])]
+
+
+def test_removed_file_is_pruned_from_locations(workflow, settings):
+    (settings.documents_path / "b.txt").unlink()
+    workflow.sync()
+    assert _boilerplate(workflow) == [("a.txt", [])]
+
+
+def test_readded_file_is_deduplicated_across_syncs(workflow, settings):
+    (settings.documents_path / "b.txt").unlink()
+    workflow.sync()
+    (settings.documents_path / "b.txt").write_text(_paragraph("B1") + "\n\n" + BOILERPLATE)
+    workflow.sync()
+    assert _boilerplate(workflow) == [("a.txt", ["a.txt", "b.txt"])]
+
+
+def test_representative_moves_when_its_file_is_removed(workflow, settings):
+    (settings.documents_path / "a.txt").unlink()
+    workflow.sync()
+    assert _boilerplate(workflow) == [("b.txt", [])]
+
+
+def test_modified_file_without_duplicate_is_pruned(workflow, settings):
+    (settings.documents_path / "b.txt").write_text(_paragraph("B2"))
+    workflow.sync()
+    assert _boilerplate(workflow) == [("a.txt", [])]
+    workflow.delete_document(settings.documents_path / "a.txt")
+    assert _boilerplate(workflow) == []
+
+
+def test_detector_prefers_indexed_chunks():
+    detector = NearDuplicateDetector(indexed={"h1": "ancien"}.get)
+    assert detector.find_or_add("nouveau", "texte", "h1") == "ancien"
+    assert detector.find_or_add("autre", "autre texte", "h2") is None
+    assert detector.find_or_add("copie", "autre texte", "h2") == "autre"
+    assert detector.duplicates == 2
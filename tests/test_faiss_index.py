@@ -0,0 +1,65 @@
+"""Types d'index FAISS : entraînement, repli sur flat, paramètres de recherche et stores IVF / HNSW."""
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+faiss = pytest.importorskip("faiss")
+
+from src.faiss_index import index_type_of, new_index, reconstruct, search_params  # noqa: E402
+from src.faiss_store import FaissStore  # noqa: E402
+
+DIM = 16
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "ivf_pq", "hnsw"])
+def test_new_index_types(index_type):
+    index = new_index(DIM, index_type, _vectors(20_000), nlist=16, pq_m=4)
+    assert index_type_of(index) == index_type
+    assert index.is_trained
+
+
+def test_small_sample_falls_back_to_flat():
+    assert index_type_of(new_index(DIM, "ivf_pq", _vectors(100))) == "flat"
+    assert index_type_of(new_index(DIM, "ivf_flat", None)) == "flat"
+    # Listes réduites à la taille de l'échantillon
+    assert faiss.extract_index_ivf(new_index(DIM, "ivf_flat", _vectors(100), nlist=1024)).nlist == 2
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_search_params_keep_selector(index_type):
+    data = _vectors(2000)
+    index = new_index(DIM, index_type, data, nlist=8)
+    index.add(data)
+    allowed = np.zeros(2000, dtype=bool)
+    allowed[::2] = True
+    bitmap = np.packbits(allowed, bitorder="little")
+    selector = faiss.IDSelectorBitmap(allowed.size, faiss.swig_ptr(bitmap))
+    _, positions = index.search(data[1:2], 5, params=search_params(index, nprobe=8, ef_search=64, selector=selector))
+    assert all(p % 2 == 0 for p in positions[0] if p >= 0)
+
+
+def test_reconstruct_ivf_builds_direct_map():
+    data = _vectors(2000)
+    index = new_index(DIM, "ivf_flat", data, nlist=8)
+    index.add(data)
+    np.testing.assert_allclose(reconstruct(index, [3, 1500]), data[[3, 1500]])
+
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "hnsw"])
+def test_store_with_approximate_index_survives_compaction(tmp_path, index_type):
+    embedding = DeterministicFakeEmbedding(size=DIM)
+    texts = [f"REQ-{i} : exigence numéro {i}." for i in range(400)]
+    ids = [f"c{i}" for i in range(400)]
+    store = FaissStore.from_texts(texts, embedding, ids=ids, path=tmp_path / "faiss", index_type=index_type, nprobe=8)
+    store.add_texts(["REQ-X : ajout."], ids=["x"])
+    store.save()
+    store.delete(["c7"])
+    store.compact()
+    hits = store.search_vectors([embedding.embed_query(texts[12])], k=1)[0]
+    assert hits[0][0].id == "c12"
+    assert len(store) == 400 and store.get_by_ids(["c7"]) == []
+    store.close()
@@ -0,0 +1,76 @@
+"""Store FAISS segmenté : ajouts, suppressions, fusion et rechargement."""
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+pytest.importorskip("faiss")
+
+from src.faiss_store import FaissStore  # noqa: E402
+
+TEXTS = [f"REQ-{i} : exigence numéro {i}." for i in range(6)]
+IDS = [f"c{i}" for i in range(6)]
+
+
+@pytest.fixture
+def embedding():
+    return DeterministicFakeEmbedding(size=16)
+
+
+@pytest.fixture
+def store(tmp_path, embedding):
+    store = FaissStore.from_texts(
+        TEXTS[:3], embedding, metadatas=[{"n": i} for i in range(3)], ids=IDS[:3], path=tmp_path / "faiss"
+    )
+    yield store
+    store.close()
+
+
+def _top(store, embedding, text):
+    doc, _ = store.search_vectors([embedding.embed_query(text)], k=1)[0][0]
+    return doc.id
+
+
+def test_each_save_writes_a_segment(store, embedding):
+    store.add_texts(TEXTS[3:], ids=IDS[3:])
+    store.save()
+    assert len(store._segments) == 2 and len(store) == 6
+    assert _top(store, embedding, TEXTS[4]) == "c4"
+    assert store.get_by_ids(["c1"])[0].metadata == {"n": 1}
+
+
+def test_deleted_vectors_are_filtered_until_compaction(store, embedding):
+    store.add_texts(TEXTS[3:], ids=IDS[3:])
+    store.save()
+    store.delete(["c4"])
+    store.save()
+    assert _top(store, embedding, TEXTS[4]) != "c4"
+    assert store._dead() == 1
+    stats = store.compact()
+    assert stats == {"segments_avant": 2, "segments_apres": 1, "vecteurs_retires": 1}
+    assert len(store) == 5 and store._ntotal() == 5
+    assert _top(store, embedding, TEXTS[5]) == "c5"
+
+
+def test_replaced_id_keeps_a_single_entry(store, embedding):
+    store.add_texts(["REQ-1 : nouvelle version."], ids=["c1"])
+    store.save()
+    assert len(store) == 3
+    assert store.get_by_ids(["c1"])[0].page_content == "REQ-1 : nouvelle version."
+    assert store.compaction_due is False
+
+
+def test_reload_reads_saved_segments_only(store, embedding, tmp_path):
+    store.add_texts(TEXTS[3:], ids=IDS[3:])
+    store.save()
+    store.add_texts(["non enregistré"], ids=["tmp"])
+    store.close()
+    reloaded = FaissStore.load(tmp_path / "faiss", embedding)
+    assert len(reloaded) == 6 and reloaded.get_by_ids(["tmp"]) == []
+    vectors = reloaded.get_vectors(["c2"])
+    assert list(vectors) == ["c2"] and vectors["c2"].shape == (16,)
+    assert _top(reloaded, embedding, TEXTS[2]) == "c2"
+    reloaded.close()
+
+
+def test_from_texts_requires_a_path(embedding):
+    with pytest.raises(ValueError):
+        FaissStore.from_texts(TEXTS, embedding)
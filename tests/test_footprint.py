@@ -0,0 +1,21 @@
+"""Empreinte des index chargés : mesurée au chargement et après chaque écriture, pas à chaque accès."""
+from pathlib import Path
+
+
+def test_footprint_is_measured_once_per_write(settings, make_workflow, monkeypatch):
+    (settings.documents_path / "a.txt").write_text("REQ-1 : le système démarre en 30 s.")
+    workflow = make_workflow(use_cache=False)
+    workflow.initialize()
+    vsm = workflow.vector_store_manager
+    scans = []
+    rglob = Path.rglob
+    monkeypatch.setattr(Path, "rglob", lambda self, pattern: scans.append(self) or rglob(self, pattern))
+    first = vsm.footprint()
+    assert vsm.footprint() == first and len(scans) == 1
+    (settings.documents_path / "b.txt").write_text("REQ-2 : les journaux sont conservés un an. " * 50)
+    workflow.sync()
+    scans.clear()
+    assert vsm.footprint() > first and vsm.footprint() > first
+    assert len(scans) == 1
+    workflow.close()
+    assert vsm.footprint() == 0
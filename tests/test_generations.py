@@ -0,0 +1,40 @@
+"""Générations d'index : le nettoyage épargne les constructions en cours."""
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from src.vector_store import BUILDING_FILE, GENERATIONS_DIR
+
+
+def _staging(root, name, owner=None, age_s=0.0):
+    directory = root / GENERATIONS_DIR / name
+    directory.mkdir(parents=True)
+    if owner is not None:
+        (directory / BUILDING_FILE).write_text(owner)
+    past = time.time() - age_s
+    for path in (directory / BUILDING_FILE, directory):
+        if path.exists():
+            os.utime(path, (past, past))
+    return directory
+
+
+def test_gc_spares_builds_in_progress(settings, make_workflow):
+    (settings.documents_path / "a.txt").write_text("REQ-1 : le système démarre en 30 s.")
+    workflow = make_workflow(use_cache=False)
+    workflow.initialize()
+    root = workflow.vector_store_manager.vector_store_path
+    host = socket.gethostname()
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    ours = _staging(root, "900001", f"{os.getpid()} {host}", age_s=7200)
+    remote = _staging(root, "900002", "1 autre-hote", age_s=60)
+    crashed = _staging(root, "900003", f"{dead.stdout.strip()} {host}")
+    expired = _staging(root, "900004", "1 autre-hote", age_s=7200)
+    unmarked = _staging(root, "900005", age_s=7200)
+    workflow.initialize(full_rebuild=True)
+    assert ours.exists() and remote.exists()
+    assert not crashed.exists() and not expired.exists() and not unmarked.exists()
+    live = workflow.vector_store_manager.active_dir
+    assert not (live / BUILDING_FILE).exists()
+    workflow.close()
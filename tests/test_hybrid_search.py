@@ -0,0 +1,28 @@
+"""Recherche : modes dense, lexical et hybride (fusion par rang réciproque)."""
+from langchain_core.documents import Document
+
+
+def _doc(doc_id):
+    return Document(id=doc_id, page_content=doc_id)
+
+
+def test_rrf_favours_documents_ranked_by_both(settings, make_workflow):
+    vsm = make_workflow().vector_store_manager
+    dense = [_doc("a"), _doc("b"), _doc("c")]
+    lexical = [_doc("c"), _doc("d"), _doc("b")]
+    assert [d.id for d in vsm._rrf([dense, lexical], k=3)] == ["c", "b", "a"]
+    assert [d.id for d in vsm._rrf([dense, []], k=2)] == ["a", "b"]
+
+
+def test_search_modes(settings, make_workflow):
+    for i in range(5):
+        (settings.documents_path / f"spec{i}.txt").write_text(f"REQ-04{i} : le délai de reprise est de {i} minutes.")
+    workflow = make_workflow(use_cache=False)
+    workflow.initialize()
+    assert settings.search_mode == "dense"
+    lexical = workflow.search("REQ-042", k=1, search_mode="lexical")
+    assert [d.metadata["file_name"] for d in lexical] == ["spec2.txt"]
+    hybrid = workflow.search("REQ-042", k=5, search_mode="hybrid")
+    assert "spec2.txt" in [d.metadata["file_name"] for d in hybrid]
+    assert len(workflow.search("REQ-042", k=3)) == 3
+    workflow.close()
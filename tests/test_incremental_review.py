@@ -0,0 +1,91 @@
+"""Revue incrémentale : reprise des problèmes de la référence selon les chunks revus."""
+import json
+import re
+
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from src.agent import SpecificationReviewAgent
+from src.context import REF_LENGTH, chunk_fingerprint
+from src.metrics import Metrics
+
+
+# En-tête d'un passage dans le prompt de revue (cf. format_doc), suivi de son texte
+_PASSAGE = re.compile(rf"réf ([0-9a-f]{{{REF_LENGTH}}})\]\n([^\n]*)")
+
+
+class _Store:
+    """Chunks en mémoire, sans voisins sémantiques."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.metrics = Metrics()
+
+    def iter_all_documents(self):
+        return iter(self.docs)
+
+    def similarity_search_batch(self, queries, k=5):
+        return [[] for _ in queries]
+
+
+def _chunk(source, index, text):
+    return Document(
+        id=f"{source}-{index}", page_content=text,
+        metadata={"source": source, "file_name": source, "chunk_index": index},
+    )
+
+
+def _llm(findings):
+    """LLM factice : pour chaque chunk du contexte contenant une clé de `findings`, un problème qui le cite."""
+
+    def answer(prompt):
+        problemes = [
+            {"type": "ambiguite", "severite": "majeur", "localisation": needle, "description": description,
+             "chunks": [ref]}
+            for ref, text in _PASSAGE.findall(prompt.to_string())
+            for needle, description in findings.items()
+            if needle in text
+        ]
+        return json.dumps({"problemes": problemes})
+
+    return RunnableLambda(answer)
+
+
+def _review(docs, findings, baseline=None):
+    agent = SpecificationReviewAgent(_Store(docs), use_cache=False, llm=_llm(findings))
+    if baseline is None:
+        return agent.review_sharded(shard_tokens=10_000, concurrency=1)
+    return agent.review_incremental(baseline, neighbours=0, shard_tokens=10_000, concurrency=1)
+
+
+def _baseline(docs, findings):
+    result = _review(docs, findings)
+    return {
+        "metadata": {"empreintes_chunks": result["empreintes_chunks"]},
+        "resume": {"questions_analysees": result["questions_analysees"]},
+        "analyse": result["analyse"],
+    }
+
+
+V1 = [
+    _chunk("a.txt", 0, "REQ-1 : le système démarre en 30 s."),
+    _chunk("a.txt", 1, "REQ-2 : le délai de reprise est court."),
+    _chunk("b.txt", 0, "REQ-5 : les journaux sont conservés."),
+]
+V2 = [_chunk("a.txt", 0, "REQ-1 : le système démarre en 20 s."), *V1[1:]]
+
+
+def test_neighbour_finding_is_replaced_not_duplicated():
+    baseline = _baseline(V1, {"REQ-2": "Délai REQ-2 non chiffré.", "REQ-5": "Durée de conservation absente."})
+    result = _review(V2, {"REQ-2": "Le délai de REQ-2 n'est pas quantifié."}, baseline)
+    descriptions = sorted(p["description"] for p in result["analyse"]["problemes"])
+    # REQ-2, voisin de REQ-1 modifié, est revu : seule la nouvelle formulation reste ; REQ-5 non revu est repris
+    assert descriptions == ["Durée de conservation absente.", "Le délai de REQ-2 n'est pas quantifié."]
+    assert result["incremental"]["problemes_repris"] == 1
+
+
+def test_fixed_neighbour_finding_is_cleared():
+    baseline = _baseline(V1, {"REQ-2": "Délai REQ-2 non chiffré."})
+    result = _review(V2, {}, baseline)
+    assert result["analyse"]["problemes"] == []
+    assert chunk_fingerprint(V2[0]) in result["empreintes_chunks"]
@@ -0,0 +1,75 @@
+"""Manifeste : détection des fichiers nouveaux, modifiés et supprimés."""
+import os
+
+from src.manifest import IndexManifest, chunk_ids_for, file_hash
+
+
+def _manifest(tmp_path):
+    return IndexManifest(tmp_path / "index", "faiss", "modele")
+
+
+def _write(path, text, mtime=None):
+    path.write_text(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_diff_new_changed_deleted_and_touched(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    a = _write(docs / "a.txt", "A", mtime=1_000)
+    b = _write(docs / "b.txt", "B", mtime=1_000)
+    c = _write(docs / "c.txt", "C", mtime=1_000)
+    manifest = _manifest(tmp_path)
+    for fp in (a, b, c):
+        manifest.record(fp, file_hash(fp), [])
+    _write(a, "A2", mtime=2_000)
+    _write(b, "B", mtime=2_000)  # seulement « touché »
+    c.unlink()
+    d = _write(docs / "d.txt", "D")
+    new, changed, deleted = manifest.diff(sorted(docs.iterdir()))
+    assert [fp for fp, _ in new] == [d]
+    assert [fp for fp, _ in changed] == [a]
+    assert deleted == [str(c)]
+    assert manifest.files[str(b)]["mtime"] == 2_000
+
+
+def test_diff_tracks_external_files(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    outside = _write(tmp_path / "ext.txt", "E", mtime=1_000)
+    gone = _write(tmp_path / "gone.txt", "G")
+    manifest = _manifest(tmp_path)
+    manifest.record(outside, file_hash(outside), [], external=True)
+    manifest.record(gone, file_hash(gone), [], external=True)
+    _write(outside, "E2", mtime=2_000)
+    gone.unlink()
+    new, changed, deleted = manifest.diff([])
+    assert new == [] and [fp for fp, _ in changed] == [outside]
+    assert deleted == [str(gone)]
+
+
+def test_shared_chunks_are_removed_with_their_last_file(tmp_path):
+    manifest = _manifest(tmp_path)
+    manifest.files = {
+        "a.txt": {"hash": "h", "chunk_ids": ["x", "commun"]},
+        "b.txt": {"hash": "h", "chunk_ids": ["y", "commun"]},
+    }
+    assert manifest.remove("a.txt") == ["x"]
+    assert manifest.locations(["commun"]) == {"commun": [{"source": "b.txt", "chunk_index": 1}]}
+    assert manifest.remove("b.txt") == ["y", "commun"]
+
+
+def test_manifest_of_another_configuration_is_invalid(tmp_path):
+    manifest = _manifest(tmp_path)
+    manifest.record(_write(tmp_path / "a.txt", "A"), "h", ["c"])
+    manifest.save()
+    assert IndexManifest(tmp_path / "index", "faiss", "modele").valid
+    assert not IndexManifest(tmp_path / "index", "chroma", "modele").valid
+
+
+def test_unchanged_chunk_keeps_its_id():
+    before = chunk_ids_for("a.txt", ["h1" * 8, "h2" * 8])
+    after = chunk_ids_for("a.txt", ["h1" * 8, "h3" * 8])
+    assert before[0] == after[0] and before[1] != after[1]
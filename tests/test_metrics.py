@@ -0,0 +1,34 @@
+"""Mesures : chaque indexation, question et revue émet les siennes."""
+from src.metrics import PrometheusTextfileExporter
+
+
+def _workflow(settings, make_workflow):
+    (settings.documents_path / "a.txt").write_text("REQ-1 : le système démarre en 30 s. " * 10)
+    workflow = make_workflow(use_cache=False)
+    records = []
+    workflow.metrics.add_hook(records.append)
+    workflow.initialize()
+    return workflow, records
+
+
+def test_query_metrics_are_not_absorbed_by_the_next_review(settings, make_workflow):
+    workflow, records = _workflow(settings, make_workflow)
+    workflow.query("Quel est le délai de démarrage ?")
+    "".join(workflow.query_stream("Et le délai de reprise ?")["stream"])
+    report = workflow.run_full_review(mode="rag", custom_questions=["Q1"])
+    events = [r["evenement"] for r in records]
+    assert events == ["indexation", "question", "question", "revue"]
+    assert [r["compteurs"]["llm_appels"] for r in records[1:]] == [1, 1, 1]
+    assert report["metadata"]["metriques"]["compteurs"]["llm_appels"] == 1
+    assert "embedding" not in report["metadata"]["metriques"]["durees_s"]
+    workflow.close()
+
+
+def test_prometheus_keeps_the_last_record_of_each_event(tmp_path):
+    exporter = PrometheusTextfileExporter(tmp_path / "metrics.prom")
+    exporter({"evenement": "revue", "durees_s": {"llm": 2.0}, "compteurs": {"llm_appels": 3}})
+    exporter({"evenement": "question", "durees_s": {"llm": 0.5}, "compteurs": {"llm_appels": 1}})
+    text = (tmp_path / "metrics.prom").read_text()
+    assert 'revue_specs_llm_appels{evenement="revue"} 3' in text
+    assert 'revue_specs_llm_appels{evenement="question"} 1' in text
+    assert text.count("# TYPE revue_specs_llm_appels gauge") == 1
@@ -0,0 +1,46 @@
+"""Démarrage des points d'entrée : `--help` ne charge ni les clients OpenAI, ni les backends, ni le workflow."""
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ("langchain_openai", "langchain_chroma", "langchain_community", "faiss", "src.workflow")
+
+# Large : le seul import du workflow coûte plusieurs secondes, un --help léger quelques centaines de ms
+STARTUP_BUDGET_S = 3.0
+
+_PROBE = """
+import json, runpy, sys
+sys.argv = [{script!r}, "--help"]
+code = 0
+try:
+    runpy.run_path({script!r}, run_name="__main__")
+except SystemExit as e:
+    code = e.code or 0
+print(json.dumps({{"exit": code, "loaded": sorted(m for m in {modules!r} if m in sys.modules)}}))
+"""
+
+
+@pytest.mark.parametrize("script", ["cli.py", "validate_specs.py"])
+def test_help_does_not_import_heavy_modules(script):
+    code = _PROBE.format(script=script, modules=HEAVY_MODULES)
+    t0 = time.perf_counter()
+    # Clé factice, comme en CI : sans elle le script pourrait s'arrêter avant d'analyser `--help`
+    env = {**os.environ, "OPENAI_API_KEY": "test"}
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, timeout=60
+    )
+    elapsed = time.perf_counter() - t0
+    assert result.returncode == 0, result.stderr
+    *output, last = result.stdout.strip().splitlines()
+    probe = json.loads(last)
+    assert probe["exit"] == 0, result.stdout
+    assert "usage" in "\n".join(output).lower(), result.stdout
+    assert probe["loaded"] == [], f"{script} --help importe {probe['loaded']}"
+    assert elapsed < STARTUP_BUDGET_S, f"{script} --help: {elapsed:.2f}s (budget {STARTUP_BUDGET_S}s)"
@@ -3,49 +3,234 @@
 Porte de validation des spécifications pour intégration CI/CD.
 
 Usage:
-    python validate_specs.py [--max-critiques 0] [--max-majeurs 5] [--output rapport.json]
+    python validate_specs.py [--max-critiques 0] [--max-majeurs 5] [--output rapport.json] [--mode sharded] [--no-cache]
+                             [--collection produit-a]
+    python validate_specs.py --batch specs/ [--llm-concurrency 8] [--output reports/specs/]
+    python validate_specs.py --mode sharded --output rapport.json --baseline rapport_precedent.json
+    python validate_specs.py --mode sharded --output rapport.json --since origin/main
+
+Avec --batch, chaque sous-dossier de la racine contenant des documents est une
+collection, revue en parallèle dans le même processus (clients OpenAI communs,
+au plus --llm-concurrency appels LLM simultanés en tout) ; --output désigne
+alors un dossier (un rapport JSON par collection et resume.json).
+
+Avec --baseline (rapport précédent produit en mode sharded) ou --since (le
+rapport produit pour ce commit, cherché parmi --output et les rapports de
+OUTPUT_PATH), seuls les chunks modifiés et leurs voisins sont revus ; les
+autres problèmes sont repris de la référence. Le rapport reste complet et sert
+de référence au passage suivant. Avec --batch, --baseline désigne le dossier des
+rapports précédents (<collection>.json).
 
 Exit codes:
-    0 = Validation OK
-    1 = Seuils dépassés
-    2 = Erreur d'exécution
+    0 = Validation OK (tous les dossiers avec --batch)
+    1 = Seuils dépassés (au moins un dossier)
+    2 = Erreur d'exécution, ou revue incomplète (lots en échec) sans --allow-partial (au moins un dossier)
 """
 import argparse
+import json
+import os
 import sys
 from pathlib import Path
+from typing import List, Optional, Tuple
 
 from config import settings
-from src.workflow import ValidationWorkflow
+
+
+def _verdict(report, args) -> Tuple[int, str, int, int]:
+    """Code de sortie, message, nombres de problèmes critiques et majeurs d'un rapport."""
+    stats = report.get("statistiques") or {}
+    resume = report.get("resume") or {}
+    failed = resume.get("lots_en_echec", 0)
+    n_critiques = stats.get("problemes_critiques", 0)
+    n_majeurs = stats.get("problemes_majeurs", 0)
+    if failed and not args.allow_partial:
+        return 2, f"revue incomplète: {failed}/{resume.get('nombre_lots', '?')} lot(s) en échec", n_critiques, n_majeurs
+    if n_critiques > args.max_critiques:
+        return 1, f"{n_critiques} problème(s) critique(s) (seuil: {args.max_critiques})", n_critiques, n_majeurs
+    if n_majeurs > args.max_majeurs:
+        return 1, f"{n_majeurs} problème(s) majeur(s) (seuil: {args.max_majeurs})", n_critiques, n_majeurs
+    return 0, f"{n_critiques} critique(s), {n_majeurs} majeur(s)", n_critiques, n_majeurs
+
+
+def _read_report(path: Path) -> Optional[dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def load_baseline(args, documents_path: Path, path: Optional[Path], search: List[Path]) -> Optional[dict]:
+    """Rapport de référence : le fichier `path`, sinon (--since) le plus récent de `search` produit pour ce commit.
+
+    None : pas de référence, la revue porte sur tout le corpus.
+    """
+    if path is not None:
+        report = _read_report(path)
+        if report is None:
+            raise ValueError(f"Rapport de référence illisible: {path}")
+        return report
+    if not args.since:
+        return None
+    from src.workflow import git_commit
+    commit = git_commit(documents_path, args.since)
+    if commit is None:
+        raise ValueError(f"Référence git introuvable depuis {documents_path}: {args.since}")
+    reports = [
+        r for r in map(_read_report, dict.fromkeys(search))
+        if isinstance(r, dict) and (r.get("metadata") or {}).get("commit") == commit
+    ]
+    if not reports:
+        print(f"ATTENTION: aucun rapport pour {args.since} ({commit[:12]}), revue de tout le corpus", file=sys.stderr)
+        return None
+    return max(reports, key=lambda r: r["metadata"].get("date_analyse", ""))
+
+
+def discover(root: Path) -> List[Path]:
+    """Sous-dossiers directs de `root` contenant au moins un document supporté (sous-dossiers compris)."""
+    from src.document_loader import SUPPORTED_EXTENSIONS
+    return sorted(
+        d for d in root.iterdir()
+        if d.is_dir() and not d.name.startswith(".")
+        and any(f.suffix.lower() in SUPPORTED_EXTENSIONS for f in d.rglob("*") if f.is_file())
+    )
+
+
+def run_batch(args) -> int:
+    """Revue parallèle de tous les dossiers de spécifications de `args.batch`."""
+    if not args.batch.is_dir():
+        print(f"ERREUR: dossier introuvable: {args.batch}", file=sys.stderr)
+        return 2
+    folders = discover(args.batch)
+    if not folders:
+        print(f"ERREUR: aucun dossier de spécifications dans {args.batch}", file=sys.stderr)
+        return 2
+
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from src.agent import llm_client
+    from src.collection import Collection, collection_name
+    from src.vector_store import embeddings_client
+    from src.workflow import ValidationWorkflow
+
+    names = [collection_name(f.name) for f in folders]
+    if len(set(names)) != len(names):
+        print("ERREUR: plusieurs dossiers donnent le même nom de collection", file=sys.stderr)
+        return 2
+    if args.output:
+        args.output.mkdir(parents=True, exist_ok=True)
+    slots = threading.BoundedSemaphore(args.llm_concurrency)
+    embeddings, llm = embeddings_client(), llm_client()
+    # Assez de dossiers en cours pour occuper les appels LLM pendant que d'autres chargent leur index
+    jobs = min(args.jobs or 2 * args.llm_concurrency, len(folders))
+    # Ils se partagent les processus de chargement des documents : LOAD_WORKERS au total, pas par dossier
+    load_workers = max(1, (settings.load_workers or os.cpu_count() or 1) // jobs)
+
+    def validate(folder: Path, name: str) -> dict:
+        workflow = None
+        try:
+            workflow = ValidationWorkflow(
+                use_cache=False if args.no_cache else None,
+                collection=Collection(name, documents_path=folder),
+                embeddings=embeddings,
+                llm=llm,
+                llm_slots=slots,
+                load_workers=load_workers,
+            )
+            workflow.initialize(rebuild_vector_store=args.rebuild)
+            output = args.output / f"{name}.json" if args.output else None
+            previous = args.baseline / f"{name}.json" if args.baseline else None
+            baseline = load_baseline(
+                args,
+                folder,
+                previous if previous is not None and previous.exists() else None,
+                [p for p in (previous, output) if p is not None and p.exists()],
+            )
+            report = workflow.run_full_review(output_file=output, mode=args.mode, baseline=baseline)
+            code, message, n_critiques, n_majeurs = _verdict(report, args)
+            return {"dossier": str(folder), "collection": name, "code": code, "message": message,
+                    "problemes_critiques": n_critiques, "problemes_majeurs": n_majeurs}
+        except Exception as e:
+            return {"dossier": str(folder), "collection": name, "code": 2, "message": f"ERREUR: {e}"}
+        finally:
+            if workflow is not None:
+                workflow.close()
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(validate, folders, names))
+
+    width = max(len(r["collection"]) for r in results)
+    for r in results:
+        status = ("OK", "KO", "ERREUR")[r["code"]]
+        print(f"{status:6s} {r['collection']:{width}s}  {r['message']}")
+    code = max(r["code"] for r in results)
+    passed = sum(1 for r in results if r["code"] == 0)
+    if args.output:
+        summary = {"racine": str(args.batch), "code": code, "dossiers": results}
+        (args.output / "resume.json").write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Rapports: {args.output}")
+    if code:
+        print(f"VALIDATION KO: {len(results) - passed}/{len(results)} dossier(s) en échec", file=sys.stderr)
+    else:
+        print(f"VALIDATION OK: {passed} dossier(s)")
+    return code
 
 
 def main():
     parser = argparse.ArgumentParser(description="Porte de validation des spécifications")
     parser.add_argument("--max-critiques", type=int, default=0, help="Nombre max de problèmes critiques acceptés")
     parser.add_argument("--max-majeurs", type=int, default=5, help="Nombre max de problèmes majeurs acceptés")
-    parser.add_argument("--output", type=Path, default=None, help="Fichier de sortie pour le rapport")
-    parser.add_argument("--rebuild", action="store_true", help="Reconstruire le vector store avant la revue")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Fichier de sortie pour le rapport (dossier des rapports avec --batch)")
+    parser.add_argument("--mode", choices=["rag", "sharded"], default=None,
+                        help="rag: contexte retrouvé ; sharded: revue parallèle de tout le corpus")
+    parser.add_argument("--rebuild", action="store_true", help="Réindexer les documents nouveaux ou modifiés avant la revue")
+    parser.add_argument("--no-cache", action="store_true", help="Ignorer le cache des réponses du LLM")
+    parser.add_argument("--allow-partial", action="store_true",
+                        help="Juger une revue par lots même si des lots ont échoué (sinon code 2)")
+    parser.add_argument("--collection", type=str, default=None, help="Collection nommée à valider (défaut: documents/)")
+    parser.add_argument("--batch", type=Path, default=None,
+                        help="Valider chaque sous-dossier de ce dossier comme une collection, en parallèle")
+    parser.add_argument("--llm-concurrency", type=int, default=settings.review_concurrency,
+                        help="Appels LLM simultanés, tous dossiers confondus (avec --batch)")
+    parser.add_argument("--jobs", type=int, default=0,
+                        help="Dossiers traités simultanément (avec --batch ; défaut: 2 x --llm-concurrency)")
+    reference = parser.add_mutually_exclusive_group()
+    reference.add_argument("--baseline", type=Path, default=None,
+                           help="Rapport précédent : ne revoir que les chunks modifiés depuis (dossier avec --batch)")
+    reference.add_argument("--since", type=str, default=None,
+                           help="Référence git : prendre pour base le rapport produit pour ce commit")
     args = parser.parse_args()
+    if args.baseline or args.since:
+        if args.mode == "rag":
+            parser.error("--baseline et --since s'appliquent à la revue par lots (--mode sharded)")
+        args.mode = "sharded"  # revue complète en repli : le rapport servira de référence au passage suivant
+
+    if args.batch:
+        if args.collection:
+            parser.error("--batch et --collection sont incompatibles")
+        if args.baseline and not args.baseline.is_dir():
+            parser.error("avec --batch, --baseline désigne le dossier des rapports précédents")
+        return run_batch(args)
 
     try:
-        workflow = ValidationWorkflow()
+        from src.workflow import ValidationWorkflow  # import lourd, après l'analyse des arguments
+        workflow = ValidationWorkflow(use_cache=False if args.no_cache else None, collection=args.collection)
         workflow.initialize(rebuild_vector_store=args.rebuild)
-        report = workflow.run_full_review(output_file=args.output)
+        search = sorted(settings.output_path.glob("*.json"))
+        if args.output:
+            search = [args.output] * args.output.exists() + sorted(args.output.parent.glob("*.json")) + search
+        baseline = load_baseline(args, workflow.collection.documents_path, args.baseline, search)
+        report = workflow.run_full_review(output_file=args.output, mode=args.mode, baseline=baseline)
     except Exception as e:
         print(f"ERREUR: {e}", file=sys.stderr)
         return 2
 
-    stats = report.get("statistiques") or {}
-    n_critiques = stats.get("problemes_critiques", 0)
-    n_majeurs = stats.get("problemes_majeurs", 0)
-
-    if n_critiques > args.max_critiques:
-        print(f"VALIDATION KO: {n_critiques} problème(s) critique(s) (seuil: {args.max_critiques})", file=sys.stderr)
-        return 1
-    if n_majeurs > args.max_majeurs:
-        print(f"VALIDATION KO: {n_majeurs} problème(s) majeur(s) (seuil: {args.max_majeurs})", file=sys.stderr)
-        return 1
+    code, message, _, _ = _verdict(report, args)
+    if code:
+        print(f"VALIDATION KO: {message}", file=sys.stderr)
+        return code
 
-    print(f"VALIDATION OK: {n_critiques} critique(s), {n_majeurs} majeur(s)")
+    print(f"VALIDATION OK: {message}")
     if args.output:
         print(f"Rapport: {args.output}")
     return 0